@@ -1,33 +1,68 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends
-from fastapi.responses import FileResponse, Response
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
-from typing import List, Optional
-from datetime import datetime
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends, Request
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from sqlalchemy.orm import Session, load_only
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, and_, or_
+from pydantic import BaseModel
+from typing import List, Optional, Tuple
+from datetime import datetime, timedelta
 import os
 import sys
 import uuid
-import csv
-import io
 import logging
-import threading
+import asyncio
+import time
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from models import Call, Evaluation, SessionLocal, init_db
-from services.transcription_service import transcribe_audio
-from services.evaluation_service import evaluate_transcription
+from models import Call, Evaluation, EvaluationScore, SessionLocal, AsyncSessionLocal, engine, async_engine
+from services.transcription_service import transcribe_audio_segmented
+from services.job_queue import job_queue
 from services.websocket_service import manager
+from services.progress_service import progress_aggregator, progress_tracker, merge_status, status_version
+from services.progress_bus import progress_bus
+from services.transcription_cache import transcription_cache
+from services.evaluation_cache import evaluation_cache
+from services.prompt_cache import prompt_cache
+from services.rate_limiter import rate_limiter
+from services.providers import provider
+from services.local_asr import local_asr
+from services.evaluation_store import add_evaluation
+from services.stats_service import PERIODS, manager_stats, period_stats, rebuild_rollups
+from services.timing_service import call_timings, save_timings, stage_stats
+from utils.upload import save_upload_file, hash_file, UploadTooLarge
+from utils.export import CSV_MEDIA_TYPE, csv_chunk, csv_header, export_row
+from utils.db_pool import pool_stats
+from utils.metrics import ANALYSIS_RESULTS, ANALYSIS_STAGE_SECONDS, observe_stage
+from utils.timing import timing_ledger, timing_span
+from utils.pagination import encode_cursor, decode_cursor, InvalidCursor
+from utils.checklist import CRITERIA_KEYS
+from config import (
+    MAX_UPLOAD_SIZE_MB,
+    UPLOAD_CHUNK_SIZE,
+    EVALUATION_BATCH_SIZE,
+    EVALUATION_BATCH_MAX_SIZE,
+    EVALUATION_BATCH_MAX_CALLS,
+    EVALUATION_BATCH_CONCURRENCY,
+    EXPORT_BATCH_SIZE,
+    CALLS_PAGE_SIZE,
+    CALLS_PAGE_MAX_SIZE,
+    ANALYSIS_WORKERS,
+    STATUS_LONG_POLL_MAX_WAIT,
+    CALL_TIMINGS_STATS_MAX_HOURS,
+)
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+def remove_staged_files(staged: list):
+    for _, file_path, _ in staged:
+        if os.path.exists(file_path):
+            os.remove(file_path)
 
 @router.post("/upload")
 async def upload_files(
@@ -35,13 +70,23 @@ async def upload_files(
     manager: Optional[str] = Form(None),
     call_date: Optional[str] = Form(None),
     call_identifier: Optional[str] = Form(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     if not files:
         raise HTTPException(status_code=400, detail="Не указаны файлы для загрузки")
     
-    uploaded_calls = []
+    call_date_obj = None
+    if call_date:
+        try:
+            call_date_obj = datetime.fromisoformat(call_date.replace("Z", "+00:00"))
+        except:
+            pass
     
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    uploads_dir = os.path.join(backend_dir, "uploads")
+    os.makedirs(uploads_dir, exist_ok=True)
+    
+    staged = []
     for file in files:
         if not file.content_type or not file.content_type.startswith("audio/"):
             continue
@@ -49,140 +94,179 @@ async def upload_files(
         try:
             file_id = str(uuid.uuid4())
             filename = f"{file_id}_{file.filename}"
-            backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            uploads_dir = os.path.join(backend_dir, "uploads")
-            os.makedirs(uploads_dir, exist_ok=True)
             file_path = os.path.join(uploads_dir, filename)
             
-            with open(file_path, "wb") as f:
-                content = await file.read()
-                f.write(content)
-            
-            call_date_obj = None
-            if call_date:
-                try:
-                    call_date_obj = datetime.fromisoformat(call_date.replace("Z", "+00:00"))
-                except:
-                    pass
-            
-            call = Call(
-                filename=file.filename,
-                audio_url=file_path,
-                manager=manager,
-                call_date=call_date_obj,
-                call_identifier=call_identifier
+            upload_info = await save_upload_file(
+                file,
+                file_path,
+                max_bytes=MAX_UPLOAD_SIZE_MB * 1024 * 1024,
+                chunk_size=UPLOAD_CHUNK_SIZE
             )
-            
-            db.add(call)
-            db.commit()
-            db.refresh(call)
-            
-            uploaded_calls.append({
-                "id": call.id,
-                "filename": call.filename,
-                "manager": call.manager,
-                "call_date": call.call_date.isoformat() if call.call_date else None,
-                "call_identifier": call.call_identifier
-            })
-            
-            thread = threading.Thread(target=analyze_in_background, args=(call.id, file_path), daemon=True)
-            thread.start()
-            logger.info(f"Автоматически запущен анализ для звонка {call.id}")
+            logger.info(f"Файл {file.filename} сохранен: {upload_info['size']} байт, формат {upload_info['format']}, длительность {upload_info['duration']}с")
+            staged.append((file.filename, file_path, upload_info))
         except Exception as e:
-            db.rollback()
+            remove_staged_files(staged)
+            if isinstance(e, UploadTooLarge):
+                raise HTTPException(status_code=413, detail=f"{file.filename}: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Ошибка при загрузке файла {file.filename}: {str(e)}")
     
-    if not uploaded_calls:
+    if not staged:
         raise HTTPException(status_code=400, detail="Не удалось загрузить ни один файл. Убедитесь, что файлы имеют аудио формат.")
     
+    calls = [
+        Call(
+            filename=original_name,
+            audio_url=file_path,
+            duration=upload_info["duration"],
+            audio_sha256=upload_info["sha256"],
+            file_size=upload_info["size"],
+            audio_format=upload_info["format"],
+            manager=manager,
+            call_date=call_date_obj,
+            call_identifier=call_identifier
+        )
+        for original_name, file_path, upload_info in staged
+    ]
+    try:
+        db.add_all(calls)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        remove_staged_files(staged)
+        raise HTTPException(status_code=500, detail=f"Ошибка при сохранении звонков: {str(e)}")
+    
+    uploaded_calls = []
+    for call in calls:
+        uploaded_calls.append({
+            "id": call.id,
+            "filename": call.filename,
+            "manager": call.manager,
+            "call_date": call.call_date.isoformat() if call.call_date else None,
+            "call_identifier": call.call_identifier,
+            "duration": call.duration,
+            "file_size": call.file_size
+        })
+        
+        await job_queue.enqueue_async(db, call.id, call.audio_url)
+        logger.info(f"Автоматически запущен анализ для звонка {call.id}")
+    
     return {"calls": uploaded_calls}
 
-def update_progress(call_id: int, progress: int, status: str = None, message: str = None):
+def get_audio_info(call_id: int, audio_path: str) -> Tuple[Optional[str], Optional[float]]:
     db_local = SessionLocal()
     try:
         call_local = db_local.query(Call).filter(Call.id == call_id).first()
+        duration = call_local.duration if call_local else None
+        if call_local and call_local.audio_sha256:
+            return call_local.audio_sha256, duration
+        
+        audio_sha256 = hash_file(audio_path)
         if call_local:
-            call_local.progress = progress
-            if status:
-                call_local.status = status
+            call_local.audio_sha256 = audio_sha256
             db_local.commit()
+        return audio_sha256, duration
     except Exception as e:
-        logger.error(f"Ошибка обновления прогресса: {e}")
+        logger.warning(f"Не удалось вычислить хэш аудио для звонка {call_id}: {e}")
+        return None, None
+    finally:
+        db_local.close()
+
+def save_transcription(call_id: int, transcription: str):
+    db_local = SessionLocal()
+    try:
+        call_local = db_local.query(Call).filter(Call.id == call_id).first()
+        if call_local:
+            call_local.transcription = transcription
+            db_local.commit()
+            logger.info("Транскрипция сохранена в БД")
     finally:
         db_local.close()
-    
-    manager.send_progress_sync(call_id, progress, status or "processing", message)
 
-def analyze_in_background(call_id: int, audio_path: str):
+def save_completed_evaluation(call_id: int, evaluation_result: dict):
+    db_local = SessionLocal()
     try:
-        update_progress(call_id, 10, "processing", "Начало транскрипции...")
+        call_local = db_local.query(Call).filter(Call.id == call_id).first()
+        if call_local:
+            add_evaluation(db_local, call_id, evaluation_result, is_retest=False)
+            call_local.status = "completed"
+            call_local.progress = 100
+            db_local.commit()
+            logger.info(f"Анализ звонка {call_id} успешно завершен")
+    finally:
+        db_local.close()
+
+async def analyze_in_background(call_id: int, audio_path: str):
+    with timing_ledger(call_id) as ledger:
+        try:
+            with timing_span("analysis", "total") as span:
+                completed = await run_analysis(call_id, audio_path)
+                if not completed:
+                    span.status = "failed"
+                return completed
+        finally:
+            await asyncio.to_thread(save_timings, ledger)
+
+async def run_analysis(call_id: int, audio_path: str):
+    started = time.perf_counter()
+    try:
+        await progress_aggregator.update(call_id, 10, "processing", "Начало транскрипции...")
         logger.info(f"Начало транскрипции файла {audio_path}")
         
-        transcription = transcribe_audio(audio_path)
+        audio_sha256, duration = await asyncio.to_thread(get_audio_info, call_id, audio_path)
+        cache_models = [transcription_cache.model] + ([local_asr.label] if local_asr.enabled else [])
+        transcription = await asyncio.to_thread(transcription_cache.get, audio_sha256, cache_models)
         
-        if not transcription or len(transcription.strip()) == 0:
-            raise Exception("Транскрипция пустая. Невозможно провести оценку.")
+        if transcription is None:
+            async def on_segment_progress(completed: int, total: int):
+                await progress_aggregator.update(
+                    call_id, 10 + int(80 * completed / total), "processing",
+                    f"Транскрибировано сегментов: {completed} из {total}"
+                )
+            
+            with observe_stage("analysis", "transcription"):
+                transcription, source_model = await transcribe_audio_segmented(
+                    audio_path, on_progress=on_segment_progress, duration=duration
+                )
+            
+            if not transcription or len(transcription.strip()) == 0:
+                raise Exception("Транскрипция пустая. Невозможно провести оценку.")
+            
+            await asyncio.to_thread(transcription_cache.put, audio_sha256, transcription, source_model)
         
-        update_progress(call_id, 90, "processing", "Транскрипция завершена, сохранение...")
+        await progress_aggregator.update(call_id, 90, "processing", "Транскрипция завершена, сохранение...")
         logger.info(f"Транскрипция завершена, длина текста: {len(transcription)} символов")
         
-        db_local = SessionLocal()
-        try:
-            call_local = db_local.query(Call).filter(Call.id == call_id).first()
-            if call_local:
-                call_local.transcription = transcription
-                db_local.commit()
-                logger.info("Транскрипция сохранена в БД")
-        finally:
-            db_local.close()
+        with observe_stage("analysis", "persist_transcription"):
+            await asyncio.to_thread(save_transcription, call_id, transcription)
         
-        update_progress(call_id, 95, "processing", "Начало оценки транскрипции...")
+        await progress_aggregator.update(call_id, 95, "processing", "Начало оценки транскрипции...")
         logger.info("Начало оценки транскрипции")
         
-        evaluation_result = evaluate_transcription(transcription)
+        with observe_stage("analysis", "evaluation"):
+            evaluation_result = await evaluation_cache.evaluate_async(transcription)
         logger.info(f"Оценка завершена, итоговый балл: {evaluation_result.get('итоговая_оценка', 'N/A')}")
         
-        db_local = SessionLocal()
-        try:
-            call_local = db_local.query(Call).filter(Call.id == call_id).first()
-            if call_local:
-                evaluation = Evaluation(
-                    call_id=call_id,
-                    scores=evaluation_result["scores"],
-                    итоговая_оценка=evaluation_result["итоговая_оценка"],
-                    нарушения=evaluation_result["нарушения"],
-                    комментарии=evaluation_result["комментарии"],
-                    is_retest=False
-                )
-                db_local.add(evaluation)
-                call_local.status = "completed"
-                call_local.progress = 100
-                db_local.commit()
-                logger.info(f"Анализ звонка {call_id} успешно завершен")
-        finally:
-            db_local.close()
+        with observe_stage("analysis", "persist_evaluation"):
+            await asyncio.to_thread(save_completed_evaluation, call_id, evaluation_result)
         
-        update_progress(call_id, 100, "completed", "Анализ завершен")
+        await progress_aggregator.finish(call_id, 100, "completed", "Анализ завершен", persist=False)
+        ANALYSIS_STAGE_SECONDS.labels("analysis", "total").observe(time.perf_counter() - started)
+        ANALYSIS_RESULTS.labels("completed").inc()
+        return True
             
     except Exception as e:
         import traceback
         logger.error(f"Ошибка в фоновой задаче: {e}")
         logger.error(traceback.format_exc())
-        db_local = SessionLocal()
-        try:
-            call_local = db_local.query(Call).filter(Call.id == call_id).first()
-            if call_local:
-                call_local.status = "failed"
-                db_local.commit()
-        finally:
-            db_local.close()
-        update_progress(call_id, 0, "failed", f"Ошибка: {str(e)}")
+        await progress_aggregator.finish(call_id, 0, "failed", f"Ошибка: {str(e)}")
+        ANALYSIS_RESULTS.labels("failed").inc()
+        return False
 
 @router.post("/analyze/{call_id}")
-async def analyze_call(call_id: int, db: Session = Depends(get_db)):
+async def analyze_call(call_id: int, db: AsyncSession = Depends(get_async_db)):
     try:
         logger.info(f"Начало анализа звонка {call_id}")
-        call = db.query(Call).filter(Call.id == call_id).first()
+        call = await db.get(Call, call_id)
         if not call:
             logger.error(f"Звонок {call_id} не найден")
             raise HTTPException(status_code=404, detail="Call not found")
@@ -206,16 +290,12 @@ async def analyze_call(call_id: int, db: Session = Depends(get_db)):
             logger.error(f"Путь не является файлом: {audio_path}")
             raise HTTPException(status_code=400, detail=f"Audio path is not a file: {audio_path}")
         
-        call.status = "processing"
-        call.progress = 0
-        db.commit()
-        
-        thread = threading.Thread(target=analyze_in_background, args=(call_id, audio_path), daemon=True)
-        thread.start()
+        job = await job_queue.enqueue_async(db, call_id, audio_path)
         
         return {
             "call_id": call_id,
-            "status": "processing",
+            "job_id": job.id,
+            "status": "queued",
             "progress": 0,
             "message": "Анализ начат, проверяйте статус через /api/analyze/{call_id}/status"
         }
@@ -228,41 +308,118 @@ async def analyze_call(call_id: int, db: Session = Depends(get_db)):
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Ошибка при анализе: {str(e)}")
 
-@router.get("/analyze/{call_id}/status")
-async def get_analyze_status(call_id: int, db: Session = Depends(get_db)):
-    call = db.query(Call).filter(Call.id == call_id).first()
+@router.get("/queue")
+async def get_queue_stats(db: AsyncSession = Depends(get_async_db)):
+    stats = await db.run_sync(job_queue.stats)
+    stats["progress_writes"] = progress_aggregator.stats()
+    stats["status_watchers"] = progress_tracker.stats()
+    return stats
+
+@router.get("/limits")
+async def get_rate_limits():
+    return {**rate_limiter.stats(), "provider": provider.stats()}
+
+@router.get("/admin/cache")
+async def get_cache_stats():
+    return {
+        "transcription": transcription_cache.stats(),
+        "evaluation": evaluation_cache.stats(),
+        "prompt_prefix": prompt_cache.stats()
+    }
+
+@router.get("/admin/db")
+async def get_db_pool_stats():
+    return {
+        "sync": pool_stats(engine),
+        "async": pool_stats(async_engine.sync_engine),
+        "analysis_workers": ANALYSIS_WORKERS
+    }
+
+@router.get("/admin/ws")
+async def get_websocket_stats():
+    return {**manager.stats(), "bus": progress_bus.stats()}
+
+@router.get("/admin/asr")
+async def get_local_asr_stats():
+    return local_asr.stats()
+
+@router.post("/admin/cache/transcription")
+async def set_transcription_cache(enabled: bool):
+    transcription_cache.set_enabled(enabled)
+    return transcription_cache.stats()
+
+async def load_call_status(call_id: int, db: AsyncSession) -> Optional[dict]:
+    call = (await db.execute(
+        select(Call).options(load_only(Call.id, Call.status, Call.progress)).where(Call.id == call_id)
+    )).scalar_one_or_none()
+    await db.close()
     if not call:
-        raise HTTPException(status_code=404, detail="Call not found")
+        return None
+    stored = {"status": call.status or "pending", "progress": call.progress or 0}
+    return merge_status(stored, progress_tracker.get(call_id))
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    return any(tag.strip() in (etag, f"W/{etag}", "*") for tag in if_none_match.split(","))
+
+@router.get("/analyze/{call_id}/status")
+async def get_analyze_status(
+    call_id: int,
+    request: Request,
+    wait: float = 0,
+    since: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    if_none_match = request.headers.get("if-none-match")
+    watcher = progress_tracker.watch(call_id) if wait > 0 else None
+    try:
+        state = await load_call_status(call_id, db)
+        if state is None:
+            raise HTTPException(status_code=404, detail="Call not found")
+        
+        version = status_version(state["status"], state["progress"])
+        unchanged = since == version or etag_matches(if_none_match, f'"{version}"')
+        if watcher is not None and unchanged:
+            if await progress_tracker.wait(watcher, min(wait, STATUS_LONG_POLL_MAX_WAIT)):
+                state = await load_call_status(call_id, db)
+                version = status_version(state["status"], state["progress"])
+    finally:
+        if watcher is not None:
+            progress_tracker.unwatch(call_id, watcher)
     
-    return {
+    etag = f'"{version}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    
+    return JSONResponse({
         "call_id": call_id,
-        "status": call.status or "pending",
-        "progress": call.progress or 0
-    }
+        "status": state["status"] or "pending",
+        "progress": state["progress"] or 0,
+        "message": state.get("message"),
+        "version": version
+    }, headers=headers)
 
 @router.post("/analyze/{call_id}/retest")
-async def retest_call(call_id: int, db: Session = Depends(get_db)):
-    call = db.query(Call).filter(Call.id == call_id).first()
+async def retest_call(call_id: int, force: bool = False, db: AsyncSession = Depends(get_async_db)):
+    call = await db.get(Call, call_id)
     if not call:
         raise HTTPException(status_code=404, detail="Call not found")
     
     if not call.transcription:
         raise HTTPException(status_code=400, detail="Transcription not found")
     
-    evaluation_result = evaluate_transcription(call.transcription)
-    
-    evaluation = Evaluation(
-        call_id=call_id,
-        scores=evaluation_result["scores"],
-        итоговая_оценка=evaluation_result["итоговая_оценка"],
-        нарушения=evaluation_result["нарушения"],
-        комментарии=evaluation_result["комментарии"],
-        is_retest=True
-    )
-    
-    db.add(evaluation)
-    db.commit()
-    db.refresh(evaluation)
+    with timing_ledger(call_id) as ledger:
+        try:
+            with observe_stage("retest", "evaluation"):
+                evaluation_result = await evaluation_cache.evaluate_async(call.transcription, force=force)
+            
+            with observe_stage("retest", "persist_evaluation"):
+                evaluation = await db.run_sync(add_evaluation, call_id, evaluation_result, True)
+                await db.commit()
+        finally:
+            await asyncio.to_thread(save_timings, ledger)
     
     return {
         "call_id": call_id,
@@ -276,15 +433,90 @@ async def retest_call(call_id: int, db: Session = Depends(get_db)):
         }
     }
 
-@router.get("/calls")
-async def get_calls(
-    manager: Optional[str] = None,
-    start_date: Optional[str] = None,
-    end_date: Optional[str] = None,
-    db: Session = Depends(get_db)
-):
-    query = db.query(Call)
+class BatchEvaluationRequest(BaseModel):
+    call_ids: List[int]
+    batch_size: int = EVALUATION_BATCH_SIZE
+    force: bool = False
+
+@router.post("/evaluate/batch")
+async def evaluate_batch(request: BatchEvaluationRequest, db: AsyncSession = Depends(get_async_db)):
+    call_ids = list(dict.fromkeys(request.call_ids))
+    if not call_ids:
+        raise HTTPException(status_code=400, detail="Не указаны звонки для оценки")
+    if len(call_ids) > EVALUATION_BATCH_MAX_CALLS:
+        raise HTTPException(status_code=400, detail=f"За один запрос можно оценить не более {EVALUATION_BATCH_MAX_CALLS} звонков")
+    batch_size = max(1, min(request.batch_size, EVALUATION_BATCH_MAX_SIZE))
+    
+    started = time.monotonic()
+    calls = {call.id: call for call in (await db.execute(select(Call).where(Call.id.in_(call_ids)))).scalars()}
+    
+    errors = {}
+    items = {}
+    for call_id in call_ids:
+        call = calls.get(call_id)
+        if not call:
+            errors[call_id] = "Call not found"
+        elif not call.transcription:
+            errors[call_id] = "Transcription not found"
+        else:
+            items[str(call_id)] = call.transcription
+    
+    logger.info(f"Пакетная оценка {len(items)} звонков, размер пакета {batch_size}")
+    evaluation_results, counters = await evaluation_cache.evaluate_batch_async(
+        items,
+        batch_size=batch_size,
+        concurrency=EVALUATION_BATCH_CONCURRENCY,
+        force=request.force
+    )
+    
+    def save_batch(session: Session) -> dict:
+        saved = {}
+        for item_id, evaluation_result in evaluation_results.items():
+            call_id = int(item_id)
+            if isinstance(evaluation_result, Exception):
+                errors[call_id] = str(evaluation_result)
+                continue
+            saved[call_id] = add_evaluation(session, call_id, evaluation_result, is_retest=True)
+        return saved
+    
+    evaluations = await db.run_sync(save_batch)
+    await db.commit()
+    
+    elapsed = time.monotonic() - started
+    results = []
+    for call_id in call_ids:
+        evaluation = evaluations.get(call_id)
+        if evaluation is not None:
+            results.append({
+                "call_id": call_id,
+                "status": "completed",
+                "evaluation_id": evaluation.id,
+                "итоговая_оценка": evaluation.итоговая_оценка
+            })
+        else:
+            results.append({
+                "call_id": call_id,
+                "status": "failed",
+                "error": errors.get(call_id, "Оценка не получена")
+            })
     
+    logger.info(f"Пакетная оценка завершена: {len(evaluations)} из {len(call_ids)} за {elapsed:.1f}с")
+    
+    return {
+        "requested": len(call_ids),
+        "completed": len(evaluations),
+        "failed": len(call_ids) - len(evaluations),
+        "cached": counters["cached"],
+        "batch_size": batch_size,
+        "batches": counters["batches"],
+        "provider_requests": counters["provider_requests"],
+        "single_retries": counters["single_retries"],
+        "duration_seconds": round(elapsed, 2),
+        "calls_per_minute": round(len(evaluations) / elapsed * 60, 1) if elapsed > 0 else None,
+        "results": results
+    }
+
+def apply_call_filters(query, manager: Optional[str], start_date: Optional[str], end_date: Optional[str]):
     if manager:
         query = query.filter(Call.manager == manager)
     
@@ -302,59 +534,161 @@ async def get_calls(
         except:
             pass
     
-    calls = query.order_by(Call.created_at.desc()).all()
-    
-    if not calls:
-        return {"calls": []}
+    return query
+
+def validate_score_filter(criterion: Optional[str], score: Optional[float]):
+    if (criterion is None) != (score is None):
+        raise HTTPException(status_code=400, detail="Параметры criterion и score задаются вместе")
+    if criterion is not None and criterion not in CRITERIA_KEYS:
+        raise HTTPException(status_code=400, detail=f"Неизвестный критерий: {criterion}")
+
+def apply_score_filter(query, criterion: Optional[str], score: Optional[float]):
+    validate_score_filter(criterion, score)
+    if criterion is None:
+        return query
+    
+    matching = select(EvaluationScore.evaluation_id).where(
+        EvaluationScore.criterion == criterion,
+        EvaluationScore.score == score
+    )
+    return query.filter(Call.latest_evaluation_id.in_(matching))
+
+CALL_LIST_FIELDS = ("id", "filename", "manager", "call_date", "call_identifier", "created_at", "evaluation")
+
+def parse_call_fields(fields: Optional[str]) -> tuple:
+    if not fields:
+        return CALL_LIST_FIELDS
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested - set(CALL_LIST_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Неизвестные поля: {', '.join(sorted(unknown))}. Допустимые: {', '.join(CALL_LIST_FIELDS)}")
+    return tuple(field for field in CALL_LIST_FIELDS if field in requested or field == "id")
+
+@router.get("/calls")
+async def get_calls(
+    manager: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    limit: int = CALLS_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    criterion: Optional[str] = None,
+    score: Optional[float] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    selected_fields = parse_call_fields(fields)
+    limit = max(1, min(limit, CALLS_PAGE_MAX_SIZE))
+    try:
+        position = decode_cursor(cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    columns = {Call.id, Call.created_at, Call.latest_evaluation_id}
+    for field in selected_fields:
+        if field != "evaluation":
+            columns.add(getattr(Call, field))
+    
+    query = select(Call).options(load_only(*columns))
+    query = apply_call_filters(query, manager, start_date, end_date)
+    query = apply_score_filter(query, criterion, score)
+    
+    if position:
+        created_at, call_id = position
+        query = query.filter(
+            or_(
+                Call.created_at < created_at,
+                and_(Call.created_at == created_at, Call.id < call_id)
+            )
+        )
     
-    call_ids = [call.id for call in calls]
+    calls = (await db.execute(
+        query.order_by(Call.created_at.desc(), Call.id.desc()).limit(limit + 1)
+    )).scalars().all()
     
-    latest_eval_subq = db.query(
-        Evaluation.call_id,
-        func.max(Evaluation.created_at).label('max_created_at')
-    ).filter(
-        Evaluation.call_id.in_(call_ids)
-    ).group_by(Evaluation.call_id).subquery()
+    next_cursor = None
+    if len(calls) > limit:
+        calls = calls[:limit]
+        next_cursor = encode_cursor(calls[-1].created_at, calls[-1].id)
     
-    latest_evaluations = db.query(Evaluation).join(
-        latest_eval_subq,
-        (Evaluation.call_id == latest_eval_subq.c.call_id) &
-        (Evaluation.created_at == latest_eval_subq.c.max_created_at)
-    ).order_by(desc(Evaluation.id)).all()
+    if not calls:
+        return {"calls": [], "next_cursor": None}
     
     eval_dict = {}
-    for ev in latest_evaluations:
-        if ev.call_id not in eval_dict:
-            eval_dict[ev.call_id] = ev
+    if "evaluation" in selected_fields:
+        evaluation_ids = [call.latest_evaluation_id for call in calls if call.latest_evaluation_id]
+        latest_evaluations = (await db.execute(
+            select(Evaluation.call_id, Evaluation.итоговая_оценка, Evaluation.нарушения)
+            .where(Evaluation.id.in_(evaluation_ids))
+        )).all() if evaluation_ids else []
+        eval_dict = {ev.call_id: ev for ev in latest_evaluations}
     
     result = []
     for call in calls:
-        latest_evaluation = eval_dict.get(call.id)
-        
-        result.append({
-            "id": call.id,
-            "filename": call.filename,
-            "manager": call.manager,
-            "call_date": call.call_date.isoformat() if call.call_date else None,
-            "call_identifier": call.call_identifier,
-            "created_at": call.created_at.isoformat(),
-            "evaluation": {
-                "итоговая_оценка": latest_evaluation.итоговая_оценка if latest_evaluation else None,
-                "нарушения": latest_evaluation.нарушения if latest_evaluation else False
-            } if latest_evaluation else None
-        })
-    
-    return {"calls": result}
+        item = {}
+        for field in selected_fields:
+            if field == "evaluation":
+                latest_evaluation = eval_dict.get(call.id)
+                item["evaluation"] = {
+                    "итоговая_оценка": latest_evaluation.итоговая_оценка,
+                    "нарушения": latest_evaluation.нарушения
+                } if latest_evaluation else None
+            elif field in ("call_date", "created_at"):
+                value = getattr(call, field)
+                item[field] = value.isoformat() if value else None
+            else:
+                item[field] = getattr(call, field)
+        result.append(item)
+    
+    return {"calls": result, "next_cursor": next_cursor}
+
+def parse_stats_date(value: Optional[str]):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Некорректная дата: {value}")
+
+@router.get("/stats/managers")
+async def get_manager_stats(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    return {
+        "managers": await db.run_sync(manager_stats, parse_stats_date(start_date), parse_stats_date(end_date))
+    }
+
+@router.get("/stats/periods")
+async def get_period_stats(
+    period: str = "month",
+    manager: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    if period not in PERIODS:
+        raise HTTPException(status_code=400, detail=f"period должен быть одним из: {', '.join(PERIODS)}")
+    return {
+        "period": period,
+        "manager": manager,
+        "periods": await db.run_sync(period_stats, period, manager, parse_stats_date(start_date), parse_stats_date(end_date))
+    }
+
+@router.post("/stats/rebuild")
+async def rebuild_stats():
+    calls = await asyncio.to_thread(rebuild_rollups)
+    return {"status": "rebuilt", "calls": calls}
 
 @router.get("/calls/{call_id}")
-async def get_call(call_id: int, db: Session = Depends(get_db)):
-    call = db.query(Call).filter(Call.id == call_id).first()
+async def get_call(call_id: int, db: AsyncSession = Depends(get_async_db)):
+    call = await db.get(Call, call_id)
     if not call:
         raise HTTPException(status_code=404, detail="Call not found")
     
-    evaluations = db.query(Evaluation).filter(
-        Evaluation.call_id == call_id
-    ).order_by(Evaluation.created_at.desc()).all()
+    evaluations = (await db.execute(
+        select(Evaluation).where(Evaluation.call_id == call_id).order_by(Evaluation.created_at.desc())
+    )).scalars().all()
     
     return {
         "id": call.id,
@@ -379,234 +713,90 @@ async def get_call(call_id: int, db: Session = Depends(get_db)):
         ]
     }
 
+@router.get("/calls/{call_id}/timings")
+async def get_call_timings(call_id: int, db: AsyncSession = Depends(get_async_db)):
+    call = await db.get(Call, call_id)
+    if not call:
+        raise HTTPException(status_code=404, detail="Call not found")
+    
+    return {"call_id": call_id, "runs": await db.run_sync(call_timings, call_id)}
+
+@router.get("/admin/timings")
+async def get_timing_stats(hours: float = 24, operation: Optional[str] = None, db: AsyncSession = Depends(get_async_db)):
+    if hours <= 0 or hours > CALL_TIMINGS_STATS_MAX_HOURS:
+        raise HTTPException(status_code=400, detail=f"hours должен быть от 0 до {CALL_TIMINGS_STATS_MAX_HOURS}")
+    since = datetime.utcnow() - timedelta(hours=hours)
+    return {
+        "since": since.isoformat(),
+        "hours": hours,
+        "stages": await db.run_sync(stage_stats, since, operation)
+    }
+
+def stream_export_rows(manager: Optional[str], start_date: Optional[str], end_date: Optional[str],
+                       criterion: Optional[str] = None, score: Optional[float] = None):
+    db_local = SessionLocal()
+    try:
+        yield csv_header()
+        
+        query = select(Call, Evaluation).outerjoin(
+            Evaluation, Evaluation.id == Call.latest_evaluation_id
+        )
+        query = apply_call_filters(query, manager, start_date, end_date)
+        query = apply_score_filter(query, criterion, score)
+        query = query.order_by(Call.created_at.desc(), Call.id.desc()).execution_options(yield_per=EXPORT_BATCH_SIZE)
+        
+        rows = []
+        exported = 0
+        for idx, (call, evaluation) in enumerate(db_local.execute(query), 1):
+            if evaluation is None:
+                continue
+            rows.append(export_row(idx, call, evaluation))
+            if len(rows) >= EXPORT_BATCH_SIZE:
+                exported += len(rows)
+                yield csv_chunk(rows).encode("utf-8")
+                rows = []
+        
+        if rows:
+            exported += len(rows)
+            yield csv_chunk(rows).encode("utf-8")
+        logger.info(f"Экспорт завершен: {exported} строк")
+    finally:
+        db_local.close()
+
 @router.get("/export")
 async def export_calls(
     manager: Optional[str] = None,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    db: Session = Depends(get_db)
+    criterion: Optional[str] = None,
+    score: Optional[float] = None
 ):
-    query = db.query(Call)
-    
-    if manager:
-        query = query.filter(Call.manager == manager)
-    
-    if start_date:
-        try:
-            start_dt = datetime.fromisoformat(start_date.replace("Z", "+00:00"))
-            query = query.filter(Call.call_date >= start_dt)
-        except:
-            pass
-    
-    if end_date:
-        try:
-            end_dt = datetime.fromisoformat(end_date.replace("Z", "+00:00"))
-            query = query.filter(Call.call_date <= end_dt)
-        except:
-            pass
-    
-    calls = query.order_by(Call.created_at.desc()).all()
-    
-    if not calls:
-        output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerow([
-            "Номер", "Дата звонка", "Дата оценки", "Месяц оценки", "Длительность звонка", "Менеджер",
-            "Установление контакта", "Квалификация", "Выявление потребностей", "", "", "Презентация", "", "", "",
-            "Работа с возражениями", "Завершение сделки", "Голосовые характеристики", "", "Итоговая оценка"
-        ])
-        writer.writerow([
-            "", "", "", "", "", "",
-            "1 Приветствие", "2 Первичная квалификация",
-            "3.1 Вопросы вторичной квалификации", "3.2 Вопрос о цели обучения", "3.3 Резюмирование потребности",
-            "4.1 Презентация обучения из потребности", "4.2 Презентация формата обучения", "4.3 Презентация стоимости", "4.4 Озвучивание информации для пробного",
-            "5 Уточнить сомнение клиента",
-            "6 Завершение сделки",
-            "7.1 Грамотность и формулировки", "7.2 Инициатива за ведение диалога",
-            ""
-        ])
-        output.seek(0)
-        csv_content = output.getvalue().encode("utf-8-sig")
-        return Response(
-            content=csv_content,
-            media_type="text/csv; charset=utf-8-sig",
-            headers={
-                "Content-Disposition": f'attachment; filename="calls_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv"'
-            }
-        )
-    
-    call_ids = [call.id for call in calls]
-    
-    latest_eval_subq = db.query(
-        Evaluation.call_id,
-        func.max(Evaluation.created_at).label('max_created_at')
-    ).filter(
-        Evaluation.call_id.in_(call_ids)
-    ).group_by(Evaluation.call_id).subquery()
-    
-    latest_evaluations = db.query(Evaluation).join(
-        latest_eval_subq,
-        (Evaluation.call_id == latest_eval_subq.c.call_id) &
-        (Evaluation.created_at == latest_eval_subq.c.max_created_at)
-    ).order_by(desc(Evaluation.id)).all()
-    
-    eval_dict = {}
-    for ev in latest_evaluations:
-        if ev.call_id not in eval_dict:
-            eval_dict[ev.call_id] = ev
-    
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    writer.writerow([
-        "Номер", "Дата звонка", "Дата оценки", "Месяц оценки", "Длительность звонка", "Менеджер",
-        "Установление контакта", "Квалификация", "Выявление потребностей", "", "", "Презентация", "", "", "",
-        "Работа с возражениями", "Завершение сделки", "Голосовые характеристики", "", "Итоговая оценка"
-    ])
-    
-    writer.writerow([
-        "", "", "", "", "", "",
-        "1 Приветствие", "2 Первичная квалификация",
-        "3.1 Вопросы вторичной квалификации", "3.2 Вопрос о цели обучения", "3.3 Резюмирование потребности",
-        "4.1 Презентация обучения из потребности", "4.2 Презентация формата обучения", "4.3 Презентация стоимости", "4.4 Озвучивание информации для пробного",
-        "5 Уточнить сомнение клиента",
-        "6 Завершение сделки",
-        "7.1 Грамотность и формулировки", "7.2 Инициатива за ведение диалога",
-        ""
-    ])
-    
-    for idx, call in enumerate(calls, 1):
-        latest_evaluation = eval_dict.get(call.id)
-        
-        if not latest_evaluation:
-            continue
-        
-        scores = latest_evaluation.scores or {}
-        evaluation_date = latest_evaluation.created_at
-        
-        month_names = {
-            1: "январь", 2: "февраль", 3: "март", 4: "апрель",
-            5: "май", 6: "июнь", 7: "июль", 8: "август",
-            9: "сентябрь", 10: "октябрь", 11: "ноябрь", 12: "декабрь"
-        }
-        month = ""
-        if evaluation_date:
-            month = month_names.get(evaluation_date.month, "")
-        
-        row = [
-            idx,
-            call.call_date.strftime("%Y-%m-%d") if call.call_date else "",
-            evaluation_date.strftime("%Y-%m-%d %H:%M:%S") if evaluation_date else "",
-            month,
-            call.duration or "",
-            call.manager or "",
-            scores.get("1", {}).get("score", ""),
-            scores.get("2", {}).get("score", ""),
-            scores.get("3.1", {}).get("score", ""),
-            scores.get("3.2", {}).get("score", ""),
-            scores.get("3.3", {}).get("score", ""),
-            scores.get("4.1", {}).get("score", ""),
-            scores.get("4.2", {}).get("score", ""),
-            scores.get("4.3", {}).get("score", ""),
-            scores.get("4.4", {}).get("score", ""),
-            scores.get("5", {}).get("score", ""),
-            scores.get("6", {}).get("score", ""),
-            scores.get("7.1", {}).get("score", ""),
-            scores.get("7.2", {}).get("score", ""),
-            latest_evaluation.итоговая_оценка or ""
-        ]
-        
-        writer.writerow(row)
-    
-    output.seek(0)
-    csv_content = output.getvalue().encode("utf-8-sig")
-    
-    return Response(
-        content=csv_content,
-        media_type="text/csv; charset=utf-8-sig",
+    validate_score_filter(criterion, score)
+    return StreamingResponse(
+        stream_export_rows(manager, start_date, end_date, criterion, score),
+        media_type=CSV_MEDIA_TYPE,
         headers={
             "Content-Disposition": f'attachment; filename="calls_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv"'
         }
     )
 
 @router.get("/export/{call_id}")
-async def export_call(call_id: int, db: Session = Depends(get_db)):
-    call = db.query(Call).filter(Call.id == call_id).first()
+async def export_call(call_id: int, db: AsyncSession = Depends(get_async_db)):
+    call = await db.get(Call, call_id)
     if not call:
         raise HTTPException(status_code=404, detail="Call not found")
     
-    latest_evaluation = db.query(Evaluation).filter(
-        Evaluation.call_id == call_id
-    ).order_by(Evaluation.created_at.desc()).first()
+    latest_evaluation = await db.get(Evaluation, call.latest_evaluation_id) if call.latest_evaluation_id else None
     
     if not latest_evaluation:
         raise HTTPException(status_code=400, detail="No evaluation found for this call")
     
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    writer.writerow([
-        "Номер", "Дата звонка", "Дата оценки", "Месяц оценки", "Длительность звонка", "Менеджер",
-        "Установление контакта", "Квалификация", "Выявление потребностей", "", "", "Презентация", "", "", "",
-        "Работа с возражениями", "Завершение сделки", "Голосовые характеристики", "", "Итоговая оценка"
-    ])
-    
-    writer.writerow([
-        "", "", "", "", "", "",
-        "1 Приветствие", "2 Первичная квалификация",
-        "3.1 Вопросы вторичной квалификации", "3.2 Вопрос о цели обучения", "3.3 Резюмирование потребности",
-        "4.1 Презентация обучения из потребности", "4.2 Презентация формата обучения", "4.3 Презентация стоимости", "4.4 Озвучивание информации для пробного",
-        "5 Уточнить сомнение клиента",
-        "6 Завершение сделки",
-        "7.1 Грамотность и формулировки", "7.2 Инициатива за ведение диалога",
-        ""
-    ])
-    
-    scores = latest_evaluation.scores or {}
-    evaluation_date = latest_evaluation.created_at
-    
-    month_names = {
-        1: "январь", 2: "февраль", 3: "март", 4: "апрель",
-        5: "май", 6: "июнь", 7: "июль", 8: "август",
-        9: "сентябрь", 10: "октябрь", 11: "ноябрь", 12: "декабрь"
-    }
-    month = ""
-    if evaluation_date:
-        month = month_names.get(evaluation_date.month, "")
-    
-    row = [
-        1,
-        call.call_date.strftime("%Y-%m-%d") if call.call_date else "",
-        evaluation_date.strftime("%Y-%m-%d %H:%M:%S") if evaluation_date else "",
-        month,
-        call.duration or "",
-        call.manager or "",
-        scores.get("1", {}).get("score", ""),
-        scores.get("2", {}).get("score", ""),
-        scores.get("3.1", {}).get("score", ""),
-        scores.get("3.2", {}).get("score", ""),
-        scores.get("3.3", {}).get("score", ""),
-        scores.get("4.1", {}).get("score", ""),
-        scores.get("4.2", {}).get("score", ""),
-        scores.get("4.3", {}).get("score", ""),
-        scores.get("4.4", {}).get("score", ""),
-        scores.get("5", {}).get("score", ""),
-        scores.get("6", {}).get("score", ""),
-        scores.get("7.1", {}).get("score", ""),
-        scores.get("7.2", {}).get("score", ""),
-        latest_evaluation.итоговая_оценка or ""
-    ]
-    
-    writer.writerow(row)
-    
-    output.seek(0)
-    csv_content = output.getvalue().encode("utf-8-sig")
+    csv_content = csv_header() + csv_chunk([export_row(1, call, latest_evaluation)]).encode("utf-8")
     
     return Response(
         content=csv_content,
-        media_type="text/csv; charset=utf-8-sig",
+        media_type=CSV_MEDIA_TYPE,
         headers={
             "Content-Disposition": f'attachment; filename="call_{call_id}_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv"'
         }
     )
-
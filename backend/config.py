@@ -4,7 +4,99 @@ from dotenv import load_dotenv
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./ai_coach.db")
+AI_PROVIDER = os.getenv("AI_PROVIDER", "gemini")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
 GEMINI_TRANSCRIPTION_MODEL = os.getenv("GEMINI_TRANSCRIPTION_MODEL", "gemini-2.5-flash")
 GEMINI_EVALUATION_MODEL = os.getenv("GEMINI_EVALUATION_MODEL", "gemini-2.0-flash")
 
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "wal")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "15000"))
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "normal")
+
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "2"))
+ANALYSIS_JOB_LEASE_SECONDS = int(os.getenv("ANALYSIS_JOB_LEASE_SECONDS", "120"))
+ANALYSIS_JOB_MAX_ATTEMPTS = int(os.getenv("ANALYSIS_JOB_MAX_ATTEMPTS", "3"))
+ANALYSIS_QUEUE_POLL_INTERVAL = float(os.getenv("ANALYSIS_QUEUE_POLL_INTERVAL", "2"))
+PROGRESS_FLUSH_INTERVAL = float(os.getenv("PROGRESS_FLUSH_INTERVAL", "2"))
+PROGRESS_STATE_MAX_CALLS = int(os.getenv("PROGRESS_STATE_MAX_CALLS", "10000"))
+STATUS_LONG_POLL_MAX_WAIT = float(os.getenv("STATUS_LONG_POLL_MAX_WAIT", "30"))
+
+CALL_TIMINGS_ENABLED = os.getenv("CALL_TIMINGS_ENABLED", "true").lower() == "true"
+CALL_TIMINGS_RETENTION_DAYS = int(os.getenv("CALL_TIMINGS_RETENTION_DAYS", "30"))
+CALL_TIMINGS_STATS_MAX_HOURS = int(os.getenv("CALL_TIMINGS_STATS_MAX_HOURS", str(30 * 24)))
+
+PROGRESS_BUS = os.getenv("PROGRESS_BUS", "auto")
+PROGRESS_BUS_CHANNEL = os.getenv("PROGRESS_BUS_CHANNEL", "call_progress")
+PROGRESS_BUS_SQLITE_PATH = os.getenv("PROGRESS_BUS_SQLITE_PATH", "./progress_bus.db")
+PROGRESS_BUS_POLL_INTERVAL = float(os.getenv("PROGRESS_BUS_POLL_INTERVAL", "0.2"))
+
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "32"))
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "5"))
+WS_HEARTBEAT_INTERVAL = float(os.getenv("WS_HEARTBEAT_INTERVAL", "20"))
+WS_HEARTBEAT_EVICT = os.getenv("WS_HEARTBEAT_EVICT", "false").lower() == "true"
+
+MAX_UPLOAD_SIZE_MB = int(os.getenv("MAX_UPLOAD_SIZE_MB", "200"))
+MAX_UPLOAD_REQUEST_SIZE_MB = int(os.getenv("MAX_UPLOAD_REQUEST_SIZE_MB", "1024"))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+CALLS_PAGE_SIZE = int(os.getenv("CALLS_PAGE_SIZE", "50"))
+CALLS_PAGE_MAX_SIZE = int(os.getenv("CALLS_PAGE_MAX_SIZE", "500"))
+
+TRANSCRIPTION_CACHE_ENABLED = os.getenv("TRANSCRIPTION_CACHE_ENABLED", "true").lower() == "true"
+
+EVALUATION_CACHE_ENABLED = os.getenv("EVALUATION_CACHE_ENABLED", "true").lower() == "true"
+EVALUATION_CACHE_MAX_ITEMS = int(os.getenv("EVALUATION_CACHE_MAX_ITEMS", "512"))
+EVALUATION_CACHE_TTL_SECONDS = int(os.getenv("EVALUATION_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+
+EVALUATION_BATCH_SIZE = int(os.getenv("EVALUATION_BATCH_SIZE", "5"))
+EVALUATION_BATCH_MAX_SIZE = int(os.getenv("EVALUATION_BATCH_MAX_SIZE", "20"))
+EVALUATION_BATCH_MAX_CALLS = int(os.getenv("EVALUATION_BATCH_MAX_CALLS", "500"))
+EVALUATION_BATCH_CONCURRENCY = int(os.getenv("EVALUATION_BATCH_CONCURRENCY", "2"))
+EVALUATION_BATCH_MAX_OUTPUT_TOKENS = int(os.getenv("EVALUATION_BATCH_MAX_OUTPUT_TOKENS", "32768"))
+
+GEMINI_PROMPT_CACHE_ENABLED = os.getenv("GEMINI_PROMPT_CACHE_ENABLED", "false").lower() == "true"
+GEMINI_PROMPT_CACHE_TTL_SECONDS = int(os.getenv("GEMINI_PROMPT_CACHE_TTL_SECONDS", "3600"))
+
+GEMINI_TRANSCRIPTION_RPM = int(os.getenv("GEMINI_TRANSCRIPTION_RPM", "30"))
+GEMINI_TRANSCRIPTION_TPM = int(os.getenv("GEMINI_TRANSCRIPTION_TPM", "0"))
+GEMINI_EVALUATION_RPM = int(os.getenv("GEMINI_EVALUATION_RPM", "60"))
+GEMINI_EVALUATION_TPM = int(os.getenv("GEMINI_EVALUATION_TPM", "0"))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "5"))
+GEMINI_RETRY_BASE_DELAY = float(os.getenv("GEMINI_RETRY_BASE_DELAY", "2"))
+GEMINI_RETRY_MAX_DELAY = float(os.getenv("GEMINI_RETRY_MAX_DELAY", "60"))
+
+FAKE_AI_TRANSCRIPTION_LATENCY_MS = float(os.getenv("FAKE_AI_TRANSCRIPTION_LATENCY_MS", "3000"))
+FAKE_AI_EVALUATION_LATENCY_MS = float(os.getenv("FAKE_AI_EVALUATION_LATENCY_MS", "1500"))
+FAKE_AI_LATENCY_SIGMA = float(os.getenv("FAKE_AI_LATENCY_SIGMA", "0.3"))
+FAKE_AI_UPLOAD_MS_PER_MB = float(os.getenv("FAKE_AI_UPLOAD_MS_PER_MB", "100"))
+FAKE_AI_PROCESSING_SECONDS = float(os.getenv("FAKE_AI_PROCESSING_SECONDS", "1"))
+FAKE_AI_RATE_LIMIT_RATE = float(os.getenv("FAKE_AI_RATE_LIMIT_RATE", "0"))
+FAKE_AI_ERROR_RATE = float(os.getenv("FAKE_AI_ERROR_RATE", "0"))
+FAKE_AI_RETRY_AFTER_SECONDS = float(os.getenv("FAKE_AI_RETRY_AFTER_SECONDS", "1"))
+FAKE_AI_TRANSCRIPT_PATH = os.getenv("FAKE_AI_TRANSCRIPT_PATH", "")
+FAKE_AI_SEED = int(os.getenv("FAKE_AI_SEED")) if os.getenv("FAKE_AI_SEED") else None
+
+FFMPEG_BINARY = os.getenv("FFMPEG_BINARY", "ffmpeg")
+TRANSCRIPTION_SEGMENT_ENABLED = os.getenv("TRANSCRIPTION_SEGMENT_ENABLED", "false").lower() == "true"
+TRANSCRIPTION_SEGMENT_MIN_DURATION = float(os.getenv("TRANSCRIPTION_SEGMENT_MIN_DURATION", "900"))
+TRANSCRIPTION_SEGMENT_SECONDS = float(os.getenv("TRANSCRIPTION_SEGMENT_SECONDS", "600"))
+TRANSCRIPTION_SEGMENT_OVERLAP_SECONDS = float(os.getenv("TRANSCRIPTION_SEGMENT_OVERLAP_SECONDS", "6"))
+TRANSCRIPTION_SEGMENT_CONCURRENCY = int(os.getenv("TRANSCRIPTION_SEGMENT_CONCURRENCY", "4"))
+
+TRANSCRIPTION_BACKEND = os.getenv("TRANSCRIPTION_BACKEND", "provider")
+LOCAL_ASR_MODEL = os.getenv("LOCAL_ASR_MODEL", "small")
+LOCAL_ASR_MODEL_DIR = os.getenv("LOCAL_ASR_MODEL_DIR", "")
+LOCAL_ASR_COMPUTE_TYPE = os.getenv("LOCAL_ASR_COMPUTE_TYPE", "int8")
+LOCAL_ASR_WORKERS = int(os.getenv("LOCAL_ASR_WORKERS", "1"))
+LOCAL_ASR_CPU_THREADS = int(os.getenv("LOCAL_ASR_CPU_THREADS", "4"))
+LOCAL_ASR_BEAM_SIZE = int(os.getenv("LOCAL_ASR_BEAM_SIZE", "1"))
+LOCAL_ASR_LANGUAGE = os.getenv("LOCAL_ASR_LANGUAGE", "ru")
+LOCAL_ASR_VAD_FILTER = os.getenv("LOCAL_ASR_VAD_FILTER", "true").lower() == "true"
+LOCAL_ASR_MAX_DURATION = float(os.getenv("LOCAL_ASR_MAX_DURATION", "900"))
+LOCAL_ASR_FALLBACK = os.getenv("LOCAL_ASR_FALLBACK", "true").lower() == "true"
@@ -5,15 +5,33 @@ import logging.config
 import json
 import time
 from fastapi import Request
+from fastapi.responses import Response
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from api.routes import router
-from models import init_db
+from api.routes import router, analyze_in_background, load_call_status
+from models import init_db, async_engine, AsyncSessionLocal
 from services.websocket_service import manager
-from config import GEMINI_API_KEY, DATABASE_URL
+from services.job_queue import job_queue
+from services.progress_service import progress_aggregator, deliver_progress
+from services.progress_bus import progress_bus
+from services.evaluation_cache import evaluation_cache
+from services.providers import provider
+from services.local_asr import local_asr
+from services.stats_service import ensure_rollups
+from services.timing_service import purge_timings
+from utils.metrics import (
+    QUEUE_JOBS,
+    QUEUE_OLDEST_WAIT_SECONDS,
+    WEBSOCKET_CONNECTIONS,
+    WEBSOCKET_MESSAGES,
+    observe_http_request,
+    render_metrics,
+)
+from utils.upload import UploadSizeLimitMiddleware
+from config import GEMINI_API_KEY, DATABASE_URL, MAX_UPLOAD_SIZE_MB, MAX_UPLOAD_REQUEST_SIZE_MB
 
 config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logging_config.json")
 with open(config_path, "r") as f:
@@ -35,9 +53,18 @@ async def log_requests(request: Request, call_next):
     logger.info(f"Входящий запрос: {request.method} {request.url.path} | Origin: {origin}")
     response = await call_next(request)
     process_time = time.time() - start_time
+    route = request.scope.get("route")
+    observe_http_request(request.method, getattr(route, "path", "unmatched"), response.status_code, process_time)
     logger.info(f"Запрос {request.method} {request.url.path} выполнен за {process_time:.2f}с, статус: {response.status_code}")
     return response
 
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    path="/api/upload",
+    max_file_bytes=MAX_UPLOAD_SIZE_MB * 1024 * 1024,
+    max_request_bytes=MAX_UPLOAD_REQUEST_SIZE_MB * 1024 * 1024
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -50,17 +77,26 @@ app.include_router(router, prefix="/api", tags=["api"])
 
 @app.websocket("/ws/analyze/{call_id}")
 async def websocket_analyze(websocket: WebSocket, call_id: int):
-    await manager.connect(websocket, call_id)
+    async def load_state():
+        async with AsyncSessionLocal() as db:
+            return await load_call_status(call_id, db)
+
+    await manager.connect(websocket, call_id, load_state)
     try:
         while True:
             await websocket.receive_text()
+            manager.touch(websocket, call_id)
     except WebSocketDisconnect:
+        pass
+    finally:
         manager.disconnect(websocket, call_id)
 
 @app.on_event("startup")
 async def startup_event():
     try:
-        if not GEMINI_API_KEY or GEMINI_API_KEY.strip() == "":
+        if provider.name != "gemini":
+            logger.info(f"AI-провайдер: {provider.name}")
+        elif not provider.is_configured():
             logger.warning("GEMINI_API_KEY не установлен или пустой. Транскрипция и оценка не будут работать.")
         else:
             logger.info("GEMINI_API_KEY настроен")
@@ -72,16 +108,27 @@ async def startup_event():
         
         init_db()
         logger.info("База данных инициализирована")
-        import asyncio
-        try:
-            loop = asyncio.get_running_loop()
-        except RuntimeError:
-            loop = asyncio.get_event_loop()
-        manager.set_event_loop(loop)
+        evaluation_cache.purge_stale()
+        purge_timings()
+        ensure_rollups()
+        local_asr.start()
+        manager.start()
+        await progress_bus.start(deliver_progress)
+        progress_aggregator.start()
+        job_queue.start(analyze_in_background)
     except Exception as e:
         logger.error(f"Ошибка инициализации БД: {e}")
         raise
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await job_queue.stop()
+    local_asr.stop()
+    await progress_aggregator.stop()
+    await progress_bus.stop()
+    await manager.stop()
+    await async_engine.dispose()
+
 @app.get("/")
 def read_root():
     return {"message": "AI Coach API", "status": "ok"}
@@ -90,6 +137,23 @@ def read_root():
 def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics")
+async def metrics():
+    websocket_stats = manager.stats()
+    WEBSOCKET_CONNECTIONS.set(websocket_stats["connections"])
+    for result in ("queued", "sent", "dropped", "evicted"):
+        WEBSOCKET_MESSAGES.labels(result).set(websocket_stats[result])
+    try:
+        async with AsyncSessionLocal() as db:
+            queue_stats = await db.run_sync(job_queue.stats)
+        QUEUE_JOBS.labels("queued").set(queue_stats["queued"])
+        QUEUE_JOBS.labels("running").set(queue_stats["running"])
+        QUEUE_OLDEST_WAIT_SECONDS.set(queue_stats["oldest_queued_wait_seconds"])
+    except Exception as e:
+        logger.warning(f"Не удалось получить состояние очереди для метрик: {e}")
+    content, content_type = render_metrics()
+    return Response(content=content, headers={"Content-Type": content_type})
+
 @app.get("/api/health")
 def api_health_check():
     return {"status": "healthy", "message": "AI Coach API is running"}
@@ -97,9 +161,10 @@ def api_health_check():
 @app.get("/api/config/check")
 def check_config():
     config_status = {
+        "ai_provider": provider.name,
         "gemini_api_key": "configured" if GEMINI_API_KEY and GEMINI_API_KEY.strip() != "" else "missing",
         "database_url": "configured" if DATABASE_URL and DATABASE_URL.strip() != "" else "missing",
-        "status": "ok" if (GEMINI_API_KEY and GEMINI_API_KEY.strip() != "") and (DATABASE_URL and DATABASE_URL.strip() != "") else "incomplete"
+        "status": "ok" if provider.is_configured() and (DATABASE_URL and DATABASE_URL.strip() != "") else "incomplete"
     }
     return config_status
 
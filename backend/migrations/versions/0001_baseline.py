@@ -0,0 +1,125 @@
+"""baseline schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 00:00:00
+
+Idempotent: databases created earlier by create_all() and migrate_db()
+already have some or all of these tables and columns.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+CALL_COLUMNS = [
+    ("status", sa.String, {"server_default": "pending"}),
+    ("progress", sa.Integer, {"server_default": "0"}),
+    ("audio_sha256", sa.String, {}),
+    ("file_size", sa.Integer, {}),
+    ("audio_format", sa.String, {}),
+    ("latest_evaluation_id", sa.Integer, {}),
+]
+
+def _tables():
+    return set(sa.inspect(op.get_bind()).get_table_names())
+
+def upgrade():
+    tables = _tables()
+
+    if "calls" not in tables:
+        op.create_table(
+            "calls",
+            sa.Column("id", sa.Integer, primary_key=True, index=True),
+            sa.Column("filename", sa.String, nullable=False),
+            sa.Column("audio_url", sa.String),
+            sa.Column("transcription", sa.Text),
+            sa.Column("duration", sa.Float),
+            sa.Column("audio_sha256", sa.String),
+            sa.Column("file_size", sa.Integer),
+            sa.Column("audio_format", sa.String),
+            sa.Column("manager", sa.String),
+            sa.Column("call_date", sa.DateTime),
+            sa.Column("call_identifier", sa.String),
+            sa.Column("created_at", sa.DateTime),
+            sa.Column("status", sa.String, server_default="pending"),
+            sa.Column("progress", sa.Integer, server_default="0"),
+            sa.Column("latest_evaluation_id", sa.Integer),
+        )
+    else:
+        columns = {col["name"] for col in sa.inspect(op.get_bind()).get_columns("calls")}
+        for name, column_type, kwargs in CALL_COLUMNS:
+            if name not in columns:
+                op.add_column("calls", sa.Column(name, column_type, **kwargs))
+        if "latest_evaluation_id" not in columns and "evaluations" in tables:
+            op.execute("""
+                UPDATE calls SET latest_evaluation_id = (
+                    SELECT e.id FROM evaluations e
+                    WHERE e.call_id = calls.id
+                    ORDER BY e.created_at DESC, e.id DESC
+                    LIMIT 1
+                )
+                WHERE latest_evaluation_id IS NULL
+            """)
+
+    if "evaluations" not in tables:
+        op.create_table(
+            "evaluations",
+            sa.Column("id", sa.Integer, primary_key=True, index=True),
+            sa.Column("call_id", sa.Integer, sa.ForeignKey("calls.id"), nullable=False),
+            sa.Column("scores", sa.JSON),
+            sa.Column("итоговая_оценка", sa.Integer),
+            sa.Column("нарушения", sa.Boolean),
+            sa.Column("комментарии", sa.Text),
+            sa.Column("is_retest", sa.Boolean),
+            sa.Column("created_at", sa.DateTime),
+        )
+
+    if "analysis_jobs" not in tables:
+        op.create_table(
+            "analysis_jobs",
+            sa.Column("id", sa.Integer, primary_key=True, index=True),
+            sa.Column("call_id", sa.Integer, sa.ForeignKey("calls.id"), nullable=False),
+            sa.Column("audio_path", sa.String, nullable=False),
+            sa.Column("status", sa.String, nullable=False),
+            sa.Column("attempts", sa.Integer, nullable=False),
+            sa.Column("worker_id", sa.String),
+            sa.Column("lease_expires_at", sa.DateTime),
+            sa.Column("error", sa.Text),
+            sa.Column("created_at", sa.DateTime),
+            sa.Column("started_at", sa.DateTime),
+            sa.Column("finished_at", sa.DateTime),
+        )
+
+    if "transcription_cache" not in tables:
+        op.create_table(
+            "transcription_cache",
+            sa.Column("key", sa.String, primary_key=True),
+            sa.Column("audio_sha256", sa.String, nullable=False),
+            sa.Column("model", sa.String, nullable=False),
+            sa.Column("prompt_hash", sa.String, nullable=False),
+            sa.Column("transcription", sa.Text, nullable=False),
+            sa.Column("hits", sa.Integer),
+            sa.Column("created_at", sa.DateTime),
+            sa.Column("last_hit_at", sa.DateTime),
+        )
+
+    if "evaluation_cache" not in tables:
+        op.create_table(
+            "evaluation_cache",
+            sa.Column("key", sa.String, primary_key=True),
+            sa.Column("transcription_sha256", sa.String, nullable=False),
+            sa.Column("checklist_version", sa.String, nullable=False),
+            sa.Column("model", sa.String, nullable=False),
+            sa.Column("result", sa.JSON, nullable=False),
+            sa.Column("hits", sa.Integer),
+            sa.Column("created_at", sa.DateTime),
+            sa.Column("last_hit_at", sa.DateTime),
+        )
+
+def downgrade():
+    for table in ("evaluation_cache", "transcription_cache", "analysis_jobs", "evaluations", "calls"):
+        op.drop_table(table)
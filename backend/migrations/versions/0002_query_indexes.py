@@ -0,0 +1,34 @@
+"""indexes for list, export and queue queries
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 00:00:01
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_calls_created_at_id", "calls", ["created_at", "id"]),
+    ("ix_calls_manager_call_date", "calls", ["manager", "call_date"]),
+    ("ix_calls_call_date", "calls", ["call_date"]),
+    ("ix_calls_status", "calls", ["status"]),
+    ("ix_evaluations_call_id_created_at", "evaluations", ["call_id", "created_at"]),
+    ("ix_analysis_jobs_status_id", "analysis_jobs", ["status", "id"]),
+    ("ix_analysis_jobs_call_id", "analysis_jobs", ["call_id"]),
+]
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for name, table, columns in INDEXES:
+        existing = {index["name"] for index in inspector.get_indexes(table)}
+        if name not in existing:
+            op.create_index(name, table, columns)
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
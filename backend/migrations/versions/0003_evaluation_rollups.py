@@ -0,0 +1,34 @@
+"""evaluation rollups for stats endpoints
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 00:00:02
+
+The table is filled on startup by services.stats_service.ensure_rollups().
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "evaluation_rollups",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("manager", sa.String, nullable=False, server_default=""),
+        sa.Column("period_date", sa.Date, nullable=False),
+        sa.Column("metric", sa.String, nullable=False),
+        sa.Column("evaluations", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("score_sum", sa.Float, nullable=False, server_default="0"),
+        sa.Column("max_count", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("zero_count", sa.Integer, nullable=False, server_default="0"),
+        sa.UniqueConstraint("manager", "period_date", "metric", name="uq_evaluation_rollups_key"),
+    )
+    op.create_index("ix_evaluation_rollups_period_date", "evaluation_rollups", ["period_date"])
+
+def downgrade():
+    op.drop_index("ix_evaluation_rollups_period_date", table_name="evaluation_rollups")
+    op.drop_table("evaluation_rollups")
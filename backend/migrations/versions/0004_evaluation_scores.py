@@ -0,0 +1,68 @@
+"""per-criterion evaluation scores
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 00:00:03
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 1000
+
+evaluations = sa.table(
+    "evaluations",
+    sa.column("id", sa.Integer),
+    sa.column("scores", sa.JSON),
+)
+
+evaluation_scores = sa.table(
+    "evaluation_scores",
+    sa.column("evaluation_id", sa.Integer),
+    sa.column("criterion", sa.String),
+    sa.column("score", sa.Float),
+)
+
+def _score_rows(evaluation_id, scores):
+    if not isinstance(scores, dict):
+        return []
+    return [
+        {"evaluation_id": evaluation_id, "criterion": criterion, "score": float(item["score"])}
+        for criterion, item in scores.items()
+        if isinstance(item, dict) and isinstance(item.get("score"), (int, float))
+    ]
+
+def upgrade():
+    op.create_table(
+        "evaluation_scores",
+        sa.Column("evaluation_id", sa.Integer, sa.ForeignKey("evaluations.id"), primary_key=True),
+        sa.Column("criterion", sa.String, primary_key=True),
+        sa.Column("score", sa.Float, nullable=False),
+    )
+    op.create_index("ix_evaluation_scores_criterion_score", "evaluation_scores", ["criterion", "score", "evaluation_id"])
+    op.create_index("ix_calls_latest_evaluation_id", "calls", ["latest_evaluation_id"])
+
+    connection = op.get_bind()
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(evaluations.c.id, evaluations.c.scores)
+            .where(evaluations.c.id > last_id)
+            .order_by(evaluations.c.id)
+            .limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        score_rows = [row for evaluation_id, scores in rows for row in _score_rows(evaluation_id, scores)]
+        if score_rows:
+            connection.execute(evaluation_scores.insert(), score_rows)
+        last_id = rows[-1][0]
+
+def downgrade():
+    op.drop_index("ix_calls_latest_evaluation_id", table_name="calls")
+    op.drop_index("ix_evaluation_scores_criterion_score", table_name="evaluation_scores")
+    op.drop_table("evaluation_scores")
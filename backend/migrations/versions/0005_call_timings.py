@@ -0,0 +1,36 @@
+"""per-call stage timing ledger
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 00:00:04
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "call_timings",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("call_id", sa.Integer, sa.ForeignKey("calls.id"), nullable=False),
+        sa.Column("run_id", sa.String, nullable=False),
+        sa.Column("operation", sa.String, nullable=False),
+        sa.Column("stage", sa.String, nullable=False),
+        sa.Column("started_at", sa.DateTime, nullable=False),
+        sa.Column("duration_ms", sa.Integer, nullable=False),
+        sa.Column("bytes", sa.Integer),
+        sa.Column("tokens", sa.Integer),
+        sa.Column("retries", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("status", sa.String, nullable=False, server_default="ok"),
+    )
+    op.create_index("ix_call_timings_call_id_id", "call_timings", ["call_id", "id"])
+    op.create_index("ix_call_timings_started_at", "call_timings", ["started_at"])
+
+def downgrade():
+    op.drop_index("ix_call_timings_started_at", table_name="call_timings")
+    op.drop_index("ix_call_timings_call_id_id", table_name="call_timings")
+    op.drop_table("call_timings")
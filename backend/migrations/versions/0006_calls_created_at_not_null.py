@@ -0,0 +1,29 @@
+"""backfill calls.created_at and make it NOT NULL
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 00:00:05
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    calls = sa.table("calls", sa.column("created_at", sa.DateTime), sa.column("call_date", sa.DateTime))
+    op.execute(
+        calls.update()
+        .where(calls.c.created_at.is_(None))
+        .values(created_at=sa.func.coalesce(calls.c.call_date, sa.bindparam("now", datetime.utcnow(), type_=sa.DateTime)))
+    )
+    with op.batch_alter_table("calls") as batch_op:
+        batch_op.alter_column("created_at", existing_type=sa.DateTime, nullable=False)
+
+def downgrade():
+    with op.batch_alter_table("calls") as batch_op:
+        batch_op.alter_column("created_at", existing_type=sa.DateTime, nullable=True)
@@ -1,15 +1,45 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Boolean, ForeignKey, JSON, Float
+from sqlalchemy import create_engine, Column, Integer, String, Text, Date, DateTime, Boolean, ForeignKey, JSON, Float, Index, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from datetime import datetime
-from config import DATABASE_URL
+from config import (
+    DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING,
+    SQLITE_JOURNAL_MODE, SQLITE_BUSY_TIMEOUT_MS, SQLITE_SYNCHRONOUS
+)
+from utils.db_pool import TimedAsyncQueuePool, TimedQueuePool, apply_sqlite_pragmas, engine_options, is_sqlite
+from utils.metrics import instrument_engine
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+
+def get_async_database_url(url: str) -> str:
+    scheme, separator, rest = url.partition("://")
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}{separator}{rest}"
+
+def _pool_options(pool_class) -> dict:
+    return engine_options(
+        DATABASE_URL, pool_class, DB_POOL_SIZE, DB_MAX_OVERFLOW,
+        DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING
+    )
+
 try:
-    engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+    engine = create_engine(DATABASE_URL, **_pool_options(TimedQueuePool))
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    async_engine = create_async_engine(get_async_database_url(DATABASE_URL), **_pool_options(TimedAsyncQueuePool))
+    if is_sqlite(DATABASE_URL):
+        for sqlite_engine in (engine, async_engine.sync_engine):
+            apply_sqlite_pragmas(sqlite_engine, SQLITE_JOURNAL_MODE, SQLITE_BUSY_TIMEOUT_MS, SQLITE_SYNCHRONOUS)
+    instrument_engine(engine, "sync")
+    instrument_engine(async_engine.sync_engine, "async")
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 except Exception as e:
     logger.error(f"Ошибка создания engine: {e}")
     raise
@@ -24,14 +54,26 @@ class Call(Base):
     audio_url = Column(String)
     transcription = Column(Text)
     duration = Column(Float)
+    audio_sha256 = Column(String)
+    file_size = Column(Integer)
+    audio_format = Column(String)
     manager = Column(String)
     call_date = Column(DateTime)
     call_identifier = Column(String)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     status = Column(String, default="pending")
     progress = Column(Integer, default=0)
+    latest_evaluation_id = Column(Integer)
     
     evaluations = relationship("Evaluation", back_populates="call")
+    
+    __table_args__ = (
+        Index("ix_calls_created_at_id", "created_at", "id"),
+        Index("ix_calls_manager_call_date", "manager", "call_date"),
+        Index("ix_calls_call_date", "call_date"),
+        Index("ix_calls_status", "status"),
+        Index("ix_calls_latest_evaluation_id", "latest_evaluation_id"),
+    )
 
 class Evaluation(Base):
     __tablename__ = "evaluations"
@@ -46,30 +88,108 @@ class Evaluation(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     
     call = relationship("Call", back_populates="evaluations")
+    
+    __table_args__ = (
+        Index("ix_evaluations_call_id_created_at", "call_id", "created_at"),
+    )
 
-def migrate_db():
-    from sqlalchemy import text, inspect
-    
-    try:
-        inspector = inspect(engine)
-        columns = [col['name'] for col in inspector.get_columns('calls')]
-        
-        with engine.begin() as conn:
-            if 'status' not in columns:
-                logger.info("Добавление колонки status в таблицу calls")
-                conn.execute(text("ALTER TABLE calls ADD COLUMN status TEXT DEFAULT 'pending'"))
-            
-            if 'progress' not in columns:
-                logger.info("Добавление колонки progress в таблицу calls")
-                conn.execute(text("ALTER TABLE calls ADD COLUMN progress INTEGER DEFAULT 0"))
-    except Exception as e:
-        logger.error(f"Ошибка при проверке структуры таблицы: {e}")
-        raise
+class EvaluationScore(Base):
+    __tablename__ = "evaluation_scores"
+    
+    evaluation_id = Column(Integer, ForeignKey("evaluations.id"), primary_key=True)
+    criterion = Column(String, primary_key=True)
+    score = Column(Float, nullable=False)
+    
+    __table_args__ = (
+        Index("ix_evaluation_scores_criterion_score", "criterion", "score", "evaluation_id"),
+    )
 
-def init_db():
-    Base.metadata.create_all(bind=engine)
-    try:
-        migrate_db()
-    except Exception as e:
-        logger.warning(f"Ошибка при миграции БД (возможно таблица не существует): {e}")
+class AnalysisJob(Base):
+    __tablename__ = "analysis_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    call_id = Column(Integer, ForeignKey("calls.id"), nullable=False)
+    audio_path = Column(String, nullable=False)
+    status = Column(String, default="queued", nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    worker_id = Column(String)
+    lease_expires_at = Column(DateTime)
+    error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    
+    __table_args__ = (
+        Index("ix_analysis_jobs_status_id", "status", "id"),
+        Index("ix_analysis_jobs_call_id", "call_id"),
+    )
 
+class CallTiming(Base):
+    __tablename__ = "call_timings"
+    
+    id = Column(Integer, primary_key=True)
+    call_id = Column(Integer, ForeignKey("calls.id"), nullable=False)
+    run_id = Column(String, nullable=False)
+    operation = Column(String, nullable=False)
+    stage = Column(String, nullable=False)
+    started_at = Column(DateTime, nullable=False)
+    duration_ms = Column(Integer, nullable=False)
+    bytes = Column(Integer)
+    tokens = Column(Integer)
+    retries = Column(Integer, default=0, nullable=False)
+    status = Column(String, default="ok", nullable=False)
+    
+    __table_args__ = (
+        Index("ix_call_timings_call_id_id", "call_id", "id"),
+        Index("ix_call_timings_started_at", "started_at"),
+    )
+
+class TranscriptionCacheEntry(Base):
+    __tablename__ = "transcription_cache"
+    
+    key = Column(String, primary_key=True)
+    audio_sha256 = Column(String, nullable=False)
+    model = Column(String, nullable=False)
+    prompt_hash = Column(String, nullable=False)
+    transcription = Column(Text, nullable=False)
+    hits = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_hit_at = Column(DateTime)
+
+class EvaluationCacheEntry(Base):
+    __tablename__ = "evaluation_cache"
+    
+    key = Column(String, primary_key=True)
+    transcription_sha256 = Column(String, nullable=False)
+    checklist_version = Column(String, nullable=False)
+    model = Column(String, nullable=False)
+    result = Column(JSON, nullable=False)
+    hits = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_hit_at = Column(DateTime)
+
+class EvaluationRollup(Base):
+    __tablename__ = "evaluation_rollups"
+    
+    id = Column(Integer, primary_key=True)
+    manager = Column(String, nullable=False, default="")
+    period_date = Column(Date, nullable=False)
+    metric = Column(String, nullable=False)
+    evaluations = Column(Integer, nullable=False, default=0)
+    score_sum = Column(Float, nullable=False, default=0)
+    max_count = Column(Integer, nullable=False, default=0)
+    zero_count = Column(Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        UniqueConstraint("manager", "period_date", "metric", name="uq_evaluation_rollups_key"),
+        Index("ix_evaluation_rollups_period_date", "period_date"),
+    )
+
+def init_db():
+    from alembic import command
+    from alembic.config import Config
+    
+    alembic_cfg = Config(os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini"))
+    with engine.begin() as connection:
+        alembic_cfg.attributes["connection"] = connection
+        command.upgrade(alembic_cfg, "head")
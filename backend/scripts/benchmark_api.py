@@ -0,0 +1,106 @@
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from utils.timing import percentile
+
+parser = argparse.ArgumentParser(description="Задержка API под смешанной конкурентной нагрузкой")
+parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+parser.add_argument("--concurrency", type=int, default=32)
+parser.add_argument("--duration", type=float, default=30, help="Длительность нагрузки в секундах")
+parser.add_argument("--max-call-id", type=int, default=1000, help="Диапазон id для запросов карточек звонков")
+parser.add_argument("--export-share", type=float, default=0.02, help="Доля запросов полного экспорта")
+parser.add_argument("--seed", type=int, help="Заполнить БД из DATABASE_URL указанным числом синтетических звонков и выйти")
+args = parser.parse_args()
+
+MANAGERS = [f"Менеджер {i}" for i in range(50)]
+
+def seed(total_calls: int):
+    from models import init_db
+    from scripts.synthetic_data import populate
+    from services.stats_service import rebuild_rollups
+
+    init_db()
+    populate(total_calls, evaluations_per_call=2)
+    rebuild_rollups()
+    print(f"Добавлено {total_calls} звонков")
+
+def pick_request(rng: random.Random):
+    roll = rng.random()
+    if roll < args.export_share:
+        return "export", "/api/export"
+    roll = rng.random()
+    call_id = rng.randint(1, args.max_call_id)
+    if roll < 0.35:
+        return "calls", "/api/calls?limit=50"
+    if roll < 0.5:
+        return "calls_filtered", f"/api/calls?limit=50&manager={rng.choice(MANAGERS)}"
+    if roll < 0.7:
+        return "call_detail", f"/api/calls/{call_id}"
+    if roll < 0.9:
+        return "status", f"/api/analyze/{call_id}/status"
+    return "stats", "/api/stats/managers"
+
+async def worker(client: httpx.AsyncClient, deadline: float, latencies: dict, errors: dict, seed_value: int):
+    rng = random.Random(seed_value)
+    while time.monotonic() < deadline:
+        name, path = pick_request(rng)
+        started = time.perf_counter()
+        try:
+            response = await client.get(path)
+            await response.aread()
+            if response.status_code >= 500:
+                errors[name] += 1
+        except httpx.HTTPError:
+            errors[name] += 1
+            continue
+        latencies[name].append((time.perf_counter() - started) * 1000)
+
+async def health_probe(client: httpx.AsyncClient, deadline: float, latencies: dict):
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            await client.get("/health")
+            latencies["health_probe"].append((time.perf_counter() - started) * 1000)
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.05)
+
+async def run():
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    limits = httpx.Limits(max_connections=args.concurrency + 1)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=120, limits=limits) as client:
+        await client.get("/health")
+        deadline = time.monotonic() + args.duration
+        started = time.monotonic()
+        await asyncio.gather(
+            health_probe(client, deadline, latencies),
+            *[worker(client, deadline, latencies, errors, i) for i in range(args.concurrency)]
+        )
+        elapsed = time.monotonic() - started
+
+    total = sum(len(values) for name, values in latencies.items() if name != "health_probe")
+    print(f"{args.base_url}: {args.concurrency} клиентов, {elapsed:.1f}с, {total} запросов, {total / elapsed:.1f} rps")
+    print(f"{'маршрут':<16}{'n':>7}{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}{'max, мс':>10}{'ошибки':>8}")
+    for name in sorted(latencies):
+        values = latencies[name]
+        print(
+            f"{name:<16}{len(values):>7}{statistics.median(values):>10.1f}{percentile(values, 0.95):>10.1f}"
+            f"{percentile(values, 0.99):>10.1f}{max(values):>10.1f}{errors.get(name, 0):>8}"
+        )
+
+if __name__ == "__main__":
+    if args.seed:
+        seed(args.seed)
+    else:
+        asyncio.run(run())
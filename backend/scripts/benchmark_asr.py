@@ -0,0 +1,68 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import (
+    LOCAL_ASR_MODEL,
+    LOCAL_ASR_MODEL_DIR,
+    LOCAL_ASR_COMPUTE_TYPE,
+    LOCAL_ASR_CPU_THREADS,
+    LOCAL_ASR_BEAM_SIZE,
+    LOCAL_ASR_LANGUAGE,
+    LOCAL_ASR_VAD_FILTER,
+)
+from services.local_asr import LocalASR
+
+parser = argparse.ArgumentParser(description="Скорость локальной транскрипции (real-time factor) на своих записях")
+parser.add_argument("files", nargs="+", help="Аудиофайлы")
+parser.add_argument("--model", default=LOCAL_ASR_MODEL)
+parser.add_argument("--compute-type", default=LOCAL_ASR_COMPUTE_TYPE)
+parser.add_argument("--workers", type=int, default=1)
+parser.add_argument("--cpu-threads", type=int, default=LOCAL_ASR_CPU_THREADS)
+parser.add_argument("--beam-size", type=int, default=LOCAL_ASR_BEAM_SIZE)
+parser.add_argument("--show-text", action="store_true")
+args = parser.parse_args()
+
+async def run():
+    asr = LocalASR(
+        enabled=True,
+        model=args.model,
+        model_dir=LOCAL_ASR_MODEL_DIR,
+        compute_type=args.compute_type,
+        workers=args.workers,
+        cpu_threads=args.cpu_threads,
+        beam_size=args.beam_size,
+        language=LOCAL_ASR_LANGUAGE,
+        vad_filter=LOCAL_ASR_VAD_FILTER,
+        max_duration=0
+    )
+    asr.start()
+    try:
+        while not asr.ready:
+            if not asr.enabled:
+                raise SystemExit("Локальная модель не загрузилась, подробности в логе")
+            await asyncio.sleep(0.2)
+        started = time.perf_counter()
+        texts = await asyncio.gather(*[asr.transcribe(path) for path in args.files], return_exceptions=True)
+        elapsed = time.perf_counter() - started
+    finally:
+        asr.stop()
+
+    for path, text in zip(args.files, texts):
+        if isinstance(text, BaseException):
+            print(f"{path}: ошибка {text}")
+        elif args.show_text:
+            print(f"--- {path}\n{text}")
+    stats = asr.stats()
+    print(
+        f"{args.model} ({args.compute_type}), {args.workers} процесс(ов) x {args.cpu_threads} потоков: "
+        f"{stats['transcriptions']} файлов, {stats['audio_seconds']:.0f}с аудио за {elapsed:.1f}с, "
+        f"RTF {stats['real_time_factor']}, аудио-секунд в секунду {stats['audio_seconds'] / elapsed:.1f}"
+    )
+
+if __name__ == "__main__":
+    asyncio.run(run())
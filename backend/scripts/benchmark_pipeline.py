@@ -0,0 +1,169 @@
+import argparse
+import asyncio
+import glob
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import httpx
+
+from utils.timing import percentile
+
+parser = argparse.ArgumentParser(description="Сквозная пропускная способность анализа: загрузка -> транскрипция -> оценка")
+parser.add_argument("--base-url", help="Адрес уже запущенного сервера. Без него поднимается локальный сервер с AI_PROVIDER=fake и временной SQLite")
+parser.add_argument("--uploads", type=int, default=50, help="Число загружаемых звонков")
+parser.add_argument("--concurrency", type=int, default=8, help="Одновременных загрузок")
+parser.add_argument("--file-size-kb", type=int, default=256, help="Размер синтетического аудиофайла")
+parser.add_argument("--timeout", type=float, default=600, help="Максимальное ожидание завершения анализа одного звонка")
+parser.add_argument("--seed", type=int, default=1)
+parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                    help="Переменные окружения для поднимаемого сервера, например ANALYSIS_WORKERS=8 или FAKE_AI_RATE_LIMIT_RATE=0.05")
+args = parser.parse_args()
+
+LONG_POLL_WAIT = 25
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def spawn_server(workdir: str) -> tuple:
+    port = free_port()
+    env = {
+        **os.environ,
+        "AI_PROVIDER": "fake",
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        "PROGRESS_BUS_SQLITE_PATH": os.path.join(workdir, "progress_bus.db"),
+        "ANALYSIS_QUEUE_POLL_INTERVAL": "0.2",
+        "LOG_LEVEL": "WARNING"
+    }
+    for item in args.env:
+        key, _, value = item.partition("=")
+        env[key] = value
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning",
+         "--timeout-keep-alive", str(LONG_POLL_WAIT + 60)],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL
+    )
+    return process, f"http://127.0.0.1:{port}"
+
+async def wait_healthy(client: httpx.AsyncClient, process=None):
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Сервер завершился с кодом {process.returncode}")
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.3)
+    raise RuntimeError("Сервер не ответил на /health за 60с")
+
+async def wait_completed(client: httpx.AsyncClient, call_id: int, deadline: float) -> str:
+    version = None
+    while time.monotonic() < deadline:
+        params = {"wait": LONG_POLL_WAIT}
+        if version:
+            params["since"] = version
+        response = await client.get(f"/api/analyze/{call_id}/status", params=params)
+        response.raise_for_status()
+        status = response.json()
+        if status["status"] in ("completed", "failed"):
+            return status["status"]
+        version = status["version"]
+    return "timeout"
+
+async def run_upload(client: httpx.AsyncClient, index: int, prefix: str, semaphore: asyncio.Semaphore, results: list):
+    rng = random.Random(args.seed * 100003 + index)
+    audio = b"ID3" + rng.randbytes(args.file_size_kb * 1024)
+    async with semaphore:
+        started = time.monotonic()
+        try:
+            response = await client.post(
+                "/api/upload",
+                files=[("files", (f"{prefix}-{index}.mp3", audio, "audio/mpeg"))],
+                data={"manager": "Нагрузочный тест"}
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            results.append({"status": "upload_error", "error": str(e)})
+            return
+        uploaded = time.monotonic()
+    call_id = response.json()["calls"][0]["id"]
+    try:
+        status = await wait_completed(client, call_id, started + args.timeout)
+    except httpx.HTTPError as e:
+        status = f"status_error: {e}"
+    results.append({
+        "status": status,
+        "upload_seconds": uploaded - started,
+        "uploaded_at": uploaded,
+        "total_seconds": time.monotonic() - started
+    })
+
+async def run(base_url: str, process=None) -> str:
+    prefix = f"bench-{uuid.uuid4().hex[:8]}"
+    results = []
+    limits = httpx.Limits(max_connections=args.uploads + 4)
+    async with httpx.AsyncClient(base_url=base_url, timeout=LONG_POLL_WAIT + 60, limits=limits) as client:
+        await wait_healthy(client, process)
+        semaphore = asyncio.Semaphore(args.concurrency)
+        started = time.monotonic()
+        await asyncio.gather(*[run_upload(client, i, prefix, semaphore, results) for i in range(args.uploads)])
+        elapsed = time.monotonic() - started
+        timings = (await client.get("/api/admin/timings", params={"hours": 1})).json().get("stages", [])
+        provider = (await client.get("/api/limits")).json().get("provider", {})
+    report(base_url, results, elapsed, started, timings, provider)
+    return prefix
+
+def report(base_url: str, results: list, elapsed: float, started: float, timings: list, provider: dict):
+    statuses = Counter(result["status"] for result in results)
+    completed = [result for result in results if result["status"] == "completed"]
+    uploaded = [result for result in results if "uploaded_at" in result]
+    upload_span = max((result["uploaded_at"] for result in uploaded), default=started) - started
+
+    print(f"{base_url}: {args.uploads} звонков по {args.file_size_kb} КБ, {args.concurrency} одновременных загрузок, провайдер {provider.get('name', '?')}")
+    print(f"Итог: {dict(statuses)} за {elapsed:.1f}с")
+    if uploaded and upload_span > 0:
+        print(f"Загрузки: {len(uploaded) / upload_span * 60:.1f} в минуту, p95 загрузки {percentile([r['upload_seconds'] for r in uploaded], 0.95):.2f}с")
+    if completed:
+        totals = [result["total_seconds"] for result in completed]
+        print(f"Завершено анализов: {len(completed) / elapsed * 60:.1f} в минуту")
+        print(
+            f"Время до completed: p50 {statistics.median(totals):.1f}с, p95 {percentile(totals, 0.95):.1f}с, "
+            f"max {max(totals):.1f}с"
+        )
+    if provider:
+        print(f"Провайдер: {provider}")
+    if timings:
+        print(f"{'этап':<40}{'n':>6}{'p50, мс':>10}{'p95, мс':>10}{'повторы':>9}")
+        for stage in timings:
+            print(f"{stage['operation'] + '/' + stage['stage']:<40}{stage['count']:>6}{stage['p50_ms']:>10}{stage['p95_ms']:>10}{stage['retries']:>9}")
+
+def cleanup_uploads(prefix: str):
+    for path in glob.glob(os.path.join(BACKEND_DIR, "uploads", f"*_{prefix}-*.mp3")):
+        os.remove(path)
+
+if __name__ == "__main__":
+    if args.base_url:
+        asyncio.run(run(args.base_url))
+    else:
+        with tempfile.TemporaryDirectory(prefix="pipeline_bench_") as workdir:
+            process, base_url = spawn_server(workdir)
+            try:
+                prefix = asyncio.run(run(base_url, process))
+                cleanup_uploads(prefix)
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
@@ -0,0 +1,114 @@
+import argparse
+import os
+import re
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+parser = argparse.ArgumentParser(description="Проверка планов запросов списка и экспорта на синтетических данных")
+parser.add_argument("--database-url", help="БД для проверки (по умолчанию временная SQLite). Данные будут добавлены в таблицы")
+parser.add_argument("--calls", type=int, default=100000, help="Число синтетических звонков")
+parser.add_argument("--evaluations-per-call", type=int, default=2)
+args = parser.parse_args()
+
+if args.database_url:
+    os.environ["DATABASE_URL"] = args.database_url
+else:
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'query_plans.db')}"
+
+from sqlalchemy import and_, or_, select, text
+from sqlalchemy.orm import load_only
+
+from models import AnalysisJob, Call, Evaluation, EvaluationScore, engine, init_db
+from scripts.synthetic_data import MANAGERS, populate
+
+SQLITE_FULL_SCAN = re.compile(r"^SCAN (calls|evaluations|analysis_jobs)$")
+POSTGRES_FULL_SCAN = re.compile(r"Seq Scan on (calls|evaluations|analysis_jobs)")
+
+def list_columns():
+    return load_only(Call.id, Call.created_at, Call.latest_evaluation_id, Call.filename, Call.manager, Call.call_date, Call.call_identifier)
+
+def query_shapes():
+    now = datetime.utcnow()
+    page = select(Call).options(list_columns()).order_by(Call.created_at.desc(), Call.id.desc()).limit(51)
+    return [
+        ("список: первая страница", page, True),
+        ("список: следующая страница", page.where(or_(
+            Call.created_at < now - timedelta(days=10),
+            and_(Call.created_at == now - timedelta(days=10), Call.id < 1000)
+        )), True),
+        ("список: фильтр по менеджеру и датам", page.where(
+            Call.manager == MANAGERS[0],
+            Call.call_date >= now - timedelta(days=30),
+            Call.call_date <= now
+        ), False),
+        ("список: фильтр по датам", page.where(Call.call_date >= now - timedelta(days=1)), False),
+        ("список: фильтр по критерию", page.where(Call.latest_evaluation_id.in_(
+            select(EvaluationScore.evaluation_id).where(EvaluationScore.criterion == "4.3", EvaluationScore.score == 0)
+        )), False),
+        ("список: последние оценки страницы", select(
+            Evaluation.call_id, Evaluation.итоговая_оценка, Evaluation.нарушения
+        ).where(Evaluation.id.in_([1, 2, 3])), False),
+        ("экспорт", select(Call, Evaluation).outerjoin(
+            Evaluation, Evaluation.id == Call.latest_evaluation_id
+        ).order_by(Call.created_at.desc(), Call.id.desc()), True),
+        ("экспорт: фильтр по менеджеру", select(Call, Evaluation).outerjoin(
+            Evaluation, Evaluation.id == Call.latest_evaluation_id
+        ).where(Call.manager == MANAGERS[0]).order_by(Call.created_at.desc(), Call.id.desc()), False),
+        ("карточка звонка: оценки", select(Evaluation).where(
+            Evaluation.call_id == 10
+        ).order_by(Evaluation.created_at.desc()), False),
+        ("очередь: выбор задачи", select(AnalysisJob.id).where(
+            AnalysisJob.status == "queued"
+        ).order_by(AnalysisJob.id).limit(2), False),
+    ]
+
+def explain(conn, statement) -> list:
+    sql = str(statement.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+    if conn.dialect.name == "sqlite":
+        return [row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+    return [row[0] for row in conn.execute(text(f"EXPLAIN {sql}"))]
+
+def problems(dialect: str, plan: list, forbid_sort: bool) -> list:
+    found = []
+    for line in plan:
+        stripped = line.strip()
+        if dialect == "sqlite":
+            if SQLITE_FULL_SCAN.match(stripped):
+                found.append(f"полный просмотр таблицы: {stripped}")
+            if forbid_sort and "TEMP B-TREE" in stripped:
+                found.append(f"сортировка без индекса: {stripped}")
+        else:
+            if POSTGRES_FULL_SCAN.search(stripped):
+                found.append(f"полный просмотр таблицы: {stripped}")
+            if forbid_sort and stripped.lstrip("-> ").startswith("Sort"):
+                found.append(f"сортировка без индекса: {stripped}")
+    return found
+
+def main() -> int:
+    init_db()
+    print(f"Заполнение {args.calls} звонков...")
+    populate(args.calls, args.evaluations_per_call)
+
+    failed = False
+    with engine.connect() as conn:
+        for name, statement, forbid_sort in query_shapes():
+            plan = explain(conn, statement)
+            found = problems(conn.dialect.name, plan, forbid_sort)
+            print(f"\n[{'FAIL' if found else 'OK'}] {name}")
+            for line in plan:
+                print(f"    {line}")
+            for problem in found:
+                print(f"  ! {problem}")
+            failed = failed or bool(found)
+
+    if failed:
+        print("\nОдин или несколько запросов не используют индекс")
+        return 1
+    print("\nВсе запросы используют индексы")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
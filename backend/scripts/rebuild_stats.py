@@ -0,0 +1,12 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import init_db
+from services.stats_service import rebuild_rollups
+
+if __name__ == "__main__":
+    init_db()
+    calls = rebuild_rollups()
+    print(f"Агрегаты статистики пересчитаны по {calls} звонкам")
@@ -0,0 +1,62 @@
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, text
+
+from models import Call, Evaluation, EvaluationScore, SessionLocal, engine
+
+MANAGERS = [f"Менеджер {i}" for i in range(50)]
+CRITERIA = ("1", "2", "3.1", "4.3")
+BATCH = 5000
+
+def populate(total_calls: int, evaluations_per_call: int, seed: int = 42):
+    db = SessionLocal()
+    try:
+        start_id = (db.query(Call.id).order_by(Call.id.desc()).limit(1).scalar() or 0) + 1
+        evaluation_id = (db.query(Evaluation.id).order_by(Evaluation.id.desc()).limit(1).scalar() or 0) + 1
+    finally:
+        db.close()
+
+    now = datetime.utcnow()
+    rng = random.Random(seed)
+    with engine.begin() as conn:
+        for offset in range(0, total_calls, BATCH):
+            calls = []
+            evaluations = []
+            scores = []
+            for call_id in range(start_id + offset, start_id + min(offset + BATCH, total_calls)):
+                created_at = now - timedelta(minutes=total_calls - (call_id - start_id))
+                calls.append({
+                    "id": call_id,
+                    "filename": f"call_{call_id}.mp3",
+                    "manager": rng.choice(MANAGERS),
+                    "call_date": created_at - timedelta(hours=rng.randint(0, 48)),
+                    "created_at": created_at,
+                    "status": "completed",
+                    "progress": 100,
+                })
+                for n in range(evaluations_per_call):
+                    criterion_scores = {key: rng.choice((0, 0.5, 1)) for key in CRITERIA}
+                    scores.extend(
+                        {"evaluation_id": evaluation_id, "criterion": key, "score": score}
+                        for key, score in criterion_scores.items()
+                    )
+                    evaluations.append({
+                        "id": evaluation_id,
+                        "call_id": call_id,
+                        "scores": {key: {"score": score} for key, score in criterion_scores.items()},
+                        "итоговая_оценка": rng.randint(0, 13),
+                        "нарушения": False,
+                        "комментарии": "{}",
+                        "is_retest": n > 0,
+                        "created_at": created_at + timedelta(minutes=n),
+                    })
+                    evaluation_id += 1
+            conn.execute(insert(Call), calls)
+            conn.execute(insert(Evaluation), evaluations)
+            conn.execute(insert(EvaluationScore), scores)
+        conn.execute(text(
+            "UPDATE calls SET latest_evaluation_id = (SELECT MAX(e.id) FROM evaluations e WHERE e.call_id = calls.id) "
+            "WHERE latest_evaluation_id IS NULL"
+        ))
+        conn.execute(text("ANALYZE"))
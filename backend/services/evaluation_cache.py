@@ -0,0 +1,260 @@
+import asyncio
+import copy
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Union
+
+from sqlalchemy.exc import IntegrityError
+
+from models import EvaluationCacheEntry, SessionLocal
+from config import (
+    GEMINI_EVALUATION_MODEL,
+    EVALUATION_CACHE_ENABLED,
+    EVALUATION_CACHE_MAX_ITEMS,
+    EVALUATION_CACHE_TTL_SECONDS,
+)
+from services.providers import provider
+from services.evaluation_service import (
+    BatchItemError,
+    evaluate_transcription_async,
+    evaluate_transcriptions_batch_async,
+)
+from utils.checklist import get_checklist_version
+
+logger = logging.getLogger(__name__)
+
+SINGLE_PROMPT = "single"
+BATCH_PROMPT = "batch"
+
+class EvaluationCache:
+    def __init__(self, enabled: bool, max_items: int, ttl_seconds: int, provider_name: str, model: str):
+        self.enabled = enabled
+        self.max_items = max_items
+        self.ttl_seconds = ttl_seconds
+        self.provider_name = provider_name
+        self.model = f"{provider_name}/{model}"
+        self.checklist_version = get_checklist_version()
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.forced = 0
+
+    def make_key(self, transcription: str, mode: str = SINGLE_PROMPT) -> str:
+        transcription_sha256 = hashlib.sha256(transcription.encode("utf-8")).hexdigest()
+        return hashlib.sha256(
+            f"{transcription_sha256}:{self.checklist_version}:{self.model}:{mode}".encode("utf-8")
+        ).hexdigest()
+
+    def _memory_get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            item = self._memory.get(key)
+            if item is None:
+                return None
+            stored_at, result = item
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            return result
+
+    def _memory_put(self, key: str, result: dict):
+        with self._lock:
+            self._memory[key] = (time.monotonic(), result)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_items:
+                self._memory.popitem(last=False)
+
+    def _db_get(self, key: str) -> Optional[dict]:
+        db = SessionLocal()
+        try:
+            entry = db.query(EvaluationCacheEntry).filter(EvaluationCacheEntry.key == key).first()
+            if not entry:
+                return None
+            if entry.created_at and entry.created_at < datetime.utcnow() - timedelta(seconds=self.ttl_seconds):
+                db.delete(entry)
+                db.commit()
+                return None
+            entry.hits = (entry.hits or 0) + 1
+            entry.last_hit_at = datetime.utcnow()
+            db.commit()
+            return entry.result
+        except Exception as e:
+            logger.warning(f"Ошибка чтения кэша оценок: {e}")
+            return None
+        finally:
+            db.close()
+
+    def _db_put(self, key: str, transcription: str, result: dict):
+        db = SessionLocal()
+        try:
+            db.merge(EvaluationCacheEntry(
+                key=key,
+                transcription_sha256=hashlib.sha256(transcription.encode("utf-8")).hexdigest(),
+                checklist_version=self.checklist_version,
+                model=self.model,
+                result=result,
+                hits=0,
+                created_at=datetime.utcnow()
+            ))
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Ошибка записи в кэш оценок: {e}")
+        finally:
+            db.close()
+
+    def get(self, transcription: str, mode: str = SINGLE_PROMPT) -> Optional[dict]:
+        key = self.make_key(transcription, mode)
+        result = self._memory_get(key)
+        if result is not None:
+            with self._lock:
+                self.memory_hits += 1
+            return copy.deepcopy(result)
+
+        result = self._db_get(key)
+        if result is not None:
+            self._memory_put(key, result)
+            with self._lock:
+                self.db_hits += 1
+            return copy.deepcopy(result)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, transcription: str, result: dict, mode: str = SINGLE_PROMPT):
+        key = self.make_key(transcription, mode)
+        stored = copy.deepcopy(result)
+        self._memory_put(key, stored)
+        self._db_put(key, transcription, stored)
+
+    def purge_stale(self):
+        db = SessionLocal()
+        try:
+            deleted = db.query(EvaluationCacheEntry).filter(
+                (EvaluationCacheEntry.model.startswith(f"{self.provider_name}/") & (
+                    (EvaluationCacheEntry.checklist_version != self.checklist_version) |
+                    (EvaluationCacheEntry.model != self.model)
+                )) |
+                (EvaluationCacheEntry.created_at < datetime.utcnow() - timedelta(seconds=self.ttl_seconds))
+            ).delete(synchronize_session=False)
+            db.commit()
+            if deleted:
+                logger.info(f"Удалено {deleted} устаревших записей кэша оценок")
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Ошибка очистки кэша оценок: {e}")
+        finally:
+            db.close()
+
+    async def evaluate_async(self, transcription: str, force: bool = False) -> dict:
+        if not self.enabled or force:
+            if force:
+                with self._lock:
+                    self.forced += 1
+            result = await evaluate_transcription_async(transcription)
+            if self.enabled:
+                await asyncio.to_thread(self.put, transcription, result)
+            return result
+
+        cached = await asyncio.to_thread(self.get, transcription)
+        if cached is not None:
+            logger.info(f"Оценка найдена в кэше (чек-лист {self.checklist_version})")
+            return cached
+
+        result = await evaluate_transcription_async(transcription)
+        await asyncio.to_thread(self.put, transcription, result)
+        return result
+
+    async def _evaluate_chunk(self, chunk: Dict[str, str], semaphore: asyncio.Semaphore, counters: dict) -> Dict[str, Union[dict, Exception]]:
+        async with semaphore:
+            try:
+                results = await evaluate_transcriptions_batch_async(chunk)
+                counters["provider_requests"] += 1
+            except Exception as e:
+                return {item_id: e for item_id in chunk}
+
+        modes = {}
+
+        for item_id, result in list(results.items()):
+            if not isinstance(result, BatchItemError):
+                continue
+            logger.warning(f"Звонок {item_id} не оценен в пакете, повтор отдельным запросом: {result}")
+            counters["single_retries"] += 1
+            try:
+                async with semaphore:
+                    results[item_id] = await evaluate_transcription_async(chunk[item_id])
+                    counters["provider_requests"] += 1
+                modes[item_id] = SINGLE_PROMPT
+            except Exception as e:
+                results[item_id] = e
+
+        if self.enabled:
+            for item_id, result in results.items():
+                if isinstance(result, dict):
+                    await asyncio.to_thread(self.put, chunk[item_id], result, modes.get(item_id, BATCH_PROMPT))
+        return results
+
+    async def evaluate_batch_async(self, items: Dict[str, str], batch_size: int, concurrency: int, force: bool = False):
+        results: Dict[str, Union[dict, Exception]] = {}
+        counters = {"cached": 0, "provider_requests": 0, "single_retries": 0}
+
+        pending = {}
+        for item_id, transcription in items.items():
+            cached = None
+            if self.enabled and not force and transcription:
+                cached = await asyncio.to_thread(self.get, transcription, BATCH_PROMPT)
+            if cached is not None:
+                results[item_id] = cached
+                counters["cached"] += 1
+            else:
+                pending[item_id] = transcription
+        if force:
+            with self._lock:
+                self.forced += len(pending)
+
+        item_ids = list(pending.keys())
+        chunks = [
+            {item_id: pending[item_id] for item_id in item_ids[i:i + batch_size]}
+            for i in range(0, len(item_ids), batch_size)
+        ]
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        for chunk_results in await asyncio.gather(*[self._evaluate_chunk(chunk, semaphore, counters) for chunk in chunks]):
+            results.update(chunk_results)
+
+        counters["batches"] = len(chunks)
+        return results, counters
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.memory_hits + self.db_hits
+            lookups = hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "model": self.model,
+                "checklist_version": self.checklist_version,
+                "memory_items": len(self._memory),
+                "max_items": self.max_items,
+                "ttl_seconds": self.ttl_seconds,
+                "memory_hits": self.memory_hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "forced": self.forced,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0
+            }
+
+evaluation_cache = EvaluationCache(
+    enabled=EVALUATION_CACHE_ENABLED,
+    max_items=EVALUATION_CACHE_MAX_ITEMS,
+    ttl_seconds=EVALUATION_CACHE_TTL_SECONDS,
+    provider_name=provider.name,
+    model=GEMINI_EVALUATION_MODEL,
+)
@@ -1,12 +1,14 @@
-import google.generativeai as genai
 import json
 import os
 import logging
+from typing import Dict, Union
 
-from utils.checklist import get_checklist_prompt
-from config import GEMINI_API_KEY, GEMINI_EVALUATION_MODEL
-
-genai.configure(api_key=GEMINI_API_KEY)
+from utils.checklist import CHECKLIST_PROMPT, CRITERIA_KEYS
+from config import GEMINI_EVALUATION_MODEL, EVALUATION_BATCH_MAX_OUTPUT_TOKENS
+from services.prompt_cache import prompt_cache
+from services.providers import provider
+from services.rate_limiter import rate_limiter
+from utils.metrics import observe_stage
 
 logger = logging.getLogger(__name__)
 
@@ -25,63 +27,64 @@ def normalize_scores(scores_data: dict) -> dict:
     
     return scores_data
 
-def evaluate_transcription(transcription: str) -> dict:
+def _evaluation_suffix(transcription: str) -> str:
     if not transcription or len(transcription.strip()) == 0:
         raise ValueError("Транскрипция пустая. Невозможно провести оценку.")
+    return f"Расшифровка звонка:\n\n{transcription}\n\nОцени звонок по чек-листу и верни JSON."
+
+EVALUATION_OUTPUT_TOKENS_ESTIMATE = 2048
+CHARS_PER_TOKEN_ESTIMATE = 3
+
+def estimate_evaluation_tokens(suffix: str) -> int:
+    return (len(CHECKLIST_PROMPT.text) + len(suffix)) // CHARS_PER_TOKEN_ESTIMATE + EVALUATION_OUTPUT_TOKENS_ESTIMATE
+
+def _generation_config(max_output_tokens: int = 8192) -> dict:
+    return {
+        "temperature": 0,
+        "top_p": 1.0,
+        "top_k": 1,
+        "max_output_tokens": max_output_tokens,
+        "response_mime_type": "application/json"
+    }
+
+def _load_json(response):
+    if not response:
+        raise Exception("Gemini API вернул пустой ответ при оценке")
+    
+    if not hasattr(response, 'text') or response.text is None:
+        raise Exception("Gemini API не вернул текст оценки")
     
-    prompt = get_checklist_prompt()
-    full_prompt = f"{prompt}\n\nРасшифровка звонка:\n\n{transcription}\n\nОцени звонок по чек-листу и верни JSON."
+    response_text = response.text.strip()
+    
+    logger.info(f"Ответ модели (первые 300 символов): {response_text[:300]}")
+    
+    if "```json" in response_text:
+        response_text = response_text.split("```json")[1].split("```")[0].strip()
+    elif "```" in response_text:
+        response_text = response_text.split("```")[1].split("```")[0].strip()
     
     try:
-        model = genai.GenerativeModel(GEMINI_EVALUATION_MODEL)
-        response = model.generate_content(
-            full_prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=0,
-                top_p=1.0,
-                top_k=1,
-                max_output_tokens=8192,
-                response_mime_type="application/json"
-            )
-        )
-        
-        if not response:
-            raise Exception("Gemini API вернул пустой ответ при оценке")
-        
-        if not hasattr(response, 'text') or response.text is None:
-            raise Exception("Gemini API не вернул текст оценки")
-        
-        response_text = response.text.strip()
-        
-        logger.info(f"Ответ модели (первые 300 символов): {response_text[:300]}")
-        
-        if "```json" in response_text:
-            response_text = response_text.split("```json")[1].split("```")[0].strip()
-        elif "```" in response_text:
-            response_text = response_text.split("```")[1].split("```")[0].strip()
-        
-        try:
-            scores_data = json.loads(response_text)
-        except json.JSONDecodeError as e:
-            logger.error(f"Ошибка парсинга JSON: {e}")
-            logger.error(f"Полный ответ модели: {response_text}")
-            raise Exception(f"Не удалось распарсить JSON ответ от модели. Ответ: {response_text[:500]}")
-        
-        if not scores_data or not isinstance(scores_data, dict) or len(scores_data) == 0:
-            raise Exception("Модель вернула пустой словарь оценок")
-        
-        scores_data = normalize_scores(scores_data)
-        
-        logger.info(f"Итоговые баллы: {json.dumps({k: v.get('score', 'N/A') for k, v in scores_data.items()}, ensure_ascii=False)}")
-        
-    except Exception as e:
-        logger.error(f"Ошибка при оценке: {e}")
-        import traceback
-        logger.error(traceback.format_exc())
-        raise
+        return json.loads(response_text)
+    except json.JSONDecodeError as e:
+        logger.error(f"Ошибка парсинга JSON: {e}")
+        logger.error(f"Полный ответ модели: {response_text}")
+        raise Exception(f"Не удалось распарсить JSON ответ от модели. Ответ: {response_text[:500]}")
+
+def _parse_scores(response) -> dict:
+    scores_data = _load_json(response)
+    
+    if not scores_data or not isinstance(scores_data, dict) or len(scores_data) == 0:
+        raise Exception("Модель вернула пустой словарь оценок")
+    
+    scores_data = normalize_scores(scores_data)
     
+    logger.info(f"Итоговые баллы: {json.dumps({k: v.get('score', 'N/A') for k, v in scores_data.items()}, ensure_ascii=False)}")
+    
+    return scores_data
+
+def _build_result(scores_data: dict) -> dict:
     total_score = 0
-    for key in ["1", "2", "3.1", "3.2", "3.3", "4.1", "4.2", "4.3", "4.4", "5", "6", "7.1", "7.2"]:
+    for key in CRITERIA_KEYS:
         score = scores_data.get(key, {}).get("score", 0)
         total_score += score
     
@@ -101,3 +104,122 @@ def evaluate_transcription(transcription: str) -> dict:
     
     return result
 
+def _log_evaluation_error(e: Exception):
+    logger.error(f"Ошибка при оценке: {e}")
+    import traceback
+    logger.error(traceback.format_exc())
+
+async def evaluate_transcription_async(transcription: str) -> dict:
+    suffix = _evaluation_suffix(transcription)
+    generation_config = _generation_config()
+    
+    async def request():
+        response = await prompt_cache.generate_async(suffix, generation_config)
+        if response is None:
+            response = await provider.generate_async(
+                GEMINI_EVALUATION_MODEL,
+                f"{CHECKLIST_PROMPT.text}\n\n{suffix}",
+                generation_config
+            )
+        return response
+    
+    try:
+        with observe_stage("evaluation", "generate"):
+            response = await rate_limiter.call_async(GEMINI_EVALUATION_MODEL, request, estimated_tokens=estimate_evaluation_tokens(suffix))
+        with observe_stage("evaluation", "parse"):
+            scores_data = _parse_scores(response)
+    except Exception as e:
+        _log_evaluation_error(e)
+        raise
+    
+    return _build_result(scores_data)
+
+class BatchItemError(Exception):
+    pass
+
+OPTIONAL_CRITERIA = ("4.3",)
+
+def _batch_suffix(items: Dict[str, str]) -> str:
+    parts = [
+        f"Ниже {len(items)} расшифровок разных звонков. Оцени каждый звонок независимо от остальных по чек-листу.\n",
+        "Верни один JSON-объект, где ключ - идентификатор звонка, а значение - оценка этого звонка в формате, описанном выше.\n"
+    ]
+    for item_id, transcription in items.items():
+        parts.append(f"\n=== Звонок {item_id} ===\n{transcription}\n=== Конец звонка {item_id} ===\n")
+    parts.append(f"\nИдентификаторы звонков: {', '.join(items.keys())}. Верни JSON.")
+    return "".join(parts)
+
+def _validate_item_scores(item_id: str, scores_data) -> dict:
+    if not isinstance(scores_data, dict) or len(scores_data) == 0:
+        raise BatchItemError(f"Модель вернула пустую оценку для звонка {item_id}")
+    
+    missing = [
+        key for key in CRITERIA_KEYS
+        if key not in OPTIONAL_CRITERIA and not (
+            isinstance(scores_data.get(key), dict) and isinstance(scores_data[key].get("score"), (int, float))
+        )
+    ]
+    if missing:
+        raise BatchItemError(f"В оценке звонка {item_id} нет баллов по критериям: {', '.join(missing)}")
+    
+    return normalize_scores(scores_data)
+
+def _parse_batch_scores(response, item_ids) -> Dict[str, Union[dict, Exception]]:
+    try:
+        batch_data = _load_json(response)
+    except Exception as e:
+        return {item_id: BatchItemError(str(e)) for item_id in item_ids}
+    
+    if not isinstance(batch_data, dict):
+        error = BatchItemError("Модель вернула оценки пакета не в виде JSON-объекта")
+        return {item_id: error for item_id in item_ids}
+    
+    results = {}
+    for item_id in item_ids:
+        if item_id not in batch_data:
+            results[item_id] = BatchItemError(f"Модель не вернула оценку для звонка {item_id}")
+            continue
+        try:
+            results[item_id] = _build_result(_validate_item_scores(item_id, batch_data[item_id]))
+        except BatchItemError as e:
+            logger.warning(str(e))
+            results[item_id] = e
+    return results
+
+async def evaluate_transcriptions_batch_async(items: Dict[str, str]) -> Dict[str, Union[dict, Exception]]:
+    results = {}
+    batch = {}
+    for item_id, transcription in items.items():
+        if not transcription or len(transcription.strip()) == 0:
+            results[item_id] = ValueError("Транскрипция пустая. Невозможно провести оценку.")
+        else:
+            batch[str(item_id)] = transcription
+    
+    if not batch:
+        return results
+    
+    suffix = _batch_suffix(batch)
+    generation_config = _generation_config(EVALUATION_BATCH_MAX_OUTPUT_TOKENS)
+    
+    async def request():
+        response = await prompt_cache.generate_async(suffix, generation_config)
+        if response is None:
+            response = await provider.generate_async(
+                GEMINI_EVALUATION_MODEL,
+                f"{CHECKLIST_PROMPT.text}\n\n{suffix}",
+                generation_config
+            )
+        return response
+    
+    estimated_tokens = estimate_evaluation_tokens(suffix) + EVALUATION_OUTPUT_TOKENS_ESTIMATE * (len(batch) - 1)
+    try:
+        with observe_stage("evaluation_batch", "generate"):
+            response = await rate_limiter.call_async(GEMINI_EVALUATION_MODEL, request, estimated_tokens=estimated_tokens)
+    except Exception as e:
+        _log_evaluation_error(e)
+        raise
+    
+    logger.info(f"Пакетная оценка: {len(batch)} звонков за один запрос")
+    with observe_stage("evaluation_batch", "parse"):
+        results.update(_parse_batch_scores(response, list(batch.keys())))
+    return results
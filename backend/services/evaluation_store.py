@@ -0,0 +1,49 @@
+from sqlalchemy import or_, update
+from sqlalchemy.orm import Session
+
+from models import Call, Evaluation, EvaluationScore
+from services.stats_service import apply_latest_change
+
+def score_rows(evaluation: Evaluation) -> list:
+    scores = evaluation.scores if isinstance(evaluation.scores, dict) else {}
+    return [
+        {"evaluation_id": evaluation.id, "criterion": criterion, "score": float(item["score"])}
+        for criterion, item in scores.items()
+        if isinstance(item, dict) and isinstance(item.get("score"), (int, float))
+    ]
+
+def add_evaluation(db: Session, call_id: int, evaluation_result: dict, is_retest: bool) -> Evaluation:
+    call = db.query(Call).filter(Call.id == call_id).with_for_update().populate_existing().first()
+
+    evaluation = Evaluation(
+        call_id=call_id,
+        scores=evaluation_result["scores"],
+        итоговая_оценка=evaluation_result["итоговая_оценка"],
+        нарушения=evaluation_result["нарушения"],
+        комментарии=evaluation_result["комментарии"],
+        is_retest=is_retest
+    )
+    db.add(evaluation)
+    db.flush()
+
+    rows = score_rows(evaluation)
+    if rows:
+        db.bulk_insert_mappings(EvaluationScore, rows)
+
+    result = db.execute(
+        update(Call)
+        .where(
+            Call.id == call_id,
+            or_(Call.latest_evaluation_id.is_(None), Call.latest_evaluation_id < evaluation.id)
+        )
+        .values(latest_evaluation_id=evaluation.id)
+        .execution_options(synchronize_session=False)
+    )
+
+    if call is not None and result.rowcount == 1:
+        previous = db.query(Evaluation).filter(
+            Evaluation.id == call.latest_evaluation_id
+        ).first() if call.latest_evaluation_id else None
+        apply_latest_change(db, call, previous, evaluation)
+
+    return evaluation
@@ -0,0 +1,287 @@
+import asyncio
+import logging
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+
+from sqlalchemy import and_, func, or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from models import AnalysisJob, Call, SessionLocal
+from services.progress_service import progress_aggregator
+from config import (
+    ANALYSIS_WORKERS,
+    ANALYSIS_JOB_LEASE_SECONDS,
+    ANALYSIS_JOB_MAX_ATTEMPTS,
+    ANALYSIS_QUEUE_POLL_INTERVAL,
+)
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("queued", "running")
+
+class JobQueue:
+    def __init__(self, concurrency: int, lease_seconds: int, max_attempts: int, poll_interval: float):
+        self.concurrency = max(1, concurrency)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._handler: Optional[Callable[[int, str], Awaitable[bool]]] = None
+        self._tasks = []
+        self._handlers = set()
+        self._keeper: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping = False
+        self._wakeup: Optional[asyncio.Event] = None
+        self._lock = threading.Lock()
+        self._running: Dict[int, int] = {}
+
+    def _claimable(self, now: datetime):
+        return or_(
+            AnalysisJob.status == "queued",
+            and_(AnalysisJob.status == "running", AnalysisJob.lease_expires_at < now)
+        )
+
+    def enqueue(self, db: Session, call_id: int, audio_path: str) -> AnalysisJob:
+        existing = db.query(AnalysisJob).filter(
+            AnalysisJob.call_id == call_id,
+            AnalysisJob.status.in_(ACTIVE_STATUSES)
+        ).first()
+        if existing:
+            logger.info(f"Задача для звонка {call_id} уже в очереди (job {existing.id})")
+            return existing
+
+        job = AnalysisJob(call_id=call_id, audio_path=audio_path, status="queued")
+        db.add(job)
+        call = db.query(Call).filter(Call.id == call_id).first()
+        if call:
+            call.status = "queued"
+            call.progress = 0
+        db.commit()
+        db.refresh(job)
+        logger.info(f"Звонок {call_id} поставлен в очередь анализа (job {job.id})")
+        self._notify()
+        return job
+
+    async def enqueue_async(self, db: AsyncSession, call_id: int, audio_path: str) -> AnalysisJob:
+        job = await db.run_sync(self.enqueue, call_id, audio_path)
+        if job.status == "queued":
+            await progress_aggregator.finish(call_id, 0, "queued", "В очереди на анализ", persist=False)
+        return job
+
+    def _notify(self):
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def start(self, handler: Callable[[int, str], Awaitable[bool]]):
+        if self._tasks:
+            return
+        self._handler = handler
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        for i in range(self.concurrency):
+            self._tasks.append(asyncio.create_task(self._worker_loop(i), name=f"analysis-worker-{i}"))
+        self._keeper = asyncio.create_task(self._lease_keeper_loop(), name="analysis-lease-keeper")
+        logger.info(f"Очередь анализа запущена: {self.concurrency} воркеров, worker_id={self.worker_id}")
+
+    async def stop(self):
+        self._stopping = True
+        if self._wakeup is not None:
+            self._wakeup.set()
+        for handler in list(self._handlers):
+            handler.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._keeper is not None:
+            self._keeper.cancel()
+            await asyncio.gather(self._keeper, return_exceptions=True)
+            self._keeper = None
+        await asyncio.to_thread(self._release_running)
+        logger.info("Очередь анализа остановлена")
+
+    async def _worker_loop(self, index: int):
+        while not self._stopping:
+            try:
+                job = await asyncio.to_thread(self._claim)
+            except Exception as e:
+                logger.error(f"Ошибка получения задачи из очереди: {e}")
+                job = None
+
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+
+            if job.get("exhausted"):
+                await progress_aggregator.finish(job["call_id"], 0, "failed", "Превышено число попыток анализа")
+                continue
+
+            await self._run(job, index)
+
+    def _claim(self) -> Optional[dict]:
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            candidates = db.query(AnalysisJob.id).filter(
+                self._claimable(now)
+            ).order_by(AnalysisJob.id).limit(self.concurrency).all()
+
+            for (job_id,) in candidates:
+                result = db.execute(
+                    update(AnalysisJob)
+                    .where(AnalysisJob.id == job_id, self._claimable(now))
+                    .values(
+                        status="running",
+                        worker_id=self.worker_id,
+                        lease_expires_at=now + timedelta(seconds=self.lease_seconds),
+                        attempts=AnalysisJob.attempts + 1,
+                        started_at=func.coalesce(AnalysisJob.started_at, now)
+                    )
+                )
+                db.commit()
+                if result.rowcount != 1:
+                    continue
+
+                job = db.query(AnalysisJob).filter(AnalysisJob.id == job_id).first()
+                if job.attempts > self.max_attempts:
+                    logger.error(f"Задача {job.id} для звонка {job.call_id} превысила лимит попыток ({self.max_attempts})")
+                    self._finish(job.id, "failed", "Превышено число попыток анализа")
+                    return {"id": job.id, "call_id": job.call_id, "exhausted": True}
+
+                if job.attempts > 1:
+                    logger.warning(f"Задача {job.id} для звонка {job.call_id} подхвачена повторно (попытка {job.attempts})")
+                return {"id": job.id, "call_id": job.call_id, "audio_path": job.audio_path}
+            return None
+        finally:
+            db.close()
+
+    async def _run(self, job: dict, index: int):
+        with self._lock:
+            self._running[job["id"]] = job["call_id"]
+        if self._stopping:
+            return
+        handler = asyncio.create_task(self._handler(job["call_id"], job["audio_path"]))
+        self._handlers.add(handler)
+        try:
+            logger.info(f"Воркер {index} взял задачу {job['id']} (звонок {job['call_id']})")
+            succeeded = await handler
+            status, error = "done" if succeeded is not False else "failed", None
+        except asyncio.CancelledError:
+            if not self._stopping:
+                raise
+            logger.info(f"Задача {job['id']} прервана остановкой очереди")
+            return
+        except Exception as e:
+            logger.error(f"Ошибка выполнения задачи {job['id']}: {e}")
+            status, error = "failed", str(e)
+        finally:
+            self._handlers.discard(handler)
+
+        await asyncio.to_thread(self._finish, job["id"], status, error)
+        with self._lock:
+            self._running.pop(job["id"], None)
+
+    def _finish(self, job_id: int, status: str, error: str = None):
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(AnalysisJob)
+                .where(AnalysisJob.id == job_id, AnalysisJob.worker_id == self.worker_id)
+                .values(status=status, error=error, finished_at=datetime.utcnow(), lease_expires_at=None)
+            )
+            db.commit()
+        except Exception as e:
+            logger.error(f"Ошибка завершения задачи {job_id}: {e}")
+        finally:
+            db.close()
+
+    async def _lease_keeper_loop(self):
+        interval = max(1, self.lease_seconds // 3)
+        while not self._stopping:
+            await asyncio.sleep(interval)
+            await asyncio.to_thread(self._renew_leases)
+
+    def _renew_leases(self):
+        with self._lock:
+            job_ids = list(self._running.keys())
+        if not job_ids:
+            return
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(AnalysisJob)
+                .where(AnalysisJob.id.in_(job_ids), AnalysisJob.worker_id == self.worker_id, AnalysisJob.status == "running")
+                .values(lease_expires_at=datetime.utcnow() + timedelta(seconds=self.lease_seconds))
+            )
+            db.commit()
+        except Exception as e:
+            logger.error(f"Ошибка продления аренды задач: {e}")
+        finally:
+            db.close()
+
+    def _release_running(self):
+        with self._lock:
+            job_ids = list(self._running.keys())
+        if not job_ids:
+            return
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(AnalysisJob)
+                .where(AnalysisJob.id.in_(job_ids), AnalysisJob.worker_id == self.worker_id, AnalysisJob.status == "running")
+                .values(status="queued", worker_id=None, lease_expires_at=None, attempts=AnalysisJob.attempts - 1)
+            )
+            db.commit()
+            logger.info(f"Задачи {job_ids} возвращены в очередь при остановке")
+        except Exception as e:
+            logger.error(f"Ошибка возврата задач в очередь: {e}")
+        finally:
+            db.close()
+
+    def stats(self, db: Session) -> dict:
+        now = datetime.utcnow()
+        counts = dict(
+            db.query(AnalysisJob.status, func.count(AnalysisJob.id))
+            .filter(AnalysisJob.status.in_(ACTIVE_STATUSES))
+            .group_by(AnalysisJob.status)
+            .all()
+        )
+        oldest_queued = db.query(func.min(AnalysisJob.created_at)).filter(
+            AnalysisJob.status == "queued"
+        ).scalar()
+
+        recent = db.query(AnalysisJob.created_at, AnalysisJob.started_at).filter(
+            AnalysisJob.started_at.isnot(None),
+            AnalysisJob.started_at >= now - timedelta(hours=1)
+        ).all()
+        waits = [(started - created).total_seconds() for created, started in recent if created and started]
+
+        with self._lock:
+            running_here = len(self._running)
+
+        return {
+            "queued": counts.get("queued", 0),
+            "running": counts.get("running", 0),
+            "oldest_queued_wait_seconds": round((now - oldest_queued).total_seconds(), 1) if oldest_queued else 0,
+            "avg_wait_seconds_last_hour": round(sum(waits) / len(waits), 1) if waits else 0,
+            "max_wait_seconds_last_hour": round(max(waits), 1) if waits else 0,
+            "concurrency": self.concurrency,
+            "running_on_this_worker": running_here,
+            "worker_id": self.worker_id
+        }
+
+job_queue = JobQueue(
+    concurrency=ANALYSIS_WORKERS,
+    lease_seconds=ANALYSIS_JOB_LEASE_SECONDS,
+    max_attempts=ANALYSIS_JOB_MAX_ATTEMPTS,
+    poll_interval=ANALYSIS_QUEUE_POLL_INTERVAL,
+)
@@ -0,0 +1,222 @@
+import asyncio
+import importlib.util
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from config import (
+    TRANSCRIPTION_BACKEND,
+    LOCAL_ASR_MODEL,
+    LOCAL_ASR_MODEL_DIR,
+    LOCAL_ASR_COMPUTE_TYPE,
+    LOCAL_ASR_WORKERS,
+    LOCAL_ASR_CPU_THREADS,
+    LOCAL_ASR_BEAM_SIZE,
+    LOCAL_ASR_LANGUAGE,
+    LOCAL_ASR_VAD_FILTER,
+    LOCAL_ASR_MAX_DURATION,
+)
+from utils.metrics import LOCAL_ASR_RTF, observe_stage
+from utils.timing import add_bytes
+
+logger = logging.getLogger(__name__)
+
+_worker_model = None
+
+def _init_worker(model: str, model_dir: str, compute_type: str, cpu_threads: int):
+    global _worker_model
+    from faster_whisper import WhisperModel
+
+    _worker_model = WhisperModel(
+        model,
+        device="cpu",
+        compute_type=compute_type,
+        cpu_threads=cpu_threads,
+        download_root=model_dir or None
+    )
+
+def _warmup() -> int:
+    return os.getpid()
+
+def _transcribe(audio_path: str, language: str, beam_size: int, vad_filter: bool) -> dict:
+    started = time.perf_counter()
+    segments, info = _worker_model.transcribe(
+        audio_path,
+        language=language or None,
+        beam_size=beam_size,
+        vad_filter=vad_filter
+    )
+    lines = [segment.text.strip() for segment in segments if segment.text.strip()]
+    return {
+        "text": "\n".join(lines),
+        "audio_seconds": info.duration,
+        "processing_seconds": time.perf_counter() - started
+    }
+
+class LocalASR:
+    def __init__(self, enabled: bool, model: str, model_dir: str, compute_type: str, workers: int,
+                 cpu_threads: int, beam_size: int, language: str, vad_filter: bool, max_duration: float):
+        self.enabled = enabled
+        self.model = model
+        self.model_dir = model_dir
+        self.compute_type = compute_type
+        self.workers = max(1, workers)
+        self.cpu_threads = cpu_threads
+        self.beam_size = beam_size
+        self.language = language
+        self.vad_filter = vad_filter
+        self.max_duration = max_duration
+        self.label = f"local/{model}/{compute_type}"
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.ready = False
+        self.transcriptions = 0
+        self.failures = 0
+        self.skipped_long = 0
+        self.skipped_unknown_duration = 0
+        self.pool_restarts = 0
+        self.last_pool_error: Optional[str] = None
+        self.audio_seconds = 0.0
+        self.processing_seconds = 0.0
+        self.last_rtf: Optional[float] = None
+
+    def start(self):
+        if not self.enabled or self._executor is not None:
+            return
+        if importlib.util.find_spec("faster_whisper") is None:
+            logger.error("TRANSCRIPTION_BACKEND=local, но пакет faster-whisper не установлен. Используется AI-провайдер")
+            self.enabled = False
+            return
+        self._create_executor()
+
+    def _create_executor(self):
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.model, self.model_dir, self.compute_type, self.cpu_threads)
+        )
+        self.ready = False
+        threading.Thread(target=self._warm, name="local-asr-warmup", daemon=True).start()
+
+    def _restart(self, broken: ProcessPoolExecutor, e: Exception):
+        with self._lock:
+            if self._executor is not broken or not self.enabled:
+                return
+            self.pool_restarts += 1
+            self.last_pool_error = str(e) or type(e).__name__
+            broken.shutdown(wait=False, cancel_futures=True)
+            logger.error(f"Пул локальной транскрипции аварийно завершился ({self.last_pool_error}), пересоздаем")
+            self._create_executor()
+
+    def _warm(self):
+        started = time.perf_counter()
+        try:
+            futures = [self._executor.submit(_warmup) for _ in range(self.workers)]
+            pids = {future.result() for future in futures}
+            self.ready = True
+            logger.info(
+                f"Локальная модель {self.model} ({self.compute_type}) загружена в {len(pids)} процесс(ов) "
+                f"за {time.perf_counter() - started:.1f}с"
+            )
+        except Exception as e:
+            logger.error(f"Не удалось загрузить локальную модель {self.model}, используется AI-провайдер: {e}")
+            self.enabled = False
+            self.stop()
+
+    def stop(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self.ready = False
+
+    def accepts(self, duration: Optional[float]) -> bool:
+        if not self.enabled or self._executor is None:
+            return False
+        if self.max_duration <= 0:
+            return True
+        if duration is None:
+            with self._lock:
+                self.skipped_unknown_duration += 1
+            return False
+        if duration > self.max_duration:
+            with self._lock:
+                self.skipped_long += 1
+            return False
+        return True
+
+    async def transcribe(self, audio_path: str) -> str:
+        loop = asyncio.get_running_loop()
+        executor = self._executor
+        try:
+            with observe_stage("transcription", "local_asr"):
+                add_bytes(os.path.getsize(audio_path))
+                result = await loop.run_in_executor(
+                    executor, _transcribe, audio_path, self.language, self.beam_size, self.vad_filter
+                )
+        except BrokenProcessPool as e:
+            with self._lock:
+                self.failures += 1
+            self._restart(executor, e)
+            raise
+        except Exception:
+            with self._lock:
+                self.failures += 1
+            raise
+
+        with self._lock:
+            self.transcriptions += 1
+            self.audio_seconds += result["audio_seconds"]
+            self.processing_seconds += result["processing_seconds"]
+            if result["audio_seconds"] > 0:
+                self.last_rtf = result["processing_seconds"] / result["audio_seconds"]
+                LOCAL_ASR_RTF.observe(self.last_rtf)
+        logger.info(
+            f"Локальная транскрипция {audio_path}: {result['audio_seconds']:.0f}с аудио за "
+            f"{result['processing_seconds']:.1f}с (RTF {self.last_rtf or 0:.2f})"
+        )
+
+        if not result["text"]:
+            raise Exception("Транскрипция пустая. Возможно, аудио файл не содержит речи.")
+        return result["text"]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "ready": self.ready,
+                "model": self.model,
+                "cache_model": self.label,
+                "compute_type": self.compute_type,
+                "workers": self.workers,
+                "cpu_threads": self.cpu_threads,
+                "max_duration_seconds": self.max_duration,
+                "transcriptions": self.transcriptions,
+                "failures": self.failures,
+                "skipped_long": self.skipped_long,
+                "skipped_unknown_duration": self.skipped_unknown_duration,
+                "pool_restarts": self.pool_restarts,
+                "last_pool_error": self.last_pool_error,
+                "audio_seconds": round(self.audio_seconds, 1),
+                "processing_seconds": round(self.processing_seconds, 1),
+                "real_time_factor": round(self.processing_seconds / self.audio_seconds, 3) if self.audio_seconds else None,
+                "last_real_time_factor": round(self.last_rtf, 3) if self.last_rtf is not None else None
+            }
+
+local_asr = LocalASR(
+    enabled=TRANSCRIPTION_BACKEND.lower() == "local",
+    model=LOCAL_ASR_MODEL,
+    model_dir=LOCAL_ASR_MODEL_DIR,
+    compute_type=LOCAL_ASR_COMPUTE_TYPE,
+    workers=LOCAL_ASR_WORKERS,
+    cpu_threads=LOCAL_ASR_CPU_THREADS,
+    beam_size=LOCAL_ASR_BEAM_SIZE,
+    language=LOCAL_ASR_LANGUAGE,
+    vad_filter=LOCAL_ASR_VAD_FILTER,
+    max_duration=LOCAL_ASR_MAX_DURATION,
+)
@@ -0,0 +1,235 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from typing import Awaitable, Callable, Optional
+
+from sqlalchemy import func, select
+
+from models import async_engine
+from config import (
+    DATABASE_URL,
+    PROGRESS_BUS,
+    PROGRESS_BUS_CHANNEL,
+    PROGRESS_BUS_SQLITE_PATH,
+    PROGRESS_BUS_POLL_INTERVAL,
+)
+
+logger = logging.getLogger(__name__)
+
+MAX_MESSAGE_LENGTH = 1000
+RECONNECT_DELAY = 2
+SQLITE_RETENTION_SECONDS = 300
+
+ProgressHandler = Callable[[int, int, str, Optional[str]], Awaitable[None]]
+
+def _payload(call_id: int, progress: int, status: str, message: Optional[str]) -> dict:
+    return {
+        "call_id": call_id,
+        "progress": progress,
+        "status": status,
+        "message": message[:MAX_MESSAGE_LENGTH] if message else None
+    }
+
+class MemoryProgressBus:
+    name = "memory"
+
+    def __init__(self):
+        self._handler: Optional[ProgressHandler] = None
+        self.published = 0
+        self.delivered = 0
+
+    async def start(self, handler: ProgressHandler):
+        self._handler = handler
+
+    async def stop(self):
+        self._handler = None
+
+    async def publish(self, call_id: int, progress: int, status: str, message: str = None):
+        self.published += 1
+        await self._deliver(_payload(call_id, progress, status, message))
+
+    async def _deliver(self, payload: dict):
+        if self._handler is None:
+            return
+        try:
+            await self._handler(payload["call_id"], payload["progress"], payload["status"], payload.get("message"))
+            self.delivered += 1
+        except Exception as e:
+            logger.error(f"Ошибка доставки прогресса звонка {payload.get('call_id')}: {e}")
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "published": self.published, "delivered": self.delivered}
+
+class PostgresProgressBus(MemoryProgressBus):
+    name = "postgres"
+
+    def __init__(self, database_url: str, channel: str):
+        super().__init__()
+        scheme, separator, rest = database_url.partition("://")
+        self.dsn = f"postgresql{separator}{rest}"
+        self.channel = channel
+        self._listener: Optional[asyncio.Task] = None
+        self._deliveries = set()
+        self._connected = False
+
+    async def start(self, handler: ProgressHandler):
+        await super().start(handler)
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen_loop(), name="progress-bus-listen")
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        if self._deliveries:
+            await asyncio.gather(*self._deliveries, return_exceptions=True)
+        await super().stop()
+
+    def _on_notification(self, connection, pid, channel, payload):
+        try:
+            data = json.loads(payload)
+        except ValueError:
+            logger.warning(f"Некорректное сообщение в канале {channel}: {payload[:200]}")
+            return
+        task = asyncio.create_task(self._deliver(data))
+        self._deliveries.add(task)
+        task.add_done_callback(self._deliveries.discard)
+
+    async def _listen_loop(self):
+        import asyncpg
+
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(self.dsn)
+                closed = asyncio.Event()
+                connection.add_termination_listener(lambda _: closed.set())
+                await connection.add_listener(self.channel, self._on_notification)
+                self._connected = True
+                logger.info(f"Подписка на канал прогресса {self.channel} установлена")
+                await closed.wait()
+                logger.warning(f"Соединение подписки на канал {self.channel} закрыто, переподключение")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка подписки на канал прогресса {self.channel}: {e}")
+            finally:
+                self._connected = False
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    async def publish(self, call_id: int, progress: int, status: str, message: str = None):
+        payload = json.dumps(_payload(call_id, progress, status, message), ensure_ascii=False)
+        try:
+            async with async_engine.begin() as connection:
+                await connection.execute(select(func.pg_notify(self.channel, payload)))
+            self.published += 1
+        except Exception as e:
+            logger.error(f"Ошибка публикации прогресса звонка {call_id}: {e}")
+
+    def stats(self) -> dict:
+        return {**super().stats(), "channel": self.channel, "listening": self._connected}
+
+class SqliteProgressBus(MemoryProgressBus):
+    name = "sqlite"
+
+    def __init__(self, path: str, poll_interval: float):
+        super().__init__()
+        self.path = path
+        self.poll_interval = poll_interval
+        self._poller: Optional[asyncio.Task] = None
+        self._last_id = 0
+        self._cleaned_at = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=15)
+        connection.execute("PRAGMA journal_mode=WAL")
+        return connection
+
+    def _init(self) -> int:
+        connection = self._connect()
+        try:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS progress_events "
+                "(id INTEGER PRIMARY KEY AUTOINCREMENT, payload TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            connection.commit()
+            return connection.execute("SELECT COALESCE(MAX(id), 0) FROM progress_events").fetchone()[0]
+        finally:
+            connection.close()
+
+    def _insert(self, payload: str):
+        connection = self._connect()
+        try:
+            connection.execute("INSERT INTO progress_events (payload, created_at) VALUES (?, ?)", (payload, time.time()))
+            connection.commit()
+        finally:
+            connection.close()
+
+    def _fetch(self, after_id: int) -> list:
+        connection = self._connect()
+        try:
+            rows = connection.execute(
+                "SELECT id, payload FROM progress_events WHERE id > ? ORDER BY id", (after_id,)
+            ).fetchall()
+            if time.time() - self._cleaned_at > SQLITE_RETENTION_SECONDS:
+                connection.execute("DELETE FROM progress_events WHERE created_at < ?", (time.time() - SQLITE_RETENTION_SECONDS,))
+                connection.commit()
+                self._cleaned_at = time.time()
+            return rows
+        finally:
+            connection.close()
+
+    async def start(self, handler: ProgressHandler):
+        await super().start(handler)
+        if self._poller is None:
+            self._last_id = await asyncio.to_thread(self._init)
+            self._poller = asyncio.create_task(self._poll_loop(), name="progress-bus-poll")
+
+    async def stop(self):
+        if self._poller is not None:
+            self._poller.cancel()
+            await asyncio.gather(self._poller, return_exceptions=True)
+            self._poller = None
+        await super().stop()
+
+    async def _poll_loop(self):
+        while True:
+            try:
+                for event_id, payload in await asyncio.to_thread(self._fetch, self._last_id):
+                    self._last_id = event_id
+                    await self._deliver(json.loads(payload))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка чтения шины прогресса {self.path}: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def publish(self, call_id: int, progress: int, status: str, message: str = None):
+        payload = json.dumps(_payload(call_id, progress, status, message), ensure_ascii=False)
+        try:
+            await asyncio.to_thread(self._insert, payload)
+            self.published += 1
+        except Exception as e:
+            logger.error(f"Ошибка публикации прогресса звонка {call_id}: {e}")
+
+    def stats(self) -> dict:
+        return {**super().stats(), "path": self.path, "last_event_id": self._last_id}
+
+def create_progress_bus(backend: str = PROGRESS_BUS):
+    backend = backend.lower()
+    if backend == "auto":
+        backend = "postgres" if DATABASE_URL.startswith(("postgres://", "postgresql")) else "memory"
+    if backend == "postgres":
+        return PostgresProgressBus(DATABASE_URL, PROGRESS_BUS_CHANNEL)
+    if backend == "sqlite":
+        return SqliteProgressBus(PROGRESS_BUS_SQLITE_PATH, PROGRESS_BUS_POLL_INTERVAL)
+    if backend != "memory":
+        logger.warning(f"Неизвестный PROGRESS_BUS={backend}, используется memory")
+    return MemoryProgressBus()
+
+progress_bus = create_progress_bus()
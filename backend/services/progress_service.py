@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import and_, bindparam, or_, update
+
+from models import Call, SessionLocal
+from services.progress_bus import progress_bus
+from services.websocket_service import manager
+from config import PROGRESS_FLUSH_INTERVAL, PROGRESS_STATE_MAX_CALLS
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+_flush_statement = (
+    update(Call.__table__)
+    .where(
+        Call.__table__.c.id == bindparam("call_id"),
+        or_(
+            Call.__table__.c.status.is_(None),
+            and_(*[Call.__table__.c.status != status for status in TERMINAL_STATUSES])
+        )
+    )
+    .values(progress=bindparam("new_progress"), status=bindparam("new_status"))
+)
+
+class ProgressAggregator:
+    def __init__(self, flush_interval: float):
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._pending: Dict[int, Tuple[int, str]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self.updates = 0
+        self.flushes = 0
+        self.rows_written = 0
+
+    async def update(self, call_id: int, progress: int, status: str = "processing", message: str = None):
+        with self._lock:
+            self._pending[call_id] = (progress, status)
+            self.updates += 1
+        await progress_bus.publish(call_id, progress, status, message)
+
+    async def finish(self, call_id: int, progress: int, status: str, message: str = None, persist: bool = True):
+        with self._lock:
+            self._pending.pop(call_id, None)
+        if persist:
+            await asyncio.to_thread(self._write_terminal, call_id, progress, status)
+        await progress_bus.publish(call_id, progress, status, message)
+
+    def _write_terminal(self, call_id: int, progress: int, status: str):
+        db = SessionLocal()
+        try:
+            db.execute(update(Call).where(Call.id == call_id).values(progress=progress, status=status))
+            db.commit()
+        finally:
+            db.close()
+
+    def _write_batch(self, batch: Dict[int, Tuple[int, str]]):
+        db = SessionLocal()
+        try:
+            db.connection().execute(_flush_statement, [
+                {"call_id": call_id, "new_progress": progress, "new_status": status}
+                for call_id, (progress, status) in batch.items()
+            ])
+            db.commit()
+        finally:
+            db.close()
+
+    async def flush(self):
+        async with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return
+            try:
+                await asyncio.to_thread(self._write_batch, batch)
+                self.flushes += 1
+                self.rows_written += len(batch)
+            except Exception as e:
+                logger.error(f"Ошибка записи прогресса в БД: {e}")
+                with self._lock:
+                    for call_id, value in batch.items():
+                        self._pending.setdefault(call_id, value)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._flush_lock = asyncio.Lock()
+            self._task = asyncio.create_task(self._flush_loop(), name="progress-flush")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            await self.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "pending": pending,
+            "updates": self.updates,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "flush_interval_seconds": self.flush_interval
+        }
+
+def status_version(status: Optional[str], progress: Optional[int]) -> str:
+    return f"{status or 'pending'}-{progress or 0}"
+
+def merge_status(stored: dict, tracked: Optional[dict]) -> dict:
+    if tracked is None:
+        return stored
+    if tracked["status"] == stored["status"]:
+        return tracked
+    if tracked["status"] == "processing" and stored["status"] in ("pending", "queued"):
+        return tracked
+    return stored
+
+class ProgressTracker:
+    def __init__(self, max_calls: int):
+        self.max_calls = max(1, max_calls)
+        self._states: "OrderedDict[int, dict]" = OrderedDict()
+        self._watchers: Dict[int, Tuple[asyncio.Event, int]] = {}
+
+    def update(self, call_id: int, progress: int, status: str, message: str = None):
+        self._states[call_id] = {"status": status, "progress": progress, "message": message}
+        self._states.move_to_end(call_id)
+        while len(self._states) > self.max_calls:
+            self._states.popitem(last=False)
+        watcher = self._watchers.pop(call_id, None)
+        if watcher is not None:
+            watcher[0].set()
+
+    def get(self, call_id: int) -> Optional[dict]:
+        return self._states.get(call_id)
+
+    def watch(self, call_id: int) -> asyncio.Event:
+        event, count = self._watchers.get(call_id, (asyncio.Event(), 0))
+        self._watchers[call_id] = (event, count + 1)
+        return event
+
+    def unwatch(self, call_id: int, event: asyncio.Event):
+        watcher = self._watchers.get(call_id)
+        if watcher is None or watcher[0] is not event:
+            return
+        if watcher[1] <= 1:
+            del self._watchers[call_id]
+        else:
+            self._watchers[call_id] = (event, watcher[1] - 1)
+
+    async def wait(self, event: asyncio.Event, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def stats(self) -> dict:
+        return {
+            "tracked_calls": len(self._states),
+            "waiting_calls": len(self._watchers),
+            "waiting_requests": sum(count for _, count in self._watchers.values())
+        }
+
+async def deliver_progress(call_id: int, progress: int, status: str, message: str = None):
+    progress_tracker.update(call_id, progress, status, message)
+    await manager.send_progress(call_id, progress, status, message)
+
+progress_aggregator = ProgressAggregator(PROGRESS_FLUSH_INTERVAL)
+progress_tracker = ProgressTracker(PROGRESS_STATE_MAX_CALLS)
@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Optional
+
+from config import (
+    GEMINI_EVALUATION_MODEL,
+    GEMINI_PROMPT_CACHE_ENABLED,
+    GEMINI_PROMPT_CACHE_TTL_SECONDS,
+)
+from services.providers import ProviderNotFoundError, provider
+from utils.checklist import CHECKLIST_PROMPT, CompiledChecklistPrompt
+
+logger = logging.getLogger(__name__)
+
+REFRESH_MARGIN_SECONDS = 60
+FAILURE_COOLDOWN_SECONDS = 300
+
+class PromptPrefixCache:
+    def __init__(self, backend, model: str, prompt: CompiledChecklistPrompt, ttl_seconds: int, enabled: bool):
+        self.backend = backend
+        self.model = model
+        self.prompt = prompt
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._handle = None
+        self._expires_at = 0.0
+        self._disabled_until = 0.0
+        self._lock = threading.Lock()
+        self.created = 0
+        self.cached_requests = 0
+        self.fallbacks = 0
+        self.cached_tokens = 0
+
+    def set_backend(self, backend):
+        with self._lock:
+            self.backend = backend
+            self._handle = None
+            self._expires_at = 0.0
+            self._disabled_until = 0.0
+
+    def is_active(self) -> bool:
+        return self.enabled and time.monotonic() >= self._disabled_until
+
+    def _get_handle(self):
+        with self._lock:
+            if self._handle is not None and time.monotonic() < self._expires_at - REFRESH_MARGIN_SECONDS:
+                return self._handle
+
+            self._handle = self.backend.create(
+                model=self.model,
+                prefix=self.prompt.text,
+                display_name=f"checklist-{self.prompt.version}",
+                ttl_seconds=self.ttl_seconds
+            )
+            self._expires_at = time.monotonic() + self.ttl_seconds
+            self.created += 1
+            logger.info(f"Промпт чек-листа {self.prompt.version} загружен в кэш провайдера")
+            return self._handle
+
+    def _invalidate(self, handle):
+        with self._lock:
+            if self._handle is handle:
+                self._handle = None
+                self._expires_at = 0.0
+
+    def _on_create_error(self, e: Exception):
+        self._disabled_until = time.monotonic() + FAILURE_COOLDOWN_SECONDS
+        self.fallbacks += 1
+        logger.warning(f"Не удалось создать кэш промпта, используется полный промпт: {e}")
+
+    def _should_fallback(self, handle, e: Exception) -> bool:
+        self._invalidate(handle)
+        not_found = isinstance(e, ProviderNotFoundError) or getattr(e, "code", None) == 404
+        if not_found or "expired" in str(e).lower():
+            self.fallbacks += 1
+            logger.warning(f"Кэш промпта истек на стороне провайдера, используется полный промпт: {e}")
+            return True
+        return False
+
+    def _on_response(self, response):
+        self.cached_requests += 1
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            self.cached_tokens += getattr(usage, "cached_content_token_count", 0) or 0
+        return response
+
+    async def generate_async(self, suffix: str, generation_config) -> Optional[object]:
+        if not self.is_active():
+            return None
+
+        try:
+            handle = await asyncio.to_thread(self._get_handle)
+        except Exception as e:
+            self._on_create_error(e)
+            return None
+
+        try:
+            response = await self.backend.generate_async(handle, suffix, generation_config)
+        except Exception as e:
+            if self._should_fallback(handle, e):
+                return None
+            raise
+        return self._on_response(response)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "active": self.is_active(),
+            "model": self.model,
+            "checklist_version": self.prompt.version,
+            "prefix_bytes": len(self.prompt.text.encode("utf-8")),
+            "created": self.created,
+            "cached_requests": self.cached_requests,
+            "fallbacks": self.fallbacks,
+            "cached_tokens": self.cached_tokens
+        }
+
+prompt_cache = PromptPrefixCache(
+    backend=provider.prefix_cache_backend(),
+    model=GEMINI_EVALUATION_MODEL,
+    prompt=CHECKLIST_PROMPT,
+    ttl_seconds=GEMINI_PROMPT_CACHE_TTL_SECONDS,
+    enabled=GEMINI_PROMPT_CACHE_ENABLED,
+)
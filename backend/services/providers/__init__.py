@@ -0,0 +1,45 @@
+import logging
+
+from services.providers.base import AIProvider, ProviderError, ProviderNotFoundError, ProviderRateLimitError, ProviderServerError
+from config import (
+    AI_PROVIDER,
+    GEMINI_API_KEY,
+    FAKE_AI_TRANSCRIPTION_LATENCY_MS,
+    FAKE_AI_EVALUATION_LATENCY_MS,
+    FAKE_AI_LATENCY_SIGMA,
+    FAKE_AI_UPLOAD_MS_PER_MB,
+    FAKE_AI_PROCESSING_SECONDS,
+    FAKE_AI_RATE_LIMIT_RATE,
+    FAKE_AI_ERROR_RATE,
+    FAKE_AI_RETRY_AFTER_SECONDS,
+    FAKE_AI_TRANSCRIPT_PATH,
+    FAKE_AI_SEED,
+)
+
+logger = logging.getLogger(__name__)
+
+def create_provider(name: str = AI_PROVIDER) -> AIProvider:
+    name = name.lower()
+    if name == "fake":
+        from services.providers.fake import FakeProvider
+
+        logger.warning("Используется локальный фейковый AI-провайдер, ответы моделей не настоящие")
+        return FakeProvider(
+            transcription_latency_ms=FAKE_AI_TRANSCRIPTION_LATENCY_MS,
+            evaluation_latency_ms=FAKE_AI_EVALUATION_LATENCY_MS,
+            latency_sigma=FAKE_AI_LATENCY_SIGMA,
+            upload_ms_per_mb=FAKE_AI_UPLOAD_MS_PER_MB,
+            processing_seconds=FAKE_AI_PROCESSING_SECONDS,
+            rate_limit_rate=FAKE_AI_RATE_LIMIT_RATE,
+            error_rate=FAKE_AI_ERROR_RATE,
+            retry_after_seconds=FAKE_AI_RETRY_AFTER_SECONDS,
+            transcript_path=FAKE_AI_TRANSCRIPT_PATH,
+            seed=FAKE_AI_SEED
+        )
+    if name != "gemini":
+        logger.warning(f"Неизвестный AI_PROVIDER={name}, используется gemini")
+    from services.providers.gemini import GeminiProvider
+
+    return GeminiProvider(GEMINI_API_KEY)
+
+provider = create_provider()
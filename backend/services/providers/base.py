@@ -0,0 +1,45 @@
+from abc import ABC, abstractmethod
+from typing import Optional
+
+class ProviderError(Exception):
+    pass
+
+class ProviderRateLimitError(ProviderError):
+    def __init__(self, message: str, retry_delay: Optional[float] = None):
+        super().__init__(message)
+        self.retry_delay = retry_delay
+
+class ProviderServerError(ProviderError):
+    pass
+
+class ProviderNotFoundError(ProviderError):
+    pass
+
+class AIProvider(ABC):
+    name = "base"
+
+    @abstractmethod
+    def upload_file(self, path: str):
+        pass
+
+    @abstractmethod
+    def get_file(self, name: str):
+        pass
+
+    @abstractmethod
+    def delete_file(self, name: str):
+        pass
+
+    @abstractmethod
+    async def generate_async(self, model: str, contents, generation_config: dict):
+        pass
+
+    @abstractmethod
+    def prefix_cache_backend(self):
+        pass
+
+    def is_configured(self) -> bool:
+        return True
+
+    def stats(self) -> dict:
+        return {"name": self.name}
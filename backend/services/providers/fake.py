@@ -0,0 +1,194 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from typing import Optional
+
+from services.providers.base import AIProvider, ProviderNotFoundError, ProviderRateLimitError, ProviderServerError
+from utils.checklist import CRITERIA_KEYS
+
+BATCH_ITEM_PATTERN = re.compile(r"=== Звонок (\S+) ===\n(.*?)\n=== Конец звонка \1 ===", re.DOTALL)
+CHARS_PER_TOKEN = 3
+SCORES = (0, 0.5, 1)
+
+TRANSCRIPT_LINES = (
+    "Менеджер: Добрый день! Меня зовут Елена, школа программирования. Удобно говорить?",
+    "Клиент: Да, здравствуйте.",
+    "Менеджер: Подскажите, у ребенка есть компьютер с камерой для занятий?",
+    "Клиент: Есть ноутбук.",
+    "Менеджер: Сколько лет ребенку и какое направление ему интересно?",
+    "Клиент: Двенадцать, хочет делать игры.",
+    "Менеджер: Занимался раньше программированием или онлайн-курсами?",
+    "Клиент: Немного в школе, дистанционно не пробовали.",
+    "Менеджер: Правильно понимаю, что цель - чтобы ребенок сам собрал свою первую игру?",
+    "Клиент: Да, именно так.",
+    "Менеджер: Тогда предлагаю пробный урок в субботу в одиннадцать. Подходит?",
+    "Клиент: Подходит, спасибо.",
+)
+
+class _FileState:
+    def __init__(self, name: str):
+        self.name = name
+
+class _FakeFile:
+    def __init__(self, name: str, path: str, size: int, ready_at: float):
+        self.name = name
+        self.uri = f"fake://{name}"
+        self.path = path
+        self.size = size
+        self.ready_at = ready_at
+
+    @property
+    def state(self) -> _FileState:
+        return _FileState("ACTIVE" if time.monotonic() >= self.ready_at else "PROCESSING")
+
+class _Usage:
+    def __init__(self, prompt_tokens: int, output_tokens: int):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+        self.total_token_count = prompt_tokens + output_tokens
+        self.cached_content_token_count = 0
+
+class _FakeResponse:
+    def __init__(self, text: str, prompt_tokens: int):
+        self.text = text
+        self.usage_metadata = _Usage(prompt_tokens, len(text) // CHARS_PER_TOKEN)
+
+def _digest(value: str) -> bytes:
+    return hashlib.sha256(value.encode("utf-8")).digest()
+
+def fake_transcript(seed: str, size: int) -> str:
+    digest = _digest(seed)
+    lines = max(4, min(len(TRANSCRIPT_LINES) * 8, size // 4096))
+    offset = digest[0] % len(TRANSCRIPT_LINES)
+    body = [TRANSCRIPT_LINES[(offset + i) % len(TRANSCRIPT_LINES)] for i in range(lines)]
+    return "\n".join([f"Менеджер: Номер заявки {digest[:4].hex()}."] + body)
+
+def fake_scores(transcription: str) -> dict:
+    digest = _digest(transcription)
+    return {
+        key: {"score": SCORES[digest[index] % len(SCORES)], "comment": f"Тестовая оценка критерия {key}"}
+        for index, key in enumerate(CRITERIA_KEYS)
+    }
+
+def fake_evaluation(prompt: str) -> str:
+    items = BATCH_ITEM_PATTERN.findall(prompt)
+    if items:
+        return json.dumps({item_id: fake_scores(text) for item_id, text in items}, ensure_ascii=False)
+    transcription = prompt.rsplit("Расшифровка звонка:", 1)[-1]
+    return json.dumps(fake_scores(transcription), ensure_ascii=False)
+
+class FakePrefixCacheBackend:
+    def __init__(self, provider: "FakeProvider"):
+        self.provider = provider
+        self.prefixes = {}
+
+    def create(self, model: str, prefix: str, display_name: str, ttl_seconds: int):
+        handle = f"cachedContents/fake-{uuid.uuid4().hex[:8]}"
+        self.prefixes[handle] = prefix
+        return handle
+
+    async def generate_async(self, handle, suffix: str, generation_config):
+        if handle not in self.prefixes:
+            raise ProviderNotFoundError(f"Кэшированный контент {handle} не найден")
+        return await self.provider.generate_async("cached", suffix, generation_config)
+
+class FakeProvider(AIProvider):
+    name = "fake"
+
+    def __init__(self, transcription_latency_ms: float, evaluation_latency_ms: float, latency_sigma: float,
+                 upload_ms_per_mb: float, processing_seconds: float, rate_limit_rate: float, error_rate: float,
+                 retry_after_seconds: float, transcript_path: str = "", seed: Optional[int] = None):
+        self.transcription_latency_ms = transcription_latency_ms
+        self.evaluation_latency_ms = evaluation_latency_ms
+        self.latency_sigma = latency_sigma
+        self.upload_ms_per_mb = upload_ms_per_mb
+        self.processing_seconds = processing_seconds
+        self.rate_limit_rate = rate_limit_rate
+        self.error_rate = error_rate
+        self.retry_after_seconds = retry_after_seconds
+        self.transcript = None
+        if transcript_path:
+            with open(transcript_path, encoding="utf-8") as f:
+                self.transcript = f.read().strip()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._files = {}
+        self.requests = 0
+        self.rate_limited = 0
+        self.errors = 0
+
+    def _latency(self, median_ms: float) -> float:
+        if median_ms <= 0:
+            return 0.0
+        with self._lock:
+            return self._random.lognormvariate(0, self.latency_sigma) * median_ms / 1000
+
+    def _inject_errors(self, model: str):
+        with self._lock:
+            self.requests += 1
+            roll = self._random.random()
+            if roll < self.rate_limit_rate:
+                self.rate_limited += 1
+                raise ProviderRateLimitError(
+                    f"429 Resource has been exhausted (fake provider, model {model})",
+                    retry_delay=self.retry_after_seconds
+                )
+            if roll < self.rate_limit_rate + self.error_rate:
+                self.errors += 1
+                raise ProviderServerError(f"503 Service unavailable (fake provider, model {model})")
+
+    def upload_file(self, path: str):
+        size = os.path.getsize(path)
+        time.sleep(self.upload_ms_per_mb * size / (1024 * 1024) / 1000)
+        audio_file = _FakeFile(f"files/fake-{uuid.uuid4().hex[:12]}", path, size, time.monotonic() + self.processing_seconds)
+        with self._lock:
+            self._files[audio_file.name] = audio_file
+        return audio_file
+
+    def get_file(self, name: str):
+        with self._lock:
+            audio_file = self._files.get(name)
+        if audio_file is None:
+            raise ProviderNotFoundError(f"Файл {name} не найден")
+        return audio_file
+
+    def delete_file(self, name: str):
+        with self._lock:
+            self._files.pop(name, None)
+
+    def _respond(self, model: str, contents) -> _FakeResponse:
+        self._inject_errors(model)
+        parts = contents if isinstance(contents, list) else [contents]
+        audio_file = next((part for part in parts if isinstance(part, _FakeFile)), None)
+        prompt = "\n".join(part for part in parts if isinstance(part, str))
+        if audio_file is not None:
+            text = self.transcript or fake_transcript(f"{audio_file.path}:{audio_file.size}", audio_file.size)
+            return _FakeResponse(text, len(prompt) // CHARS_PER_TOKEN + audio_file.size // 500)
+        return _FakeResponse(fake_evaluation(prompt), len(prompt) // CHARS_PER_TOKEN)
+
+    def _is_transcription(self, contents) -> bool:
+        return isinstance(contents, list) and any(isinstance(part, _FakeFile) for part in contents)
+
+    async def generate_async(self, model: str, contents, generation_config: dict):
+        median = self.transcription_latency_ms if self._is_transcription(contents) else self.evaluation_latency_ms
+        await asyncio.sleep(self._latency(median))
+        return self._respond(model, contents)
+
+    def prefix_cache_backend(self):
+        return FakePrefixCacheBackend(self)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **super().stats(),
+                "requests": self.requests,
+                "rate_limited": self.rate_limited,
+                "errors": self.errors,
+                "files": len(self._files)
+            }
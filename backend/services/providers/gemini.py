@@ -0,0 +1,64 @@
+import threading
+from datetime import timedelta
+
+import google.generativeai as genai
+
+from services.providers.base import AIProvider
+
+try:
+    from google.generativeai import caching as genai_caching
+except ImportError:
+    genai_caching = None
+
+class GeminiPrefixCacheBackend:
+    def __init__(self, provider: "GeminiProvider"):
+        self.provider = provider
+
+    def create(self, model: str, prefix: str, display_name: str, ttl_seconds: int):
+        if genai_caching is None:
+            raise RuntimeError("google.generativeai.caching недоступен в установленной версии SDK")
+        self.provider.client()
+        return genai_caching.CachedContent.create(
+            model=model,
+            display_name=display_name,
+            contents=[prefix],
+            ttl=timedelta(seconds=ttl_seconds)
+        )
+
+    async def generate_async(self, handle, suffix: str, generation_config):
+        model = self.provider.client().GenerativeModel.from_cached_content(cached_content=handle)
+        return await model.generate_content_async(suffix, generation_config=generation_config)
+
+class GeminiProvider(AIProvider):
+    name = "gemini"
+
+    def __init__(self, api_key: str):
+        self.api_key = api_key
+        self._configured = False
+        self._lock = threading.Lock()
+
+    def client(self):
+        if not self._configured:
+            with self._lock:
+                if not self._configured:
+                    genai.configure(api_key=self.api_key)
+                    self._configured = True
+        return genai
+
+    def upload_file(self, path: str):
+        return self.client().upload_file(path=path)
+
+    def get_file(self, name: str):
+        return self.client().get_file(name)
+
+    def delete_file(self, name: str):
+        self.client().delete_file(name)
+
+    async def generate_async(self, model: str, contents, generation_config: dict):
+        return await self.client().GenerativeModel(model).generate_content_async(contents, generation_config=generation_config)
+
+    def prefix_cache_backend(self):
+        return GeminiPrefixCacheBackend(self)
+
+    def is_configured(self) -> bool:
+        return bool(self.api_key and self.api_key.strip())
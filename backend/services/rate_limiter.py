@@ -0,0 +1,288 @@
+import asyncio
+import logging
+import random
+import re
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+from config import (
+    GEMINI_TRANSCRIPTION_MODEL,
+    GEMINI_EVALUATION_MODEL,
+    GEMINI_TRANSCRIPTION_RPM,
+    GEMINI_TRANSCRIPTION_TPM,
+    GEMINI_EVALUATION_RPM,
+    GEMINI_EVALUATION_TPM,
+    GEMINI_MAX_RETRIES,
+    GEMINI_RETRY_BASE_DELAY,
+    GEMINI_RETRY_MAX_DELAY,
+)
+from services.providers.base import ProviderRateLimitError, ProviderServerError
+from utils.metrics import record_provider_error
+from utils.timing import add_retry, add_tokens
+
+try:
+    from google.api_core import exceptions as google_exceptions
+except ImportError:
+    google_exceptions = None
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+FILES_API = "files"
+
+RETRY_DELAY_PATTERNS = [
+    re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)", re.IGNORECASE),
+    re.compile(r"retry in\s*([\d.]+)\s*s", re.IGNORECASE),
+    re.compile(r"retry after\s*([\d.]+)", re.IGNORECASE),
+]
+
+class _Bucket:
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        if self.capacity <= 0:
+            return 0.0
+        self._refill(now)
+        self.level -= min(amount, self.capacity)
+        if self.level >= 0:
+            return 0.0
+        return -self.level / self.rate
+
+    def refund(self, amount: float, now: float):
+        if self.capacity <= 0:
+            return
+        self._refill(now)
+        self.level = min(self.capacity, self.level + amount)
+
+    def available(self, now: float) -> Optional[float]:
+        if self.capacity <= 0:
+            return None
+        self._refill(now)
+        return round(self.level, 1)
+
+class ModelLimiter:
+    def __init__(self, model: str, rpm: int, tpm: int):
+        self.model = model
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = _Bucket(rpm)
+        self._tokens = _Bucket(tpm)
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.requests = 0
+        self.throttled = 0
+        self.wait_seconds = 0.0
+        self.retries = 0
+        self.rate_limited = 0
+        self.failures = 0
+
+    def reserve(self, tokens: int) -> float:
+        with self._lock:
+            now = time.monotonic()
+            delay = max(
+                self._requests.reserve(1, now),
+                self._tokens.reserve(tokens, now),
+                self._blocked_until - now,
+                0.0
+            )
+            self.requests += 1
+            if delay > 0:
+                self.throttled += 1
+                self.wait_seconds += delay
+            return delay
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: Optional[int]):
+        if not actual_tokens:
+            return
+        with self._lock:
+            self._tokens.refund(estimated_tokens - actual_tokens, time.monotonic())
+
+    def refund(self, estimated_tokens: int):
+        if estimated_tokens <= 0:
+            return
+        with self._lock:
+            self._tokens.refund(estimated_tokens, time.monotonic())
+
+    def count(self, field: str, amount: int = 1):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + amount)
+
+    def block_for(self, seconds: float):
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                "model": self.model,
+                "rpm_limit": self.rpm,
+                "tpm_limit": self.tpm,
+                "requests_available": self._requests.available(now),
+                "tokens_available": self._tokens.available(now),
+                "blocked_for_seconds": round(max(0.0, self._blocked_until - now), 1),
+                "waiting": self.waiting,
+                "requests": self.requests,
+                "throttled": self.throttled,
+                "total_wait_seconds": round(self.wait_seconds, 1),
+                "retries": self.retries,
+                "rate_limited": self.rate_limited,
+                "failures": self.failures
+            }
+
+def is_rate_limit_error(e: Exception) -> bool:
+    if isinstance(e, ProviderRateLimitError):
+        return True
+    if google_exceptions and isinstance(e, google_exceptions.ResourceExhausted):
+        return True
+    error_msg = str(e)
+    return "ResourceExhausted" in str(type(e)) or "429" in error_msg or "quota" in error_msg.lower()
+
+def is_retryable_error(e: Exception) -> bool:
+    error_msg = str(e)
+    if "limit: 0" in error_msg or "free_tier" in error_msg.lower():
+        return False
+    if is_rate_limit_error(e) or isinstance(e, ProviderServerError):
+        return True
+    return bool(google_exceptions) and isinstance(e, (
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.InternalServerError,
+        google_exceptions.DeadlineExceeded,
+    ))
+
+def provider_error_type(e: Exception) -> str:
+    if is_rate_limit_error(e):
+        return "rate_limit"
+    if isinstance(e, ProviderServerError):
+        return "server"
+    if google_exceptions is not None:
+        if isinstance(e, google_exceptions.DeadlineExceeded):
+            return "timeout"
+        if isinstance(e, (google_exceptions.ServiceUnavailable, google_exceptions.InternalServerError)):
+            return "server"
+        if isinstance(e, google_exceptions.InvalidArgument):
+            return "invalid_request"
+        if isinstance(e, (google_exceptions.PermissionDenied, google_exceptions.Unauthenticated)):
+            return "auth"
+    if isinstance(e, (TimeoutError, ConnectionError)):
+        return "network"
+    return "other"
+
+def server_retry_delay(e: Exception) -> Optional[float]:
+    retry_delay = getattr(e, "retry_delay", None)
+    if retry_delay is not None:
+        seconds = getattr(retry_delay, "total_seconds", None)
+        return seconds() if callable(seconds) else float(retry_delay)
+    for pattern in RETRY_DELAY_PATTERNS:
+        match = pattern.search(str(e))
+        if match:
+            return float(match.group(1))
+    return None
+
+class RateLimiter:
+    def __init__(self, max_retries: int, base_delay: float, max_delay: float):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._limiters: Dict[str, ModelLimiter] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, model: str, rpm: int, tpm: int):
+        with self._lock:
+            self._limiters[model] = ModelLimiter(model, rpm, tpm)
+
+    def for_model(self, model: str) -> ModelLimiter:
+        with self._lock:
+            if model not in self._limiters:
+                self._limiters[model] = ModelLimiter(model, 0, 0)
+            return self._limiters[model]
+
+    def _retry_delay(self, limiter: ModelLimiter, attempt: int, e: Exception) -> Optional[float]:
+        record_provider_error(limiter.model, provider_error_type(e))
+        if attempt >= self.max_retries or not is_retryable_error(e):
+            limiter.count("failures")
+            return None
+
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        server_delay = server_retry_delay(e)
+        delay = max(backoff, server_delay or 0.0)
+
+        limiter.count("retries")
+        add_retry()
+        if is_rate_limit_error(e):
+            limiter.count("rate_limited")
+            limiter.block_for(delay)
+        logger.warning(f"Повтор запроса к {limiter.model} через {delay:.1f}с (попытка {attempt + 1}/{self.max_retries}): {e}")
+        return delay
+
+    async def call_async(self, model: str, func: Callable[[], Awaitable[T]], estimated_tokens: int = 0) -> T:
+        limiter = self.for_model(model)
+        attempt = 0
+        while True:
+            delay = limiter.reserve(estimated_tokens)
+            if delay > 0:
+                limiter.count("waiting")
+                try:
+                    await asyncio.sleep(delay)
+                finally:
+                    limiter.count("waiting", -1)
+            try:
+                result = await func()
+                tokens = usage_tokens(result)
+                limiter.record_usage(estimated_tokens, tokens)
+                add_tokens(tokens)
+                return result
+            except Exception as e:
+                limiter.refund(estimated_tokens)
+                retry_delay = self._retry_delay(limiter, attempt, e)
+                if retry_delay is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(retry_delay)
+
+    def stats(self) -> dict:
+        with self._lock:
+            limiters = list(self._limiters.values())
+        return {
+            "max_retries": self.max_retries,
+            "models": [limiter.stats() for limiter in limiters]
+        }
+
+def stricter_limit(first: int, second: int) -> int:
+    if not first or not second:
+        return first or second
+    return min(first, second)
+
+def usage_tokens(response) -> Optional[int]:
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return None
+    return getattr(usage, "total_token_count", None)
+
+rate_limiter = RateLimiter(
+    max_retries=GEMINI_MAX_RETRIES,
+    base_delay=GEMINI_RETRY_BASE_DELAY,
+    max_delay=GEMINI_RETRY_MAX_DELAY,
+)
+if GEMINI_EVALUATION_MODEL != GEMINI_TRANSCRIPTION_MODEL:
+    rate_limiter.configure(GEMINI_TRANSCRIPTION_MODEL, GEMINI_TRANSCRIPTION_RPM, GEMINI_TRANSCRIPTION_TPM)
+    rate_limiter.configure(GEMINI_EVALUATION_MODEL, GEMINI_EVALUATION_RPM, GEMINI_EVALUATION_TPM)
+else:
+    shared_rpm = stricter_limit(GEMINI_TRANSCRIPTION_RPM, GEMINI_EVALUATION_RPM)
+    shared_tpm = stricter_limit(GEMINI_TRANSCRIPTION_TPM, GEMINI_EVALUATION_TPM)
+    logger.warning(
+        f"Транскрипция и оценка используют одну модель {GEMINI_TRANSCRIPTION_MODEL}: лимиты объединены, "
+        f"применяется более строгий - {shared_rpm or 'без лимита'} RPM, {shared_tpm or 'без лимита'} TPM"
+    )
+    rate_limiter.configure(GEMINI_TRANSCRIPTION_MODEL, shared_rpm, shared_tpm)
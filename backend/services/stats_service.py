@@ -0,0 +1,207 @@
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from models import Call, Evaluation, EvaluationRollup, SessionLocal
+from utils.checklist import CRITERIA_KEYS
+
+logger = logging.getLogger(__name__)
+
+TOTAL_METRIC = "total"
+METRICS = (TOTAL_METRIC,) + CRITERIA_KEYS
+PERIODS = ("day", "week", "month")
+REBUILD_BATCH_SIZE = 1000
+
+def period_date_for(call: Call) -> date:
+    moment = call.call_date or call.created_at or datetime.utcnow()
+    return moment.date()
+
+def contributions(evaluation: Evaluation) -> Dict[str, float]:
+    values = {}
+    if evaluation.итоговая_оценка is not None:
+        values[TOTAL_METRIC] = float(evaluation.итоговая_оценка)
+    scores = evaluation.scores or {}
+    for key in CRITERIA_KEYS:
+        item = scores.get(key)
+        if isinstance(item, dict) and isinstance(item.get("score"), (int, float)):
+            values[key] = float(item["score"])
+    return values
+
+def _delta_rows(manager: str, period_date: date, values: Dict[str, float], sign: int) -> list:
+    return [
+        {
+            "manager": manager,
+            "period_date": period_date,
+            "metric": metric,
+            "evaluations": sign,
+            "score_sum": sign * score,
+            "max_count": sign if metric != TOTAL_METRIC and score >= 1 else 0,
+            "zero_count": sign if score == 0 else 0,
+        }
+        for metric, score in values.items()
+    ]
+
+def _insert_for(db: Session):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    return None
+
+def _apply_rows(db: Session, rows: list):
+    if not rows:
+        return
+
+    insert = _insert_for(db)
+    if insert is None:
+        for row in rows:
+            rollup = db.query(EvaluationRollup).filter(
+                EvaluationRollup.manager == row["manager"],
+                EvaluationRollup.period_date == row["period_date"],
+                EvaluationRollup.metric == row["metric"]
+            ).with_for_update().first()
+            if rollup is None:
+                db.add(EvaluationRollup(**row))
+                db.flush()
+                continue
+            rollup.evaluations += row["evaluations"]
+            rollup.score_sum += row["score_sum"]
+            rollup.max_count += row["max_count"]
+            rollup.zero_count += row["zero_count"]
+        return
+
+    for row in rows:
+        statement = insert(EvaluationRollup).values(**row)
+        db.execute(statement.on_conflict_do_update(
+            index_elements=["manager", "period_date", "metric"],
+            set_={
+                "evaluations": EvaluationRollup.evaluations + statement.excluded.evaluations,
+                "score_sum": EvaluationRollup.score_sum + statement.excluded.score_sum,
+                "max_count": EvaluationRollup.max_count + statement.excluded.max_count,
+                "zero_count": EvaluationRollup.zero_count + statement.excluded.zero_count,
+            }
+        ))
+
+def apply_latest_change(db: Session, call: Call, previous: Optional[Evaluation], current: Evaluation):
+    manager = call.manager or ""
+    period_date = period_date_for(call)
+    rows = []
+    if previous is not None:
+        rows.extend(_delta_rows(manager, period_date, contributions(previous), -1))
+    rows.extend(_delta_rows(manager, period_date, contributions(current), 1))
+    _apply_rows(db, rows)
+
+def rebuild_rollups() -> int:
+    db = SessionLocal()
+    try:
+        totals = defaultdict(lambda: {"evaluations": 0, "score_sum": 0.0, "max_count": 0, "zero_count": 0})
+        calls = 0
+        query = select(Call, Evaluation).join(
+            Evaluation, Evaluation.id == Call.latest_evaluation_id
+        ).execution_options(yield_per=REBUILD_BATCH_SIZE)
+        for call, evaluation in db.execute(query):
+            calls += 1
+            for row in _delta_rows(call.manager or "", period_date_for(call), contributions(evaluation), 1):
+                bucket = totals[(row["manager"], row["period_date"], row["metric"])]
+                for field in ("evaluations", "score_sum", "max_count", "zero_count"):
+                    bucket[field] += row[field]
+
+        db.query(EvaluationRollup).delete(synchronize_session=False)
+        db.bulk_insert_mappings(EvaluationRollup, [
+            {"manager": manager, "period_date": period_date, "metric": metric, **values}
+            for (manager, period_date, metric), values in totals.items()
+        ])
+        db.commit()
+        logger.info(f"Агрегаты статистики пересчитаны: {calls} звонков, {len(totals)} строк")
+        return calls
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def ensure_rollups():
+    db = SessionLocal()
+    try:
+        has_rollups = db.query(EvaluationRollup.id).limit(1).first() is not None
+        has_evaluations = db.query(Call.id).filter(Call.latest_evaluation_id.isnot(None)).limit(1).first() is not None
+    finally:
+        db.close()
+    if has_evaluations and not has_rollups:
+        logger.info("Агрегаты статистики отсутствуют, выполняется первичный расчет")
+        rebuild_rollups()
+
+def _period_start(value: date, period: str) -> date:
+    if period == "week":
+        return value - timedelta(days=value.weekday())
+    if period == "month":
+        return value.replace(day=1)
+    return value
+
+def _summary(metrics: Dict[str, dict]) -> dict:
+    total = metrics.get(TOTAL_METRIC)
+    criteria = {}
+    for key in CRITERIA_KEYS:
+        values = metrics.get(key)
+        if not values or not values["evaluations"]:
+            continue
+        criteria[key] = {
+            "evaluated": values["evaluations"],
+            "average": round(values["score_sum"] / values["evaluations"], 3),
+            "pass_rate": round(values["max_count"] / values["evaluations"], 3),
+            "fail_rate": round(values["zero_count"] / values["evaluations"], 3)
+        }
+    return {
+        "calls": total["evaluations"] if total else 0,
+        "average_score": round(total["score_sum"] / total["evaluations"], 2) if total and total["evaluations"] else None,
+        "criteria": criteria
+    }
+
+def _grouped(db: Session, group_column, manager: Optional[str], start: Optional[date], end: Optional[date]):
+    query = db.query(
+        group_column,
+        EvaluationRollup.metric,
+        func.sum(EvaluationRollup.evaluations),
+        func.sum(EvaluationRollup.score_sum),
+        func.sum(EvaluationRollup.max_count),
+        func.sum(EvaluationRollup.zero_count)
+    )
+    if manager is not None:
+        query = query.filter(EvaluationRollup.manager == manager)
+    if start:
+        query = query.filter(EvaluationRollup.period_date >= start)
+    if end:
+        query = query.filter(EvaluationRollup.period_date <= end)
+    return query.group_by(group_column, EvaluationRollup.metric).all()
+
+def _accumulate(target: dict, metric: str, evaluations, score_sum, max_count, zero_count):
+    values = target.setdefault(metric, {"evaluations": 0, "score_sum": 0.0, "max_count": 0, "zero_count": 0})
+    values["evaluations"] += int(evaluations or 0)
+    values["score_sum"] += float(score_sum or 0)
+    values["max_count"] += int(max_count or 0)
+    values["zero_count"] += int(zero_count or 0)
+
+def manager_stats(db: Session, start: Optional[date] = None, end: Optional[date] = None) -> list:
+    by_manager: Dict[str, dict] = {}
+    for manager, metric, *values in _grouped(db, EvaluationRollup.manager, None, start, end):
+        _accumulate(by_manager.setdefault(manager, {}), metric, *values)
+
+    result = [{"manager": manager or None, **_summary(metrics)} for manager, metrics in by_manager.items()]
+    result = [item for item in result if item["calls"] > 0]
+    return sorted(result, key=lambda item: (item["manager"] is None, item["manager"] or ""))
+
+def period_stats(db: Session, period: str, manager: Optional[str] = None,
+                 start: Optional[date] = None, end: Optional[date] = None) -> list:
+    by_period: Dict[date, dict] = {}
+    for period_date, metric, *values in _grouped(db, EvaluationRollup.period_date, manager, start, end):
+        _accumulate(by_period.setdefault(_period_start(period_date, period), {}), metric, *values)
+
+    result = [{"period": period_start.isoformat(), **_summary(metrics)} for period_start, metrics in sorted(by_period.items())]
+    return [item for item in result if item["calls"] > 0]
@@ -0,0 +1,97 @@
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from models import CallTiming, SessionLocal
+from utils.timing import TimingLedger, percentile
+from config import CALL_TIMINGS_ENABLED, CALL_TIMINGS_RETENTION_DAYS
+
+logger = logging.getLogger(__name__)
+
+STATS_BATCH_SIZE = 5000
+
+def save_timings(ledger: TimingLedger):
+    if not CALL_TIMINGS_ENABLED:
+        return
+    rows = ledger.rows()
+    if not rows:
+        return
+    db = SessionLocal()
+    try:
+        db.bulk_insert_mappings(CallTiming, rows)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Не удалось сохранить тайминги звонка {ledger.call_id}: {e}")
+    finally:
+        db.close()
+
+def purge_timings():
+    if CALL_TIMINGS_RETENTION_DAYS <= 0:
+        return
+    db = SessionLocal()
+    try:
+        cutoff = datetime.utcnow() - timedelta(days=CALL_TIMINGS_RETENTION_DAYS)
+        deleted = db.execute(delete(CallTiming).where(CallTiming.started_at < cutoff)).rowcount
+        db.commit()
+        if deleted:
+            logger.info(f"Удалено устаревших таймингов: {deleted}")
+    finally:
+        db.close()
+
+def _span_dict(timing: CallTiming) -> dict:
+    return {
+        "operation": timing.operation,
+        "stage": timing.stage,
+        "started_at": timing.started_at.isoformat(),
+        "duration_ms": timing.duration_ms,
+        "bytes": timing.bytes,
+        "tokens": timing.tokens,
+        "retries": timing.retries,
+        "status": timing.status
+    }
+
+def call_timings(db: Session, call_id: int) -> list:
+    timings = db.execute(
+        select(CallTiming).where(CallTiming.call_id == call_id).order_by(CallTiming.id)
+    ).scalars().all()
+    
+    runs = {}
+    for timing in timings:
+        run = runs.setdefault(timing.run_id, {"run_id": timing.run_id, "started_at": timing.started_at.isoformat(), "spans": []})
+        run["spans"].append(_span_dict(timing))
+    return list(runs.values())
+
+def stage_stats(db: Session, since: datetime, operation: Optional[str] = None) -> list:
+    query = select(
+        CallTiming.operation, CallTiming.stage, CallTiming.duration_ms, CallTiming.retries, CallTiming.status
+    ).where(CallTiming.started_at >= since)
+    if operation:
+        query = query.where(CallTiming.operation == operation)
+    
+    durations = defaultdict(list)
+    retries = defaultdict(int)
+    failures = defaultdict(int)
+    for row in db.execute(query.execution_options(yield_per=STATS_BATCH_SIZE)):
+        key = (row.operation, row.stage)
+        durations[key].append(row.duration_ms)
+        retries[key] += row.retries
+        failures[key] += row.status == "failed"
+    
+    return [
+        {
+            "operation": key[0],
+            "stage": key[1],
+            "count": len(values),
+            "p50_ms": percentile(values, 0.5),
+            "p95_ms": percentile(values, 0.95),
+            "max_ms": max(values),
+            "retries": retries[key],
+            "failures": failures[key]
+        }
+        for key, values in sorted(durations.items())
+    ]
@@ -0,0 +1,106 @@
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy.exc import IntegrityError
+
+from models import TranscriptionCacheEntry, SessionLocal
+from config import GEMINI_TRANSCRIPTION_MODEL, TRANSCRIPTION_CACHE_ENABLED
+from services.providers import provider
+from services.transcription_service import TRANSCRIPTION_PROMPT
+
+logger = logging.getLogger(__name__)
+
+class TranscriptionCache:
+    def __init__(self, enabled: bool, provider_name: str, model: str, prompt: str):
+        self.enabled = enabled
+        self.model = f"{provider_name}/{model}"
+        self.prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    def make_key(self, audio_sha256: str, model: Optional[str] = None) -> str:
+        return hashlib.sha256(f"{audio_sha256}:{model or self.model}:{self.prompt_hash}".encode("utf-8")).hexdigest()
+
+    def get(self, audio_sha256: Optional[str], models: Optional[List[str]] = None) -> Optional[str]:
+        if not self.enabled or not audio_sha256:
+            with self._lock:
+                self.bypassed += 1
+            return None
+
+        keys = [self.make_key(audio_sha256, model) for model in models or [self.model]]
+        db = SessionLocal()
+        try:
+            entries = {
+                entry.key: entry
+                for entry in db.query(TranscriptionCacheEntry).filter(TranscriptionCacheEntry.key.in_(keys))
+            }
+            entry = next((entries[key] for key in keys if key in entries), None)
+            if not entry:
+                with self._lock:
+                    self.misses += 1
+                return None
+
+            entry.hits = (entry.hits or 0) + 1
+            entry.last_hit_at = datetime.utcnow()
+            db.commit()
+            with self._lock:
+                self.hits += 1
+            logger.info(f"Транскрипция найдена в кэше (audio {audio_sha256[:12]}, {entry.model})")
+            return entry.transcription
+        except Exception as e:
+            logger.warning(f"Ошибка чтения кэша транскрипций: {e}")
+            return None
+        finally:
+            db.close()
+
+    def put(self, audio_sha256: Optional[str], transcription: str, model: Optional[str] = None):
+        if not self.enabled or not audio_sha256 or not transcription:
+            return
+
+        db = SessionLocal()
+        try:
+            db.add(TranscriptionCacheEntry(
+                key=self.make_key(audio_sha256, model),
+                audio_sha256=audio_sha256,
+                model=model or self.model,
+                prompt_hash=self.prompt_hash,
+                transcription=transcription,
+                hits=0
+            ))
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Ошибка записи в кэш транскрипций: {e}")
+        finally:
+            db.close()
+
+    def set_enabled(self, enabled: bool):
+        self.enabled = enabled
+        logger.info(f"Кэш транскрипций {'включен' if enabled else 'отключен'}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "model": self.model,
+                "prompt_hash": self.prompt_hash,
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0
+            }
+
+transcription_cache = TranscriptionCache(
+    enabled=TRANSCRIPTION_CACHE_ENABLED,
+    provider_name=provider.name,
+    model=GEMINI_TRANSCRIPTION_MODEL,
+    prompt=TRANSCRIPTION_PROMPT,
+)
@@ -1,94 +1,214 @@
-import google.generativeai as genai
+import asyncio
 import os
 import logging
+import tempfile
 import time
+from typing import Awaitable, Callable, Optional, Tuple
 from dotenv import load_dotenv
-from config import GEMINI_API_KEY, GEMINI_TRANSCRIPTION_MODEL
-
-try:
-    from google.api_core import exceptions as google_exceptions
-except ImportError:
-    google_exceptions = None
+from config import (
+    GEMINI_TRANSCRIPTION_MODEL,
+    FFMPEG_BINARY,
+    TRANSCRIPTION_SEGMENT_ENABLED,
+    TRANSCRIPTION_SEGMENT_MIN_DURATION,
+    TRANSCRIPTION_SEGMENT_SECONDS,
+    TRANSCRIPTION_SEGMENT_OVERLAP_SECONDS,
+    TRANSCRIPTION_SEGMENT_CONCURRENCY,
+    LOCAL_ASR_FALLBACK,
+)
+from services.local_asr import local_asr
+from services.providers import provider
+from services.rate_limiter import FILES_API, rate_limiter, is_rate_limit_error
+from utils.metrics import observe_stage
+from utils.timing import add_bytes
+from utils.audio import ffmpeg_available, probe_duration, detect_silences, plan_segments, extract_segment, stitch_transcripts
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
-genai.configure(api_key=GEMINI_API_KEY)
+TRANSCRIPTION_PROMPT = "Транскрибируй этот аудио файл на русском языке. Верни только текст без дополнительных комментариев."
+
+POLL_INITIAL_DELAY = 0.5
+POLL_MAX_DELAY = 8.0
+POLL_BACKOFF_FACTOR = 1.6
+POLL_TIMEOUT = 600
+
+SILENCE_NOISE_DB = -35
+SILENCE_MIN_SECONDS = 0.4
+SILENCE_SEARCH_WINDOW = 60
+
+AUDIO_TOKENS_PER_SECOND = 32
+TRANSCRIPT_TOKENS_PER_SECOND = 8
+ASSUMED_AUDIO_BYTES_PER_SECOND = 16000
+
+def estimate_transcription_tokens(audio_path: str) -> int:
+    seconds = os.path.getsize(audio_path) / ASSUMED_AUDIO_BYTES_PER_SECOND
+    return int(seconds * (AUDIO_TOKENS_PER_SECOND + TRANSCRIPT_TOKENS_PER_SECOND))
+
+def poll_delays():
+    delay = POLL_INITIAL_DELAY
+    while True:
+        yield delay
+        delay = min(delay * POLL_BACKOFF_FACTOR, POLL_MAX_DELAY)
+
+def _generation_config() -> dict:
+    return {
+        "temperature": 0,
+        "response_mime_type": "text/plain"
+    }
+
+def _check_uploaded_file(audio_file):
+    if audio_file.state.name == "FAILED":
+        raise Exception(f"Ошибка загрузки файла в Gemini: {audio_file.state}")
+    if audio_file.state.name == "PROCESSING":
+        raise Exception(f"Gemini не обработал файл за {POLL_TIMEOUT}с")
+
+def _extract_transcription(response) -> str:
+    if not response:
+        raise Exception("Gemini API вернул пустой ответ")
+
+    if not hasattr(response, 'text') or response.text is None:
+        raise Exception("Gemini API не вернул текст транскрипции")
+
+    transcription = response.text.strip()
+
+    if not transcription or len(transcription) == 0:
+        raise Exception("Транскрипция пустая. Возможно, аудио файл не содержит речи или произошла ошибка при обработке.")
 
-def transcribe_audio(audio_path: str) -> str:
+    return transcription
+
+def _delete_uploaded_file(audio_file):
+    try:
+        provider.delete_file(audio_file.name)
+    except Exception as e:
+        logger.warning(f"Не удалось удалить временный файл из Gemini: {e}")
+
+def _handle_transcription_error(e: Exception):
+    error_msg = str(e)
+
+    if is_rate_limit_error(e):
+        if "limit: 0" in error_msg or "free_tier" in error_msg.lower():
+            user_message = "Модель недоступна на бесплатном тарифе Gemini API. Пожалуйста, используйте другую модель или перейдите на платный тариф."
+        elif "quota" in error_msg.lower() or "limit" in error_msg.lower():
+            user_message = f"Превышена квота Gemini API. {error_msg}"
+        else:
+            user_message = f"Ошибка квоты Gemini API: {error_msg}"
+        logger.error(f"Ошибка при выполнении транскрипции через Gemini (429): {e}")
+        import traceback
+        logger.error(traceback.format_exc())
+        raise Exception(user_message) from e
+
+    logger.error(f"Ошибка при выполнении транскрипции через Gemini: {e}")
+    import traceback
+    logger.error(traceback.format_exc())
+    raise e
+
+async def transcribe_audio_async(audio_path: str) -> str:
     logger.info(f"Начало транскрипции файла: {audio_path}")
-    
+
     if not os.path.exists(audio_path):
         raise FileNotFoundError(f"Аудио файл не найден: {audio_path}")
-    
+
     try:
-        model = genai.GenerativeModel(GEMINI_TRANSCRIPTION_MODEL)
-        
-        audio_file = genai.upload_file(path=audio_path)
-        logger.info(f"Аудио файл загружен в Gemini: {audio_file.uri}")
-        
-        while audio_file.state.name == "PROCESSING":
-            time.sleep(2)
-            audio_file = genai.get_file(audio_file.name)
-        
-        if audio_file.state.name == "FAILED":
-            raise Exception(f"Ошибка загрузки файла в Gemini: {audio_file.state}")
-        
+        with observe_stage("transcription", "upload"):
+            add_bytes(os.path.getsize(audio_path))
+            audio_file = await rate_limiter.call_async(
+                FILES_API,
+                lambda: asyncio.to_thread(provider.upload_file, audio_path)
+            )
+        logger.info(f"Аудио файл загружен в AI-провайдер: {audio_file.uri}")
+
+        deadline = time.monotonic() + POLL_TIMEOUT
+        delays = poll_delays()
+        with observe_stage("transcription", "processing_wait"):
+            while audio_file.state.name == "PROCESSING" and time.monotonic() < deadline:
+                await asyncio.sleep(next(delays))
+                audio_file = await rate_limiter.call_async(
+                    FILES_API,
+                    lambda name=audio_file.name: asyncio.to_thread(provider.get_file, name)
+                )
+
+        _check_uploaded_file(audio_file)
+
         logger.info("Отправка запроса на транскрипцию в Gemini API...")
-        
-        prompt = "Транскрибируй этот аудио файл на русском языке. Верни только текст без дополнительных комментариев."
-        
-        response = model.generate_content(
-            [prompt, audio_file],
-            generation_config=genai.types.GenerationConfig(
-                temperature=0,
-                response_mime_type="text/plain"
+
+        with observe_stage("transcription", "generate"):
+            response = await rate_limiter.call_async(
+                GEMINI_TRANSCRIPTION_MODEL,
+                lambda: provider.generate_async(
+                    GEMINI_TRANSCRIPTION_MODEL,
+                    [TRANSCRIPTION_PROMPT, audio_file],
+                    _generation_config()
+                ),
+                estimated_tokens=estimate_transcription_tokens(audio_path)
             )
-        )
-        
-        if not response:
-            raise Exception("Gemini API вернул пустой ответ")
-        
-        if not hasattr(response, 'text') or response.text is None:
-            raise Exception("Gemini API не вернул текст транскрипции")
-        
-        transcription = response.text.strip()
-        
-        if not transcription or len(transcription) == 0:
-            raise Exception("Транскрипция пустая. Возможно, аудио файл не содержит речи или произошла ошибка при обработке.")
-        
-        try:
-            genai.delete_file(audio_file.name)
-        except Exception as e:
-            logger.warning(f"Не удалось удалить временный файл из Gemini: {e}")
-        
+
+        with observe_stage("transcription", "parse"):
+            transcription = _extract_transcription(response)
+        await asyncio.to_thread(_delete_uploaded_file, audio_file)
+
         logger.info(f"Транскрипция завершена успешно, длина текста: {len(transcription)} символов")
-        
+
         return transcription
-        
+
     except Exception as e:
-        error_msg = str(e)
-        is_resource_exhausted = False
-        
-        if google_exceptions and isinstance(e, google_exceptions.ResourceExhausted):
-            is_resource_exhausted = True
-        elif "ResourceExhausted" in str(type(e)) or "429" in error_msg or "quota" in error_msg.lower():
-            is_resource_exhausted = True
-        
-        if is_resource_exhausted:
-            if "limit: 0" in error_msg or "free_tier" in error_msg.lower():
-                user_message = "Модель недоступна на бесплатном тарифе Gemini API. Пожалуйста, используйте другую модель или перейдите на платный тариф."
-            elif "quota" in error_msg.lower() or "limit" in error_msg.lower():
-                user_message = f"Превышена квота Gemini API. {error_msg}"
-            else:
-                user_message = f"Ошибка квоты Gemini API: {error_msg}"
-            logger.error(f"Ошибка при выполнении транскрипции через Gemini (429): {e}")
-            import traceback
-            logger.error(traceback.format_exc())
-            raise Exception(user_message) from e
-        
-        logger.error(f"Ошибка при выполнении транскрипции через Gemini: {e}")
-        import traceback
-        logger.error(traceback.format_exc())
-        raise
+        _handle_transcription_error(e)
+
+async def transcribe_audio_segmented(
+    audio_path: str,
+    on_progress: Optional[Callable[[int, int], Awaitable[None]]] = None,
+    duration: Optional[float] = None
+) -> Tuple[str, Optional[str]]:
+    has_ffmpeg = ffmpeg_available(FFMPEG_BINARY)
+    needs_duration = has_ffmpeg and (local_asr.enabled or TRANSCRIPTION_SEGMENT_ENABLED)
+    if duration is None and needs_duration:
+        duration = await probe_duration(FFMPEG_BINARY, audio_path)
+
+    if local_asr.accepts(duration):
+        try:
+            return await local_asr.transcribe(audio_path), local_asr.label
+        except Exception as e:
+            if not LOCAL_ASR_FALLBACK:
+                raise
+            logger.warning(f"Локальная транскрипция {audio_path} не удалась, используется AI-провайдер: {e}")
+
+    if not TRANSCRIPTION_SEGMENT_ENABLED or not has_ffmpeg:
+        return await transcribe_audio_async(audio_path), None
+
+    if not duration or duration <= TRANSCRIPTION_SEGMENT_MIN_DURATION:
+        return await transcribe_audio_async(audio_path), None
+
+    silences = await detect_silences(FFMPEG_BINARY, audio_path, SILENCE_NOISE_DB, SILENCE_MIN_SECONDS)
+    segments = plan_segments(
+        duration,
+        TRANSCRIPTION_SEGMENT_SECONDS,
+        TRANSCRIPTION_SEGMENT_OVERLAP_SECONDS,
+        silences,
+        SILENCE_SEARCH_WINDOW
+    )
+    logger.info(f"Файл {audio_path} ({duration:.0f}с) разбит на {len(segments)} сегментов, найдено пауз: {len(silences)}")
+
+    semaphore = asyncio.Semaphore(TRANSCRIPTION_SEGMENT_CONCURRENCY)
+    completed = 0
+
+    with tempfile.TemporaryDirectory(prefix="segments_") as segments_dir:
+        async def transcribe_segment(index: int, start: float, end: float) -> str:
+            nonlocal completed
+            async with semaphore:
+                segment_path = os.path.join(segments_dir, f"segment_{index:03d}.mp3")
+                await extract_segment(FFMPEG_BINARY, audio_path, start, end, segment_path)
+                text = await transcribe_audio_async(segment_path)
+            completed += 1
+            logger.info(f"Сегмент {index + 1}/{len(segments)} ({start:.0f}-{end:.0f}с) транскрибирован")
+            if on_progress:
+                await on_progress(completed, len(segments))
+            return text
+
+        try:
+            async with asyncio.TaskGroup() as group:
+                tasks = [group.create_task(transcribe_segment(i, start, end)) for i, (start, end) in enumerate(segments)]
+        except BaseExceptionGroup as e:
+            logger.error(f"Транскрипция {audio_path} прервана: сегмент не удался, оставшиеся сегменты отменены")
+            raise e.exceptions[0]
+
+    return stitch_transcripts([task.result() for task in tasks]), None
@@ -1,70 +1,173 @@
 import logging
 import asyncio
-from typing import Dict, Set
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional
 from fastapi import WebSocket
 
+from config import WS_SEND_QUEUE_SIZE, WS_SEND_TIMEOUT, WS_HEARTBEAT_INTERVAL, WS_HEARTBEAT_EVICT
+
 logger = logging.getLogger(__name__)
 
+HEARTBEAT_MISSED_LIMIT = 2
+
+class _Connection:
+    def __init__(self, websocket: WebSocket, call_id: int, queue_size: int):
+        self.websocket = websocket
+        self.call_id = call_id
+        self.outbox = deque()
+        self.queue_size = max(1, queue_size)
+        self.wakeup = asyncio.Event()
+        self.sender: Optional[asyncio.Task] = None
+        self.closed = False
+        self.last_seen = time.monotonic()
+        self.progress_queued = False
+
 class WebSocketManager:
-    def __init__(self):
-        self.active_connections: Dict[int, Set[WebSocket]] = {}
-        self._loop = None
-    
-    def set_event_loop(self, loop):
-        self._loop = loop
-    
-    async def connect(self, websocket: WebSocket, call_id: int):
+    def __init__(self, queue_size: int, send_timeout: float, heartbeat_interval: float, evict_silent: bool):
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.evict_silent = evict_silent
+        self.active_connections: Dict[int, Dict[WebSocket, _Connection]] = {}
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self.queued = 0
+        self.sent = 0
+        self.dropped = 0
+        self.evicted = 0
+
+    async def connect(self, websocket: WebSocket, call_id: int, load_state: Callable[[], Awaitable[Optional[dict]]] = None):
         await websocket.accept()
-        if call_id not in self.active_connections:
-            self.active_connections[call_id] = set()
-        self.active_connections[call_id].add(websocket)
+        connection = _Connection(websocket, call_id, self.queue_size)
+        connection.sender = asyncio.create_task(self._sender_loop(connection), name=f"ws-sender-{call_id}")
+        self.active_connections.setdefault(call_id, {})[websocket] = connection
         logger.info(f"WebSocket подключен для звонка {call_id}")
-    
+        if load_state is None:
+            return
+        try:
+            state = await load_state()
+        except Exception as e:
+            logger.warning(f"Не удалось получить текущий статус звонка {call_id} для WebSocket: {e}")
+            return
+        if state is not None and not connection.progress_queued and not connection.closed:
+            data = self._progress_message(call_id, state["progress"], state["status"], state.get("message"))
+            self._enqueue(connection, data, latest_wins=True)
+
+    def touch(self, websocket: WebSocket, call_id: int):
+        connection = self.active_connections.get(call_id, {}).get(websocket)
+        if connection is not None:
+            connection.last_seen = time.monotonic()
+
     def disconnect(self, websocket: WebSocket, call_id: int):
-        if call_id in self.active_connections:
-            self.active_connections[call_id].discard(websocket)
-            if not self.active_connections[call_id]:
-                del self.active_connections[call_id]
-        logger.info(f"WebSocket отключен для звонка {call_id}")
-    
-    async def send_progress(self, call_id: int, progress: int, status: str, message: str = None):
-        if call_id not in self.active_connections:
+        connections = self.active_connections.get(call_id)
+        connection = connections.pop(websocket, None) if connections is not None else None
+        if connections is not None and not connections:
+            del self.active_connections[call_id]
+        if connection is None:
             return
-        
+        connection.closed = True
+        if connection.sender is not None and connection.sender is not asyncio.current_task():
+            connection.sender.cancel()
+        logger.info(f"WebSocket отключен для звонка {call_id}")
+
+    def _enqueue(self, connection: _Connection, data: dict, latest_wins: bool):
+        self.queued += 1
+        if latest_wins:
+            for index, queued in enumerate(connection.outbox):
+                if queued.get("type") == data.get("type"):
+                    connection.outbox[index] = data
+                    self.dropped += 1
+                    connection.wakeup.set()
+                    return
+        if len(connection.outbox) >= connection.queue_size:
+            connection.outbox.popleft()
+            self.dropped += 1
+        connection.outbox.append(data)
+        connection.wakeup.set()
+
+    def _progress_message(self, call_id: int, progress: int, status: str, message: str = None) -> dict:
         data = {
+            "type": "progress",
             "call_id": call_id,
             "progress": progress,
             "status": status
         }
         if message:
             data["message"] = message
-        
-        disconnected = set()
-        for websocket in self.active_connections[call_id]:
-            try:
-                await websocket.send_json(data)
-            except Exception as e:
-                logger.error(f"Ошибка отправки WebSocket сообщения: {e}")
-                disconnected.add(websocket)
-        
-        for ws in disconnected:
-            self.disconnect(ws, call_id)
-    
-    def send_progress_sync(self, call_id: int, progress: int, status: str, message: str = None):
-        if self._loop and self._loop.is_running():
-            asyncio.run_coroutine_threadsafe(
-                self.send_progress(call_id, progress, status, message),
-                self._loop
-            )
-        else:
-            try:
-                loop = asyncio.get_event_loop()
-                if loop.is_running():
-                    asyncio.create_task(self.send_progress(call_id, progress, status, message))
-                else:
-                    loop.run_until_complete(self.send_progress(call_id, progress, status, message))
-            except Exception as e:
-                logger.warning(f"Ошибка отправки WebSocket обновления: {e}")
-
-manager = WebSocketManager()
+        return data
+
+    async def send_progress(self, call_id: int, progress: int, status: str, message: str = None):
+        if call_id not in self.active_connections:
+            return
+
+        data = self._progress_message(call_id, progress, status, message)
+        for connection in list(self.active_connections[call_id].values()):
+            connection.progress_queued = True
+            self._enqueue(connection, data, latest_wins=True)
+
+    async def _sender_loop(self, connection: _Connection):
+        try:
+            while not connection.closed:
+                await connection.wakeup.wait()
+                connection.wakeup.clear()
+                while connection.outbox:
+                    data = connection.outbox.popleft()
+                    await asyncio.wait_for(connection.websocket.send_json(data), timeout=self.send_timeout)
+                    self.sent += 1
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            logger.warning(f"WebSocket для звонка {connection.call_id} не принял сообщение за {self.send_timeout}с, отключаем")
+            await self._evict(connection)
+        except Exception as e:
+            logger.error(f"Ошибка отправки WebSocket сообщения: {e}")
+            await self._evict(connection)
+
+    async def _evict(self, connection: _Connection):
+        self.evicted += 1
+        self.disconnect(connection.websocket, connection.call_id)
+        try:
+            await asyncio.wait_for(connection.websocket.close(code=1011), timeout=self.send_timeout)
+        except Exception:
+            pass
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            deadline = time.monotonic() - self.heartbeat_interval * HEARTBEAT_MISSED_LIMIT
+            for connections in list(self.active_connections.values()):
+                for connection in list(connections.values()):
+                    if self.evict_silent and connection.last_seen < deadline:
+                        logger.warning(f"WebSocket для звонка {connection.call_id} не ответил на ping, отключаем")
+                        await self._evict(connection)
+                    else:
+                        self._enqueue(connection, {"type": "ping"}, latest_wins=True)
+
+    def start(self):
+        if self._heartbeat_task is None and self.heartbeat_interval > 0:
+            self._heartbeat_task = asyncio.create_task(self._heartbeat_loop(), name="ws-heartbeat")
+
+    async def stop(self):
+        tasks = [self._heartbeat_task] if self._heartbeat_task is not None else []
+        for connections in list(self.active_connections.values()):
+            for connection in list(connections.values()):
+                self.disconnect(connection.websocket, connection.call_id)
+                tasks.append(connection.sender)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._heartbeat_task = None
+
+    def stats(self) -> dict:
+        queued_now = sum(len(c.outbox) for connections in self.active_connections.values() for c in connections.values())
+        return {
+            "connections": sum(len(connections) for connections in self.active_connections.values()),
+            "calls": len(self.active_connections),
+            "queued_now": queued_now,
+            "queued": self.queued,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "evicted": self.evicted
+        }
 
+manager = WebSocketManager(WS_SEND_QUEUE_SIZE, WS_SEND_TIMEOUT, WS_HEARTBEAT_INTERVAL, WS_HEARTBEAT_EVICT)
@@ -0,0 +1,10 @@
+import os
+import sys
+
+os.environ.setdefault("AI_PROVIDER", "fake")
+os.environ.setdefault("FAKE_AI_TRANSCRIPTION_LATENCY_MS", "0")
+os.environ.setdefault("FAKE_AI_EVALUATION_LATENCY_MS", "0")
+os.environ.setdefault("FAKE_AI_RATE_LIMIT_RATE", "0")
+os.environ.setdefault("FAKE_AI_ERROR_RATE", "0")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
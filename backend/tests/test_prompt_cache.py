@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from config import GEMINI_EVALUATION_MODEL
+from services import evaluation_service
+from services.prompt_cache import PromptPrefixCache
+from services.providers import ProviderNotFoundError, provider
+from services.providers.fake import FakeProvider
+from utils.checklist import CHECKLIST_PROMPT
+
+TRANSCRIPTION = "Менеджер: Добрый день!\nКлиент: Здравствуйте."
+
+@pytest.fixture
+def prompt_cache(monkeypatch):
+    assert isinstance(provider, FakeProvider)
+    cache = PromptPrefixCache(
+        backend=provider.prefix_cache_backend(),
+        model=GEMINI_EVALUATION_MODEL,
+        prompt=CHECKLIST_PROMPT,
+        ttl_seconds=3600,
+        enabled=True
+    )
+    monkeypatch.setattr(evaluation_service, "prompt_cache", cache)
+    return cache
+
+@pytest.fixture
+def models(monkeypatch):
+    calls = []
+    generate_async = provider.generate_async
+
+    async def recording_generate(model, contents, generation_config):
+        calls.append(model)
+        return await generate_async(model, contents, generation_config)
+
+    monkeypatch.setattr(provider, "generate_async", recording_generate)
+    return calls
+
+def evaluate() -> dict:
+    return asyncio.run(evaluation_service.evaluate_transcription_async(TRANSCRIPTION))
+
+def test_handle_is_created_once_and_reused(prompt_cache, models):
+    first = evaluate()
+    second = evaluate()
+
+    assert first == second
+    assert prompt_cache.created == 1
+    assert prompt_cache.cached_requests == 2
+    assert prompt_cache.fallbacks == 0
+    assert len(prompt_cache.backend.prefixes) == 1
+    assert models == ["cached", "cached"]
+
+def test_expired_handle_falls_back_to_full_prompt_and_is_recreated(prompt_cache, models):
+    cached = evaluate()
+    expired = prompt_cache._handle
+    prompt_cache.backend.prefixes.clear()
+
+    assert evaluate() == cached
+    assert prompt_cache.fallbacks == 1
+    assert prompt_cache.created == 1
+    assert models == ["cached", GEMINI_EVALUATION_MODEL]
+
+    evaluate()
+
+    assert prompt_cache.created == 2
+    assert prompt_cache._handle != expired
+    assert models == ["cached", GEMINI_EVALUATION_MODEL, "cached"]
+
+def test_fake_backend_raises_not_found_for_unknown_handle(prompt_cache):
+    with pytest.raises(ProviderNotFoundError):
+        asyncio.run(prompt_cache.backend.generate_async("cachedContents/missing", "", {}))
@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import math
+import re
+import shutil
+from difflib import SequenceMatcher
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DURATION_PATTERN = re.compile(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)")
+SILENCE_START_PATTERN = re.compile(r"silence_start:\s*(-?[\d.]+)")
+SILENCE_END_PATTERN = re.compile(r"silence_end:\s*([\d.]+)")
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+def ffmpeg_available(ffmpeg_binary: str) -> bool:
+    return shutil.which(ffmpeg_binary) is not None
+
+async def _run_ffmpeg(ffmpeg_binary: str, *args: str) -> Tuple[int, str]:
+    process = await asyncio.create_subprocess_exec(
+        ffmpeg_binary, "-hide_banner", "-nostdin", *args,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        _, stderr = await process.communicate()
+    except asyncio.CancelledError:
+        process.kill()
+        await process.wait()
+        raise
+    return process.returncode, stderr.decode("utf-8", errors="replace")
+
+async def probe_duration(ffmpeg_binary: str, audio_path: str) -> Optional[float]:
+    _, output = await _run_ffmpeg(ffmpeg_binary, "-i", audio_path)
+    match = DURATION_PATTERN.search(output)
+    if not match:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+async def detect_silences(ffmpeg_binary: str, audio_path: str, noise_db: int, min_silence: float) -> List[Tuple[float, float]]:
+    returncode, output = await _run_ffmpeg(
+        ffmpeg_binary, "-i", audio_path,
+        "-af", f"silencedetect=noise={noise_db}dB:d={min_silence}",
+        "-f", "null", "-"
+    )
+    if returncode != 0:
+        logger.warning(f"ffmpeg silencedetect завершился с кодом {returncode}")
+        return []
+
+    silences = []
+    start = None
+    for line in output.splitlines():
+        start_match = SILENCE_START_PATTERN.search(line)
+        if start_match:
+            start = max(0.0, float(start_match.group(1)))
+            continue
+        end_match = SILENCE_END_PATTERN.search(line)
+        if end_match and start is not None:
+            silences.append((start, float(end_match.group(1))))
+            start = None
+    return silences
+
+def plan_segments(duration: float, segment_seconds: float, overlap_seconds: float,
+                  silences: List[Tuple[float, float]], search_window: float) -> List[Tuple[float, float]]:
+    count = max(1, math.ceil(duration / segment_seconds))
+    step = duration / count
+    midpoints = [(start + end) / 2 for start, end in silences]
+
+    cut_points = []
+    previous = 0.0
+    for index in range(1, count):
+        target = index * step
+        candidates = [
+            point for point in midpoints
+            if abs(point - target) <= min(search_window, step / 2) and point > previous + overlap_seconds
+        ]
+        cut = min(candidates, key=lambda point: abs(point - target)) if candidates else target
+        cut_points.append(cut)
+        previous = cut
+
+    segments = []
+    start = 0.0
+    for cut in cut_points:
+        segments.append((max(0.0, start - overlap_seconds / 2), min(duration, cut + overlap_seconds / 2)))
+        start = cut
+    segments.append((max(0.0, start - overlap_seconds / 2), duration))
+    return segments
+
+async def extract_segment(ffmpeg_binary: str, audio_path: str, start: float, end: float, output_path: str):
+    returncode, output = await _run_ffmpeg(
+        ffmpeg_binary, "-y",
+        "-ss", f"{start:.3f}", "-t", f"{end - start:.3f}",
+        "-i", audio_path,
+        "-vn", "-ac", "1", "-ar", "16000", "-b:a", "48k",
+        output_path
+    )
+    if returncode != 0:
+        raise Exception(f"Не удалось вырезать сегмент {start:.1f}-{end:.1f}с: {output[-500:]}")
+
+def _words(text: str) -> List[Tuple[str, int, int]]:
+    return [(match.group(0).lower(), match.start(), match.end()) for match in WORD_PATTERN.finditer(text)]
+
+def stitch_transcripts(parts: List[str], max_overlap_words: int = 80, min_overlap_words: int = 3) -> str:
+    result = ""
+    for part in parts:
+        part = part.strip()
+        if not part:
+            continue
+        if not result:
+            result = part
+            continue
+
+        result_words = _words(result)
+        part_words = _words(part)
+        tail = result_words[-max_overlap_words:]
+        head = part_words[:max_overlap_words]
+        matcher = SequenceMatcher(None, [w[0] for w in tail], [w[0] for w in head], autojunk=False)
+        match = matcher.find_longest_match(0, len(tail), 0, len(head))
+
+        if match.size >= min_overlap_words:
+            keep_until = tail[match.a + match.size - 1][2]
+            resume_from = head[match.b + match.size - 1][2]
+            remainder = part[resume_from:].lstrip()
+            if remainder and remainder[0] not in ",.;:!?":
+                remainder = f" {remainder}"
+            result = result[:keep_until] + remainder
+        else:
+            result = f"{result}\n{part}"
+    return result
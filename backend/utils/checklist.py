@@ -1,3 +1,7 @@
+import hashlib
+from dataclasses import dataclass
+from typing import Tuple
+
 CHECKLIST = {
     "Установление контакта": {
         "1 Приветствие, знакомство": {
@@ -93,46 +97,59 @@ CHECKLIST = {
     }
 }
 
-def get_checklist_prompt():
-    prompt = "Ты - эксперт по оценке качества звонков менеджеров по продажам. "
-    prompt += "Твоя задача - объективно и последовательно оценить звонок по строгим критериям.\n\n"
-    prompt += "ПРАВИЛА ОЦЕНКИ:\n"
-    prompt += "1. Оценивай ТОЛЬКО по фактам из транскрипции. Не добавляй предположений.\n"
-    prompt += "2. Для каждого критерия проверь, выполнено ли описание этапа.\n"
-    prompt += "3. Сравни выполнение с критериями MAX/МИД/МИН и выбери соответствующий балл.\n"
-    prompt += "4. Если транскрипция идентична - результат ДОЛЖЕН быть идентичен.\n"
-    prompt += "5. Используй только допустимые баллы: 0, 0.5 или 1.\n"
-    prompt += "6. Будь строгим и объективным. Одинаковые действия = одинаковые баллы.\n\n"
+CRITERIA_KEYS = ("1", "2", "3.1", "3.2", "3.3", "4.1", "4.2", "4.3", "4.4", "5", "6", "7.1", "7.2")
+
+@dataclass(frozen=True)
+class CompiledChecklistPrompt:
+    text: str
+    version: str
+    criteria: Tuple[str, ...]
+
+def compile_checklist_prompt(checklist: dict = CHECKLIST) -> CompiledChecklistPrompt:
+    parts = [
+        "Ты - эксперт по оценке качества звонков менеджеров по продажам. ",
+        "Твоя задача - объективно и последовательно оценить звонок по строгим критериям.\n\n",
+        "ПРАВИЛА ОЦЕНКИ:\n",
+        "1. Оценивай ТОЛЬКО по фактам из транскрипции. Не добавляй предположений.\n",
+        "2. Для каждого критерия проверь, выполнено ли описание этапа.\n",
+        "3. Сравни выполнение с критериями MAX/МИД/МИН и выбери соответствующий балл.\n",
+        "4. Если транскрипция идентична - результат ДОЛЖЕН быть идентичен.\n",
+        "5. Используй только допустимые баллы: 0, 0.5 или 1.\n",
+        "6. Будь строгим и объективным. Одинаковые действия = одинаковые баллы.\n\n",
+    ]
     
-    for stage_name, items in CHECKLIST.items():
-        prompt += f"\n{stage_name}:\n"
+    for stage_name, items in checklist.items():
+        parts.append(f"\n{stage_name}:\n")
         for item_key, item_data in items.items():
-            prompt += f"\n{item_key}:\n"
-            prompt += f"Описание: {item_data['description']}\n"
+            parts.append(f"\n{item_key}:\n")
+            parts.append(f"Описание: {item_data['description']}\n")
             if "max" in item_data:
-                prompt += f"MAX ({item_data['max']['score']} баллов): {item_data['max']['criterion']}\n"
+                parts.append(f"MAX ({item_data['max']['score']} баллов): {item_data['max']['criterion']}\n")
             if "mid" in item_data:
-                prompt += f"МИД ({item_data['mid']['score']} баллов): {item_data['mid']['criterion']}\n"
+                parts.append(f"МИД ({item_data['mid']['score']} баллов): {item_data['mid']['criterion']}\n")
             if "min" in item_data:
-                prompt += f"МИН ({item_data['min']['score']} баллов): {item_data['min']['criterion']}\n"
+                parts.append(f"МИН ({item_data['min']['score']} баллов): {item_data['min']['criterion']}\n")
     
-    prompt += "\n\nВерни JSON в следующем формате:\n"
-    prompt += "{\n"
-    prompt += '  "1": {"score": число, "comment": "комментарий"},\n'
-    prompt += '  "2": {"score": число, "comment": "комментарий"},\n'
-    prompt += '  "3.1": {"score": число, "comment": "комментарий"},\n'
-    prompt += '  "3.2": {"score": число, "comment": "комментарий"},\n'
-    prompt += '  "3.3": {"score": число, "comment": "комментарий"},\n'
-    prompt += '  "4.1": {"score": число, "comment": "комментарий"},\n'
-    prompt += '  "4.2": {"score": число, "comment": "комментарий"},\n'
-    prompt += '  "4.3": {"score": число, "comment": "комментарий"},\n'
-    prompt += '  "4.4": {"score": число, "comment": "комментарий"},\n'
-    prompt += '  "5": {"score": число, "comment": "комментарий"},\n'
-    prompt += '  "6": {"score": число, "comment": "комментарий"},\n'
-    prompt += '  "7.1": {"score": число, "comment": "комментарий"},\n'
-    prompt += '  "7.2": {"score": число, "comment": "комментарий"}\n'
-    prompt += "}\n"
-    prompt += "\nИспользуй только допустимые значения баллов: 0, 0.5 или 1."
-    prompt += "\nДля пункта 4.3 (Презентация стоимости): оценивай этот пункт ТОЛЬКО если от клиента был получен запрос на стоимость обучения. Если запроса не было, не включай этот пункт в ответ."
+    parts.append("\n\nВерни JSON в следующем формате:\n")
+    parts.append("{\n")
+    for i, key in enumerate(CRITERIA_KEYS):
+        separator = "," if i < len(CRITERIA_KEYS) - 1 else ""
+        parts.append(f'  "{key}": {{"score": число, "comment": "комментарий"}}{separator}\n')
+    parts.append("}\n")
+    parts.append("\nИспользуй только допустимые значения баллов: 0, 0.5 или 1.")
+    parts.append("\nДля пункта 4.3 (Презентация стоимости): оценивай этот пункт ТОЛЬКО если от клиента был получен запрос на стоимость обучения. Если запроса не было, не включай этот пункт в ответ.")
     
-    return prompt
+    text = "".join(parts)
+    return CompiledChecklistPrompt(
+        text=text,
+        version=hashlib.sha256(text.encode("utf-8")).hexdigest()[:16],
+        criteria=CRITERIA_KEYS
+    )
+
+CHECKLIST_PROMPT = compile_checklist_prompt()
+
+def get_checklist_prompt():
+    return CHECKLIST_PROMPT.text
+
+def get_checklist_version():
+    return CHECKLIST_PROMPT.version
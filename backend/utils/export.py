@@ -0,0 +1,56 @@
+import csv
+import io
+from typing import Iterable, List
+
+from utils.checklist import CRITERIA_KEYS
+
+EXPORT_HEADER_ROWS = [
+    [
+        "Номер", "Дата звонка", "Дата оценки", "Месяц оценки", "Длительность звонка", "Менеджер",
+        "Установление контакта", "Квалификация", "Выявление потребностей", "", "", "Презентация", "", "", "",
+        "Работа с возражениями", "Завершение сделки", "Голосовые характеристики", "", "Итоговая оценка"
+    ],
+    [
+        "", "", "", "", "", "",
+        "1 Приветствие", "2 Первичная квалификация",
+        "3.1 Вопросы вторичной квалификации", "3.2 Вопрос о цели обучения", "3.3 Резюмирование потребности",
+        "4.1 Презентация обучения из потребности", "4.2 Презентация формата обучения", "4.3 Презентация стоимости", "4.4 Озвучивание информации для пробного",
+        "5 Уточнить сомнение клиента",
+        "6 Завершение сделки",
+        "7.1 Грамотность и формулировки", "7.2 Инициатива за ведение диалога",
+        ""
+    ]
+]
+
+MONTH_NAMES = {
+    1: "январь", 2: "февраль", 3: "март", 4: "апрель",
+    5: "май", 6: "июнь", 7: "июль", 8: "август",
+    9: "сентябрь", 10: "октябрь", 11: "ноябрь", 12: "декабрь"
+}
+
+CSV_MEDIA_TYPE = "text/csv; charset=utf-8-sig"
+
+def export_row(index: int, call, evaluation) -> list:
+    scores = evaluation.scores or {}
+    evaluation_date = evaluation.created_at
+    month = MONTH_NAMES.get(evaluation_date.month, "") if evaluation_date else ""
+
+    return [
+        index,
+        call.call_date.strftime("%Y-%m-%d") if call.call_date else "",
+        evaluation_date.strftime("%Y-%m-%d %H:%M:%S") if evaluation_date else "",
+        month,
+        call.duration or "",
+        call.manager or "",
+        *[scores.get(key, {}).get("score", "") for key in CRITERIA_KEYS],
+        evaluation.итоговая_оценка or ""
+    ]
+
+def csv_chunk(rows: Iterable[List]) -> str:
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerows(rows)
+    return output.getvalue()
+
+def csv_header(bom: bool = True) -> bytes:
+    return csv_chunk(EXPORT_HEADER_ROWS).encode("utf-8-sig" if bom else "utf-8")
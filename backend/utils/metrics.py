@@ -0,0 +1,89 @@
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from utils.timing import timing_span
+
+STAGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600)
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+
+DB_OPERATIONS = ("select", "insert", "update", "delete")
+
+ANALYSIS_STAGE_SECONDS = Histogram(
+    "ai_coach_analysis_stage_seconds",
+    "Длительность этапов анализа звонка",
+    ["operation", "stage"],
+    buckets=STAGE_BUCKETS
+)
+ANALYSIS_RESULTS = Counter("ai_coach_analysis_total", "Завершенные анализы по результату", ["status"])
+HTTP_REQUEST_SECONDS = Histogram(
+    "ai_coach_http_request_duration_seconds",
+    "Длительность HTTP-запросов по шаблону маршрута",
+    ["method", "route", "status"],
+    buckets=HTTP_BUCKETS
+)
+PROVIDER_ERRORS = Counter("ai_coach_provider_errors_total", "Ошибки запросов к провайдеру моделей", ["model", "type"])
+DB_QUERY_SECONDS = Histogram(
+    "ai_coach_db_query_seconds",
+    "Длительность SQL-запросов",
+    ["engine", "operation"],
+    buckets=DB_BUCKETS
+)
+LOCAL_ASR_RTF = Histogram(
+    "ai_coach_local_asr_real_time_factor",
+    "Отношение времени локальной транскрипции к длительности аудио",
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 4)
+)
+WEBSOCKET_CONNECTIONS = Gauge("ai_coach_websocket_connections", "Открытые WebSocket-подключения")
+WEBSOCKET_MESSAGES = Gauge("ai_coach_websocket_messages", "Счетчики сообщений WebSocket", ["result"])
+QUEUE_JOBS = Gauge("ai_coach_analysis_queue_jobs", "Задачи в очереди анализа", ["status"])
+QUEUE_OLDEST_WAIT_SECONDS = Gauge("ai_coach_analysis_queue_oldest_wait_seconds", "Ожидание самой старой задачи в очереди")
+
+@contextmanager
+def observe_stage(operation: str, stage: str):
+    started = time.perf_counter()
+    try:
+        with timing_span(operation, stage) as span:
+            yield span
+    finally:
+        ANALYSIS_STAGE_SECONDS.labels(operation, stage).observe(time.perf_counter() - started)
+
+def observe_http_request(method: str, route: str, status_code: int, seconds: float):
+    HTTP_REQUEST_SECONDS.labels(method, route, f"{status_code // 100}xx").observe(seconds)
+
+def record_provider_error(model: str, error_type: str):
+    PROVIDER_ERRORS.labels(model, error_type).inc()
+
+def _operation(statement: str) -> str:
+    head = statement.lstrip()[:6].lower()
+    return head if head in DB_OPERATIONS else "other"
+
+def instrument_engine(engine: Engine, name: str):
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        DB_QUERY_SECONDS.labels(name, _operation(statement)).observe(time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("query_started"):
+            connection.info["query_started"].pop()
+
+def render_metrics() -> tuple:
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import CollectorRegistry, multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
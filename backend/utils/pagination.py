@@ -0,0 +1,21 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+class InvalidCursor(Exception):
+    pass
+
+def encode_cursor(created_at: datetime, call_id: int) -> str:
+    payload = json.dumps([created_at.isoformat(), call_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, call_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(created_at), int(call_id)
+    except Exception as e:
+        raise InvalidCursor(f"Некорректный курсор: {cursor}") from e
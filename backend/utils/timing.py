@@ -0,0 +1,99 @@
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import List, Optional
+
+class TimingSpan:
+    def __init__(self, operation: str, stage: str, parent: Optional["TimingSpan"]):
+        self.operation = operation
+        self.stage = stage
+        self.parent = parent
+        self.started_at = datetime.utcnow()
+        self.started = time.perf_counter()
+        self.duration_ms: Optional[int] = None
+        self.bytes: Optional[int] = None
+        self.tokens: Optional[int] = None
+        self.retries = 0
+        self.status = "ok"
+
+    def finish(self, failed: bool):
+        self.duration_ms = int((time.perf_counter() - self.started) * 1000)
+        if failed:
+            self.status = "failed"
+
+    def row(self, call_id: int, run_id: str) -> dict:
+        return {
+            "call_id": call_id,
+            "run_id": run_id,
+            "operation": self.operation,
+            "stage": self.stage,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "bytes": self.bytes,
+            "tokens": self.tokens,
+            "retries": self.retries,
+            "status": self.status
+        }
+
+class TimingLedger:
+    def __init__(self, call_id: int):
+        self.call_id = call_id
+        self.run_id = uuid.uuid4().hex
+        self.spans: List[TimingSpan] = []
+
+    def rows(self) -> list:
+        return [span.row(self.call_id, self.run_id) for span in self.spans if span.duration_ms is not None]
+
+_ledger: ContextVar[Optional[TimingLedger]] = ContextVar("timing_ledger", default=None)
+_span: ContextVar[Optional[TimingSpan]] = ContextVar("timing_span", default=None)
+
+@contextmanager
+def timing_ledger(call_id: int):
+    ledger = TimingLedger(call_id)
+    ledger_token = _ledger.set(ledger)
+    span_token = _span.set(None)
+    try:
+        yield ledger
+    finally:
+        _span.reset(span_token)
+        _ledger.reset(ledger_token)
+
+@contextmanager
+def timing_span(operation: str, stage: str):
+    ledger = _ledger.get()
+    if ledger is None:
+        yield None
+        return
+    span = TimingSpan(operation, stage, _span.get())
+    ledger.spans.append(span)
+    token = _span.set(span)
+    failed = True
+    try:
+        yield span
+        failed = False
+    finally:
+        span.finish(failed)
+        _span.reset(token)
+
+def _add(field: str, amount: int):
+    span = _span.get()
+    while span is not None:
+        setattr(span, field, (getattr(span, field) or 0) + amount)
+        span = span.parent
+
+def add_bytes(amount: int):
+    _add("bytes", amount)
+
+def add_tokens(amount: Optional[int]):
+    if amount:
+        _add("tokens", amount)
+
+def add_retry():
+    _add("retries", 1)
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[index]
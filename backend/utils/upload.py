@@ -0,0 +1,251 @@
+import asyncio
+import hashlib
+import logging
+import os
+import struct
+from typing import Optional
+
+from fastapi import UploadFile
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+
+logger = logging.getLogger(__name__)
+
+MP3_BITRATES_KBPS = {
+    (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+
+PART_HEADERS_ALLOWANCE = 16 * 1024
+
+class UploadTooLarge(Exception):
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        super().__init__(f"Файл превышает допустимый размер {max_bytes // (1024 * 1024)} МБ")
+
+def multipart_boundary(content_type: str) -> Optional[bytes]:
+    for param in content_type.split(";")[1:]:
+        key, _, value = param.strip().partition("=")
+        if key.lower() == "boundary" and value:
+            return value.strip('"').encode("latin-1")
+    return None
+
+class MultipartSizeGuard:
+    def __init__(self, boundary: Optional[bytes], max_file_bytes: int, max_request_bytes: int):
+        self.delimiter = b"--" + boundary if boundary else None
+        self.max_file_bytes = max_file_bytes
+        self.max_request_bytes = max_request_bytes
+        self.total = 0
+        self.part = 0
+        self.rejected: Optional[str] = None
+        self._tail = b""
+
+    def feed(self, chunk: bytes) -> bool:
+        self.total += len(chunk)
+        if self.max_request_bytes and self.total > self.max_request_bytes:
+            self.rejected = f"Размер загрузки превышает {self.max_request_bytes // (1024 * 1024)} МБ"
+            return False
+        if self.delimiter is None:
+            return True
+
+        data = self._tail + chunk
+        counted = len(self._tail)
+        index = data.find(self.delimiter)
+        while index >= 0:
+            if not self._add_to_part(index - counted):
+                return False
+            self.part = 0
+            counted = index
+            index = data.find(self.delimiter, index + len(self.delimiter))
+        self._tail = data[-(len(self.delimiter) - 1):]
+        return self._add_to_part(len(data) - counted)
+
+    def _add_to_part(self, size: int) -> bool:
+        self.part += max(0, size)
+        if self.max_file_bytes and self.part > self.max_file_bytes + PART_HEADERS_ALLOWANCE:
+            self.rejected = str(UploadTooLarge(self.max_file_bytes))
+            return False
+        return True
+
+class UploadSizeLimitMiddleware:
+    def __init__(self, app, path: str, max_file_bytes: int, max_request_bytes: int):
+        self.app = app
+        self.path = path
+        self.max_file_bytes = max_file_bytes
+        self.max_request_bytes = max_request_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] != self.path:
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        content_length = headers.get("content-length", "")
+        if content_length.isdigit() and self.max_request_bytes and int(content_length) > self.max_request_bytes:
+            logger.warning(f"Отклонена загрузка размером {content_length} байт (лимит {self.max_request_bytes} байт)")
+            detail = f"Размер загрузки превышает {self.max_request_bytes // (1024 * 1024)} МБ"
+            await JSONResponse(status_code=413, content={"detail": detail})(scope, receive, send)
+            return
+
+        guard = MultipartSizeGuard(
+            multipart_boundary(headers.get("content-type", "")),
+            self.max_file_bytes,
+            self.max_request_bytes
+        )
+        response_started = False
+
+        async def guarded_receive():
+            if guard.rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request" and not guard.feed(message.get("body", b"")):
+                logger.warning(f"Загрузка прервана после {guard.total} байт: {guard.rejected}")
+                return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_started
+            if guard.rejected and not response_started:
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, guarded_receive, guarded_send)
+        except Exception:
+            if not guard.rejected or response_started:
+                raise
+        if guard.rejected and not response_started:
+            await JSONResponse(status_code=413, content={"detail": guard.rejected})(scope, receive, send)
+
+class AudioProbe:
+    def __init__(self):
+        self.format: Optional[str] = None
+        self._duration: Optional[float] = None
+        self._bitrate_kbps: Optional[int] = None
+        self._header_offset = 0
+
+    def feed_header(self, head: bytes):
+        try:
+            if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+                self.format = "wav"
+                self._probe_wav(head)
+            elif head[:4] == b"fLaC":
+                self.format = "flac"
+                self._probe_flac(head)
+            elif head[:4] == b"OggS":
+                self.format = "ogg"
+            elif head[4:8] == b"ftyp":
+                self.format = "m4a"
+            elif head[:4] == b"\x1aE\xdf\xa3":
+                self.format = "webm"
+            elif head[:3] == b"ID3" or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+                self.format = "mp3"
+                self._probe_mp3(head)
+        except Exception as e:
+            logger.warning(f"Не удалось определить параметры аудио: {e}")
+
+    def duration(self, total_bytes: int) -> Optional[float]:
+        if self._duration is not None:
+            return round(self._duration, 2)
+        if self._bitrate_kbps:
+            return round((total_bytes - self._header_offset) * 8 / (self._bitrate_kbps * 1000), 2)
+        return None
+
+    def _probe_wav(self, head: bytes):
+        pos = 12
+        byte_rate = None
+        while pos + 8 <= len(head):
+            chunk_id = head[pos:pos + 4]
+            chunk_size = struct.unpack("<I", head[pos + 4:pos + 8])[0]
+            if chunk_id == b"fmt ":
+                byte_rate = struct.unpack("<I", head[pos + 16:pos + 20])[0]
+            elif chunk_id == b"data":
+                if byte_rate:
+                    self._duration = chunk_size / byte_rate
+                return
+            pos += 8 + chunk_size + (chunk_size & 1)
+
+    def _probe_flac(self, head: bytes):
+        info = head[8:8 + 34]
+        if len(info) < 18:
+            return
+        packed = int.from_bytes(info[10:18], "big")
+        sample_rate = packed >> 44
+        total_samples = packed & 0xFFFFFFFFF
+        if sample_rate and total_samples:
+            self._duration = total_samples / sample_rate
+
+    def _probe_mp3(self, head: bytes):
+        pos = 0
+        if head[:3] == b"ID3" and len(head) >= 10:
+            size = (head[6] << 21) | (head[7] << 14) | (head[8] << 7) | head[9]
+            pos = 10 + size
+        while pos + 4 <= len(head):
+            if head[pos] == 0xFF and head[pos + 1] & 0xE0 == 0xE0:
+                version_bits = (head[pos + 1] >> 3) & 0x03
+                layer_bits = (head[pos + 1] >> 1) & 0x03
+                bitrate_index = head[pos + 2] >> 4
+                version = 1 if version_bits == 3 else 2
+                layer = 4 - layer_bits
+                table = MP3_BITRATES_KBPS.get((version, layer))
+                if table and 0 < bitrate_index < 15:
+                    self._bitrate_kbps = table[bitrate_index]
+                    self._header_offset = pos
+                return
+            pos += 1
+
+def hash_file(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+async def save_upload_file(file: UploadFile, file_path: str, max_bytes: int, chunk_size: int, header_size: int = 64 * 1024) -> dict:
+    sha256 = hashlib.sha256()
+    probe = AudioProbe()
+    total = 0
+    head = b""
+    header_done = False
+
+    try:
+        f = await asyncio.to_thread(open, file_path, "wb")
+        try:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+                total += len(chunk)
+                if max_bytes and total > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+
+                sha256.update(chunk)
+                await asyncio.to_thread(f.write, chunk)
+
+                if not header_done:
+                    head += chunk[:header_size - len(head)]
+                    if len(head) >= header_size:
+                        probe.feed_header(head)
+                        header_done = True
+        finally:
+            await asyncio.to_thread(f.close)
+    except BaseException:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+
+    if not header_done:
+        probe.feed_header(head)
+
+    return {
+        "sha256": sha256.hexdigest(),
+        "size": total,
+        "format": probe.format,
+        "duration": probe.duration(total)
+    }
@@ -4,10 +4,15 @@ import { useState, useEffect } from "react";
 import { useRouter } from "next/navigation";
 import { getCalls, exportCalls, Call } from "@/lib/api";
 
+const PAGE_SIZE = 50;
+const LIST_FIELDS = ["filename", "manager", "call_date", "call_identifier", "evaluation"];
+
 export default function HistoryPage() {
   const router = useRouter();
   const [calls, setCalls] = useState<Call[]>([]);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [manager, setManager] = useState("");
   const [startDate, setStartDate] = useState("");
   const [endDate, setEndDate] = useState("");
@@ -16,21 +21,30 @@ export default function HistoryPage() {
     loadCalls();
   }, []);
 
-  const loadCalls = async () => {
+  const loadCalls = async (cursor: string | null = null) => {
     try {
       const data = await getCalls(
         manager || undefined,
         startDate || undefined,
-        endDate || undefined
+        endDate || undefined,
+        { limit: PAGE_SIZE, cursor, fields: LIST_FIELDS }
       );
-      setCalls(data);
+      setCalls((prev) => (cursor ? [...prev, ...data.calls] : data.calls));
+      setNextCursor(data.next_cursor);
     } catch (error) {
       console.error("Error loading calls:", error);
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
+  const handleLoadMore = () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    loadCalls(nextCursor);
+  };
+
   const handleFilter = () => {
     setLoading(true);
     loadCalls();
@@ -156,6 +170,17 @@ export default function HistoryPage() {
           {calls.length === 0 && (
             <div className="text-center py-8 text-gray-500">Нет звонков</div>
           )}
+          {nextCursor && (
+            <div className="text-center py-4">
+              <button
+                onClick={handleLoadMore}
+                disabled={loadingMore}
+                className="px-4 py-2 bg-gray-100 border border-gray-300 rounded hover:bg-gray-200 disabled:opacity-50"
+              >
+                {loadingMore ? "Загрузка..." : "Показать еще"}
+              </button>
+            </div>
+          )}
         </div>
       )}
     </div>
@@ -48,8 +48,11 @@ export default function Home() {
 
   const loadRecentCalls = async () => {
     try {
-      const data = await getCalls();
-      setRecentCalls(data.slice(0, 5));
+      const data = await getCalls(undefined, undefined, undefined, {
+        limit: 5,
+        fields: ["filename", "manager", "call_date", "evaluation"],
+      });
+      setRecentCalls(data.calls);
     } catch (error: any) {
       console.error("Error loading calls:", error);
     }
@@ -17,6 +17,17 @@ export interface Call {
   };
 }
 
+export interface CallsPage {
+  calls: Call[];
+  next_cursor: string | null;
+}
+
+export interface CallsPageOptions {
+  limit?: number;
+  cursor?: string | null;
+  fields?: string[];
+}
+
 export interface CallDetail extends Call {
   transcription?: string;
   duration?: number;
@@ -146,9 +157,21 @@ export async function analyzeCall(callId: number): Promise<any> {
   }
 }
 
-export async function getAnalyzeStatus(callId: number): Promise<{status: string, progress: number}> {
+export interface AnalyzeStatus {
+  call_id: number;
+  status: string;
+  progress: number;
+  message?: string | null;
+  version: string;
+}
+
+export async function getAnalyzeStatus(callId: number, since?: string, waitSeconds?: number): Promise<AnalyzeStatus> {
   try {
-    const response = await fetch(`${API_URL}/api/analyze/${callId}/status`);
+    const params = new URLSearchParams();
+    if (since) params.append("since", since);
+    if (waitSeconds) params.append("wait", String(waitSeconds));
+    const query = params.toString();
+    const response = await fetch(`${API_URL}/api/analyze/${callId}/status${query ? `?${query}` : ""}`);
     
     if (!response.ok) {
       throw new Error(`Failed to get status: ${response.status}`);
@@ -169,9 +192,9 @@ export async function getAnalyzeStatus(callId: number): Promise<{status: string,
   }
 }
 
-export async function retestCall(callId: number): Promise<any> {
+export async function retestCall(callId: number, force: boolean = false): Promise<any> {
   try {
-    const response = await fetch(`${API_URL}/api/analyze/${callId}/retest`, {
+    const response = await fetch(`${API_URL}/api/analyze/${callId}/retest${force ? "?force=true" : ""}`, {
       method: "POST",
     });
     
@@ -197,13 +220,17 @@ export async function retestCall(callId: number): Promise<any> {
 export async function getCalls(
   manager?: string,
   startDate?: string,
-  endDate?: string
-): Promise<Call[]> {
+  endDate?: string,
+  options: CallsPageOptions = {}
+): Promise<CallsPage> {
   try {
     const params = new URLSearchParams();
     if (manager) params.append("manager", manager);
     if (startDate) params.append("start_date", startDate);
     if (endDate) params.append("end_date", endDate);
+    if (options.limit) params.append("limit", String(options.limit));
+    if (options.cursor) params.append("cursor", options.cursor);
+    if (options.fields?.length) params.append("fields", options.fields.join(","));
     
     const response = await fetch(`${API_URL}/api/calls?${params.toString()}`);
     
@@ -212,7 +239,7 @@ export async function getCalls(
     }
     
     const data = await response.json();
-    return data.calls;
+    return { calls: data.calls, next_cursor: data.next_cursor ?? null };
   } catch (error: any) {
     console.error("Error fetching calls:", {
       error: error.message,
@@ -6,6 +6,7 @@ if (typeof window !== "undefined" && process.env.NODE_ENV === "development") {
 }
 
 export interface ProgressUpdate {
+  type?: "progress";
   call_id: number;
   progress: number;
   status: string;
@@ -38,8 +39,12 @@ export class WebSocketClient {
 
       this.ws.onmessage = (event) => {
         try {
-          const data: ProgressUpdate = JSON.parse(event.data);
-          this.onProgress(data);
+          const data = JSON.parse(event.data);
+          if (data.type === "ping") {
+            this.ws?.send(JSON.stringify({ type: "pong" }));
+            return;
+          }
+          this.onProgress(data as ProgressUpdate);
         } catch (error) {
           console.error("Ошибка парсинга WebSocket сообщения:", {
             error,